@@ -1,16 +1,31 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session, flash
-from database import init_db, get_db_connection
+from flask import Blueprint, Flask, current_app, render_template, request, jsonify, redirect, url_for, session, flash, Response
+from database import ensure_db, get_db_connection, get_users_connection
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 from functools import wraps
 import random
 import json
+import time
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'timetable-secret-key-change-in-production'
+main = Blueprint('main', __name__)
 
-# Initialize database
-init_db()
+def create_app(config=None):
+    """Build the application (entry point for WSGI servers, see wsgi.py)
+
+    Applies config over the defaults, creates or upgrades the schema when
+    the database is behind, and registers the routes. Demo data only comes
+    from `manage.py init-db`.
+    """
+    import assets
+
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'timetable-secret-key-change-in-production'
+    if config:
+        app.config.update(config)
+    assets.init_app(app)
+    app.register_blueprint(main)
+    ensure_db()
+    return app
 
 # Login required decorator
 def login_required(f):
@@ -18,7 +33,7 @@ def login_required(f):
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session:
             flash('Please login to access this page.', 'warning')
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
         return f(*args, **kwargs)
     return decorated_function
 
@@ -26,14 +41,14 @@ def login_required(f):
 # AUTHENTICATION ROUTES
 # ============================================================================
 
-@app.route('/login', methods=['GET', 'POST'])
+@main.route('/login', methods=['GET', 'POST'])
 def login():
     """User login"""
     if request.method == 'POST':
         email = request.form['email']
         password = request.form['password']
         
-        conn = get_db_connection()
+        conn = get_users_connection()
         user = conn.execute('SELECT * FROM users WHERE email = ?', (email,)).fetchone()
         conn.close()
         
@@ -44,13 +59,13 @@ def login():
             session['user_role'] = user['role']
             
             flash(f'Welcome back, {user["name"]}!', 'success')
-            return redirect(url_for('dashboard'))
+            return redirect(url_for('main.dashboard'))
         else:
             flash('Invalid email or password.', 'error')
     
     return render_template('login.html')
 
-@app.route('/signup', methods=['GET', 'POST'])
+@main.route('/signup', methods=['GET', 'POST'])
 def signup():
     """User registration"""
     if request.method == 'POST':
@@ -61,12 +76,12 @@ def signup():
             institution = request.form.get('institution', '')
             phone = request.form.get('phone', '')
             
-            conn = get_db_connection()
+            conn = get_users_connection()
             existing = conn.execute('SELECT id FROM users WHERE email = ?', (email,)).fetchone()
             
             if existing:
                 flash('Email already registered.', 'error')
-                return redirect(url_for('signup'))
+                return redirect(url_for('main.signup'))
             
             hashed_password = generate_password_hash(password)
             conn.execute('''
@@ -84,24 +99,24 @@ def signup():
             session['user_role'] = user['role']
             
             flash('Account created successfully!', 'success')
-            return redirect(url_for('dashboard'))
+            return redirect(url_for('main.dashboard'))
         except Exception as e:
             flash(f'Error: {str(e)}', 'error')
     
     return render_template('signup.html')
 
-@app.route('/logout')
+@main.route('/logout')
 def logout():
     """User logout"""
     session.clear()
     flash('Logged out successfully.', 'success')
-    return redirect(url_for('login'))
+    return redirect(url_for('main.login'))
 
 # ============================================================================
 # MAIN DASHBOARD
 # ============================================================================
 
-@app.route('/')
+@main.route('/')
 @login_required
 def dashboard():
     """Main dashboard"""
@@ -133,7 +148,7 @@ def dashboard():
 # TEACHERS MANAGEMENT
 # ============================================================================
 
-@app.route('/teachers')
+@main.route('/teachers')
 @login_required
 def teachers():
     """List all teachers"""
@@ -144,7 +159,7 @@ def teachers():
     conn.close()
     return render_template('teachers.html', teachers=teachers)
 
-@app.route('/teachers/add', methods=['GET', 'POST'])
+@main.route('/teachers/add', methods=['GET', 'POST'])
 @login_required
 def add_teacher():
     """Add new teacher"""
@@ -162,12 +177,12 @@ def add_teacher():
             conn.commit()
             conn.close()
             flash('Teacher added successfully!', 'success')
-            return redirect(url_for('teachers'))
+            return redirect(url_for('main.teachers'))
         except Exception as e:
             flash(f'Error: {str(e)}', 'error')
     return render_template('add_teacher.html')
 
-@app.route('/teachers/edit/<int:id>', methods=['GET', 'POST'])
+@main.route('/teachers/edit/<int:id>', methods=['GET', 'POST'])
 @login_required
 def edit_teacher(id):
     """Edit teacher"""
@@ -184,7 +199,7 @@ def edit_teacher(id):
                   request.form['preferred_days'], id, session['user_id']))
             conn.commit()
             flash('Teacher updated successfully!', 'success')
-            return redirect(url_for('teachers'))
+            return redirect(url_for('main.teachers'))
         except Exception as e:
             flash(f'Error: {str(e)}', 'error')
     
@@ -193,7 +208,7 @@ def edit_teacher(id):
     conn.close()
     return render_template('edit_teacher.html', teacher=teacher)
 
-@app.route('/teachers/delete/<int:id>', methods=['POST'])
+@main.route('/teachers/delete/<int:id>', methods=['POST'])
 @login_required
 def delete_teacher(id):
     """Delete teacher"""
@@ -210,7 +225,7 @@ def delete_teacher(id):
 # SUBJECTS MANAGEMENT
 # ============================================================================
 
-@app.route('/subjects')
+@main.route('/subjects')
 @login_required
 def subjects():
     """List all subjects"""
@@ -221,7 +236,7 @@ def subjects():
     conn.close()
     return render_template('subjects.html', subjects=subjects)
 
-@app.route('/subjects/add', methods=['GET', 'POST'])
+@main.route('/subjects/add', methods=['GET', 'POST'])
 @login_required
 def add_subject():
     """Add new subject"""
@@ -238,12 +253,12 @@ def add_subject():
             conn.commit()
             conn.close()
             flash('Subject added successfully!', 'success')
-            return redirect(url_for('subjects'))
+            return redirect(url_for('main.subjects'))
         except Exception as e:
             flash(f'Error: {str(e)}', 'error')
     return render_template('add_subject.html')
 
-@app.route('/subjects/delete/<int:id>', methods=['POST'])
+@main.route('/subjects/delete/<int:id>', methods=['POST'])
 @login_required
 def delete_subject(id):
     """Delete subject"""
@@ -260,7 +275,7 @@ def delete_subject(id):
 # ROOMS MANAGEMENT
 # ============================================================================
 
-@app.route('/rooms')
+@main.route('/rooms')
 @login_required
 def rooms():
     """List all rooms"""
@@ -271,7 +286,7 @@ def rooms():
     conn.close()
     return render_template('rooms.html', rooms=rooms)
 
-@app.route('/rooms/add', methods=['GET', 'POST'])
+@main.route('/rooms/add', methods=['GET', 'POST'])
 @login_required
 def add_room():
     """Add new room"""
@@ -288,12 +303,12 @@ def add_room():
             conn.commit()
             conn.close()
             flash('Room added successfully!', 'success')
-            return redirect(url_for('rooms'))
+            return redirect(url_for('main.rooms'))
         except Exception as e:
             flash(f'Error: {str(e)}', 'error')
     return render_template('add_room.html')
 
-@app.route('/rooms/delete/<int:id>', methods=['POST'])
+@main.route('/rooms/delete/<int:id>', methods=['POST'])
 @login_required
 def delete_room(id):
     """Delete room"""
@@ -306,11 +321,38 @@ def delete_room(id):
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+@main.route('/api/rooms/reoptimize', methods=['POST'])
+@login_required
+def api_reoptimize_rooms():
+    """Re-match rooms for all lectures (or one class) by capacity fit and equipment"""
+    from room_assignment import assign_rooms, save_room_changes
+    from scheduler import TimetableModel
+
+    try:
+        data = request.get_json(silent=True) or {}
+        class_id = data.get('class_id')
+        started = time.perf_counter()
+
+        conn = get_db_connection()
+        model = TimetableModel.load(conn, session['user_id'])
+        entry_ids = None
+        if class_id is not None:
+            entry_ids = [e['id'] for e in model.entries.values() if e['class_id'] == int(class_id)]
+        changes, roomless = assign_rooms(model, entry_ids)
+        save_room_changes(conn, session['user_id'], changes)
+        conn.commit()
+        conn.close()
+
+        return jsonify({'success': True, 'changed': len(changes), 'without_room': roomless,
+                        'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
 # ============================================================================
 # CLASSES MANAGEMENT
 # ============================================================================
 
-@app.route('/classes')
+@main.route('/classes')
 @login_required
 def classes():
     """List all classes"""
@@ -321,7 +363,7 @@ def classes():
     conn.close()
     return render_template('classes.html', classes=classes)
 
-@app.route('/classes/add', methods=['GET', 'POST'])
+@main.route('/classes/add', methods=['GET', 'POST'])
 @login_required
 def add_class():
     """Add new class"""
@@ -336,12 +378,12 @@ def add_class():
             conn.commit()
             conn.close()
             flash('Class added successfully!', 'success')
-            return redirect(url_for('classes'))
+            return redirect(url_for('main.classes'))
         except Exception as e:
             flash(f'Error: {str(e)}', 'error')
     return render_template('add_class.html')
 
-@app.route('/classes/delete/<int:id>', methods=['POST'])
+@main.route('/classes/delete/<int:id>', methods=['POST'])
 @login_required
 def delete_class(id):
     """Delete class"""
@@ -358,7 +400,7 @@ def delete_class(id):
 # TIMETABLE GENERATION & VIEWING
 # ============================================================================
 
-@app.route('/generate')
+@main.route('/generate')
 @login_required
 def generate_timetable():
     """Generate timetable page"""
@@ -367,65 +409,214 @@ def generate_timetable():
     conn.close()
     return render_template('generate.html', classes=classes)
 
-@app.route('/api/generate-timetable', methods=['POST'])
+@main.route('/api/generate-timetable', methods=['POST'])
 @login_required
 def api_generate_timetable():
-    """Generate timetable using genetic algorithm"""
+    """Generate timetable: constructive search, genetic optimization, then room matching"""
+    import generator
+
     try:
         data = request.get_json()
         class_id = data['class_id']
         
         conn = get_db_connection()
-        
-        # Get all required data
-        teachers = conn.execute('SELECT * FROM teachers WHERE user_id=?', (session['user_id'],)).fetchall()
-        subjects = conn.execute('SELECT * FROM subjects WHERE user_id=?', (session['user_id'],)).fetchall()
-        rooms = conn.execute('SELECT * FROM rooms WHERE user_id=?', (session['user_id'],)).fetchall()
-        time_slots = conn.execute('SELECT * FROM time_slots WHERE user_id=?', (session['user_id'],)).fetchall()
-        
-        # Simple timetable generation logic
-        # Clear existing entries for this class
-        conn.execute('DELETE FROM timetable_entries WHERE class_id=? AND user_id=?', 
-                    (class_id, session['user_id']))
-        
-        # Generate timetable
-        days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
-        slots_per_day = 6
-        
-        subject_idx = 0
-        teacher_idx = 0
-        room_idx = 0
-        
-        for day in days:
-            day_slots = conn.execute('''
-                SELECT * FROM time_slots WHERE day=? AND user_id=? ORDER BY slot_number
-            ''', (day, session['user_id'])).fetchall()
-            
-            for slot in day_slots:
-                if subject_idx < len(subjects):
-                    subject = subjects[subject_idx]
-                    teacher = teachers[teacher_idx % len(teachers)]
-                    room = rooms[room_idx % len(rooms)]
-                    
-                    conn.execute('''
-                        INSERT INTO timetable_entries 
-                        (class_id, subject_id, teacher_id, room_id, time_slot_id, day, user_id)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    ''', (class_id, subject['id'], teacher['id'], room['id'], 
-                          slot['id'], day, session['user_id']))
-                    
-                    subject_idx += 1
-                    teacher_idx += 1
-                    room_idx += 1
-        
+        try:
+            result = generator.run_generation(
+                conn, session['user_id'], class_id,
+                subject_ids=data.get('subject_ids'),
+                optimize=data.get('optimize', True),
+                profile=bool(data.get('profile') or current_app.config.get('PROFILE_GENERATION')))
+        finally:
+            conn.close()
+
+        if result['status'] == 'running':
+            # Another request is generating this class; the client polls the run instead of waiting here
+            return jsonify(dict(result, success=True, message='Generation already in progress',
+                                poll_url=url_for('main.api_generation_run', run_id=result['run_id']))), 202
+        return jsonify(dict(result, success=True, message='Timetable generated successfully!'))
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+# ============================================================================
+# TIMETABLE VERSIONS
+# ============================================================================
+
+@main.route('/api/classes/<int:class_id>/versions', methods=['GET', 'POST'])
+@login_required
+def api_timetable_versions(class_id):
+    """List versions of a class timetable, or snapshot the current one"""
+    import versions
+
+    try:
+        conn = get_db_connection()
+        if request.method == 'POST':
+            data = request.get_json(silent=True) or {}
+            version_id = versions.save_version(conn, session['user_id'], class_id,
+                                               data.get('label', 'Manual snapshot'))
+            conn.commit()
+            conn.close()
+            return jsonify({'success': True, 'version_id': version_id})
+
+        class_versions = versions.list_versions(conn, session['user_id'], class_id)
+        conn.close()
+        return jsonify({'versions': class_versions})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@main.route('/api/classes/<int:class_id>/versions/diff')
+@login_required
+def api_diff_versions(class_id):
+    """Diff two versions of a class timetable (?from=<id>&to=<id>)"""
+    import versions
+
+    try:
+        conn = get_db_connection()
+        old_rows = versions.load_version(conn, session['user_id'], class_id,
+                                         request.args.get('from', type=int))
+        new_rows = versions.load_version(conn, session['user_id'], class_id,
+                                         request.args.get('to', type=int))
+        if old_rows is None or new_rows is None:
+            conn.close()
+            return jsonify({'success': False, 'error': 'Version not found'}), 404
+
+        added, removed, changed = versions.diff_versions(old_rows, new_rows)
+        describe = versions.row_describer(conn, session['user_id'])
+        conn.close()
+
+        return jsonify({
+            'added': [describe(row) for row in added],
+            'removed': [describe(row) for row in removed],
+            'changed': [{'from': describe(old), 'to': describe(new)} for old, new in changed],
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@main.route('/api/classes/<int:class_id>/versions/<int:version_id>/rollback', methods=['POST'])
+@login_required
+def api_rollback_version(class_id, version_id):
+    """Make an earlier version the active timetable of a class"""
+    import versions
+
+    try:
+        conn = get_db_connection()
+        if not versions.rollback_to_version(conn, session['user_id'], class_id, version_id):
+            conn.close()
+            return jsonify({'success': False, 'error': 'Version not found'}), 404
         conn.commit()
         conn.close()
-        
-        return jsonify({'success': True, 'message': 'Timetable generated successfully!'})
+        return jsonify({'success': True, 'version_id': version_id})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@main.route('/api/generation-runs')
+@login_required
+def api_generation_runs():
+    """Recent generation runs with their status and search statistics"""
+    import generator
+
+    try:
+        conn = get_db_connection()
+        runs = generator.list_runs(conn, session['user_id'], request.args.get('class_id', type=int))
+        conn.close()
+        return jsonify({'runs': runs})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@main.route('/api/generation-runs/<int:run_id>')
+@login_required
+def api_generation_run(run_id):
+    """Status and statistics of one generation run"""
+    import generator
+
+    try:
+        conn = get_db_connection()
+        run = generator.get_run(conn, session['user_id'], run_id)
+        conn.close()
+        if run is None:
+            return jsonify({'success': False, 'error': 'Run not found'}), 404
+        return jsonify(run)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@main.route('/api/generation-runs/<int:run_id>/profile')
+@login_required
+def api_generation_run_profile(run_id):
+    """Download a run's cProfile capture (open with pstats or snakeviz)"""
+    try:
+        conn = get_db_connection()
+        row = conn.execute('SELECT profile FROM generation_runs WHERE id=? AND user_id=?',
+                           (run_id, session['user_id'])).fetchone()
+        conn.close()
+        if row is None or row['profile'] is None:
+            return jsonify({'success': False, 'error': 'No profile for this run'}), 404
+        return Response(row['profile'], mimetype='application/octet-stream',
+                        headers={'Content-Disposition': f'attachment; filename=generation-{run_id}.prof'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
-@app.route('/view/<int:class_id>')
+# ============================================================================
+# PUBLIC DISPLAY SNAPSHOTS
+# ============================================================================
+
+@main.route('/api/snapshot/publish', methods=['POST'])
+@login_required
+def api_publish_snapshot():
+    """Publish the current timetable for hallway screens and the public student page"""
+    import snapshot
+
+    try:
+        conn = get_db_connection()
+        published = snapshot.publish_snapshot(conn, session['user_id'])
+        conn.commit()
+        conn.close()
+        return jsonify(dict(published, success=True,
+                            classes_url=url_for('main.public_classes', token=published['token'])))
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+def public_response(token, lookup):
+    """Serve a lookup from the mmapped snapshot; never opens a database connection"""
+    import snapshot
+
+    try:
+        reader = snapshot.open_snapshot(token)
+    except ValueError:
+        reader = None
+    if reader is None:
+        return jsonify({'success': False, 'error': 'Timetable not published'}), 404
+
+    etag = f'"{token}-{reader.published_at}"'
+    if request.if_none_match.contains_weak(etag[1:-1]):
+        return Response(status=304, headers={'ETag': etag})
+    result = lookup(reader)
+    if result is None:
+        return jsonify({'success': False, 'error': 'Not found'}), 404
+    response = jsonify(result)
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'public, max-age=60'
+    return response
+
+@main.route('/public/<token>/classes')
+def public_classes(token):
+    """Classes in a published timetable"""
+    return public_response(token, lambda reader: {'classes': reader.classes()})
+
+@main.route('/public/<token>/classes/<int:class_id>')
+def public_class_timetable(token, class_id):
+    """Published timetable of one class"""
+    return public_response(token, lambda reader: reader.class_timetable(class_id))
+
+@main.route('/public/<token>/rooms')
+def public_rooms(token):
+    """Rooms in a published timetable"""
+    return public_response(token, lambda reader: {'rooms': reader.rooms()})
+
+@main.route('/public/<token>/rooms/<int:room_id>')
+def public_room_timetable(token, room_id):
+    """Published timetable of one room"""
+    return public_response(token, lambda reader: reader.room_timetable(room_id))
+
+@main.route('/view/<int:class_id>')
 @login_required
 def view_timetable(class_id):
     """View timetable for a class"""
@@ -435,21 +626,23 @@ def view_timetable(class_id):
                              (class_id, session['user_id'])).fetchone()
     
     # Get timetable entries with all details
+    # One primary-key range scan of the entries the shown version lists ("+" keeps user_id a filter, not the index)
     entries = conn.execute('''
         SELECT 
-            te.*,
+            e.*, w.day,
             s.name as subject_name, s.code as subject_code,
             t.name as teacher_name,
-            r.name as room_name, r.room_number,
-            ts.day, ts.start_time, ts.end_time, ts.slot_number
-        FROM timetable_entries te
-        JOIN subjects s ON te.subject_id = s.id
-        JOIN teachers t ON te.teacher_id = t.id
-        JOIN rooms r ON te.room_id = r.id
-        JOIN time_slots ts ON te.time_slot_id = ts.id
-        WHERE te.class_id = ? AND te.user_id = ?
-        ORDER BY ts.slot_number
-    ''', (class_id, session['user_id'])).fetchall()
+            r.name as room_name, r.room_number
+        FROM version_entries ve
+        JOIN entries e ON e.id = ve.entry_id
+        JOIN weekdays w ON e.day_index = w.day_index
+        JOIN subjects s ON e.subject_id = s.id
+        JOIN teachers t ON e.teacher_id = t.id
+        LEFT JOIN rooms r ON e.room_id = r.id
+        WHERE ve.class_id = ?
+          AND ve.version_id = COALESCE((SELECT version_id FROM active_timetable_versions WHERE class_id = ?), 0)
+          AND +e.user_id = ?
+    ''', (class_id, class_id, session['user_id'])).fetchall()
     
     # Organize entries by day and slot
     days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
@@ -477,7 +670,7 @@ def view_timetable(class_id):
                          days=days,
                          time_slots=time_slots)
 
-@app.route('/teacher-timetable/<int:teacher_id>')
+@main.route('/teacher-timetable/<int:teacher_id>')
 @login_required
 def teacher_timetable(teacher_id):
     """View timetable for a specific teacher"""
@@ -486,20 +679,23 @@ def teacher_timetable(teacher_id):
     teacher = conn.execute('SELECT * FROM teachers WHERE id=? AND user_id=?', 
                           (teacher_id, session['user_id'])).fetchone()
     
+    # One range scan of idx_entries_teacher, keeping rows of the versions their classes show
     entries = conn.execute('''
         SELECT 
-            te.*,
+            e.*, w.day,
             s.name as subject_name,
             c.name as class_name,
-            r.room_number,
-            ts.day, ts.start_time, ts.end_time, ts.slot_number
-        FROM timetable_entries te
-        JOIN subjects s ON te.subject_id = s.id
-        JOIN classes c ON te.class_id = c.id
-        JOIN rooms r ON te.room_id = r.id
-        JOIN time_slots ts ON te.time_slot_id = ts.id
-        WHERE te.teacher_id = ? AND te.user_id = ?
-        ORDER BY ts.slot_number
+            r.room_number
+        FROM entries e
+        JOIN weekdays w ON e.day_index = w.day_index
+        JOIN subjects s ON e.subject_id = s.id
+        JOIN classes c ON e.class_id = c.id
+        LEFT JOIN rooms r ON e.room_id = r.id
+        WHERE e.teacher_id = ? AND +e.user_id = ?
+          AND EXISTS (SELECT 1 FROM version_entries ve
+                      WHERE ve.class_id = e.class_id AND ve.entry_id = e.id
+                        AND ve.version_id = COALESCE((SELECT a.version_id FROM active_timetable_versions a
+                                                      WHERE a.class_id = e.class_id), 0))
     ''', (teacher_id, session['user_id'])).fetchall()
     
     days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
@@ -526,11 +722,107 @@ def teacher_timetable(teacher_id):
                          days=days,
                          time_slots=time_slots)
 
+# ============================================================================
+# TERM CALENDAR FEEDS
+# ============================================================================
+
+@main.route('/api/terms', methods=['GET', 'POST'])
+@login_required
+def api_terms():
+    """List terms, or add one with its holidays"""
+    import feeds
+
+    try:
+        conn = get_db_connection()
+        if request.method == 'POST':
+            term_id = feeds.save_term(conn, session['user_id'], request.get_json() or {})
+            conn.commit()
+            conn.close()
+            return jsonify({'success': True, 'id': term_id})
+        terms = feeds.list_terms(conn, session['user_id'])
+        conn.close()
+        return jsonify({'success': True, 'terms': terms})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@main.route('/api/terms/<int:term_id>', methods=['DELETE'])
+@login_required
+def api_delete_term(term_id):
+    """Delete a term and its holidays"""
+    import feeds
+
+    try:
+        conn = get_db_connection()
+        deleted = feeds.delete_term(conn, session['user_id'], term_id)
+        conn.commit()
+        conn.close()
+        if not deleted:
+            return jsonify({'success': False, 'error': 'Term not found'}), 404
+        return jsonify({'success': True})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@main.route('/api/calendar/feeds')
+@login_required
+def api_calendar_feeds():
+    """Subscription URLs of every class, teacher and room calendar"""
+    import feeds
+
+    try:
+        users_conn = get_users_connection()
+        token = feeds.feed_token(users_conn, session['user_id'])
+        users_conn.commit()
+        users_conn.close()
+
+        conn = get_db_connection()
+        result = {}
+        for kind, (_, table, label) in feeds.FEED_KINDS.items():
+            rows = conn.execute(f'SELECT id, {label} FROM {table} WHERE user_id = ? ORDER BY {label}',
+                                (session['user_id'],)).fetchall()
+            result[table] = [{'id': row[0], 'name': row[1],
+                              'url': url_for('main.calendar_feed', token=token, kind=kind,
+                                             resource_id=row[0], _external=True)} for row in rows]
+        conn.close()
+        return jsonify(dict(result, success=True, token=token))
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@main.route('/calendar/<token>/<any(class, teacher, room):kind>/<int:resource_id>.ics')
+def calendar_feed(token, kind, resource_id):
+    """iCalendar feed of a class, teacher or room over the configured terms"""
+    import changes
+    import feeds
+
+    users_conn = get_users_connection()
+    user_id = feeds.user_for_token(users_conn, token)
+    users_conn.close()
+    if user_id is None:
+        return Response('Unknown calendar feed', status=404, mimetype='text/plain')
+
+    conn = get_db_connection(user_id)
+    try:
+        name = feeds.feed_name(conn, user_id, kind, resource_id)
+        if name is None:
+            return Response('Not found', status=404, mimetype='text/plain')
+        # Answer revalidations before anything is expanded
+        etag = feeds.feed_etag(conn, user_id, kind, resource_id, changes.last_seq(conn, user_id))
+        if request.if_none_match.contains_weak(etag):
+            return Response(status=304, headers={'ETag': f'"{etag}"'})
+        pattern, terms = feeds.load_feed(conn, user_id, kind, resource_id)
+    finally:
+        conn.close()
+
+    response = Response(feeds.stream_ics(kind, name, pattern, terms), mimetype='text/calendar')
+    response.headers['ETag'] = f'"{etag}"'
+    response.headers['Cache-Control'] = 'private, max-age=300'
+    response.headers['Content-Disposition'] = f'inline; filename="{kind}-{resource_id}.ics"'
+    return response
+
 # ============================================================================
 # ANALYTICS & REPORTS
 # ============================================================================
 
-@app.route('/analytics')
+@main.route('/analytics')
 @login_required
 def analytics():
     """Analytics dashboard"""
@@ -605,7 +897,7 @@ def analytics():
 # API ENDPOINTS
 # ============================================================================
 
-@app.route('/api/check-conflicts', methods=['POST'])
+@main.route('/api/check-conflicts', methods=['POST'])
 @login_required
 def check_conflicts():
     """Check for scheduling conflicts"""
@@ -646,7 +938,164 @@ def check_conflicts():
     except Exception as e:
         return jsonify({'error': str(e)})
 
-@app.route('/api/get-available-rooms', methods=['POST'])
+@main.route('/api/entries/<int:entry_id>/suggestions')
+@login_required
+def api_entry_suggestions(entry_id):
+    """Feasible target slots and swaps for one timetable entry, ranked by soft score"""
+    from scheduler import TimetableModel, suggest_moves
+
+    try:
+        started = time.perf_counter()
+        conn = get_db_connection()
+        model = TimetableModel.load(conn, session['user_id'])
+        conn.close()
+
+        if entry_id not in model.entries:
+            return jsonify({'success': False, 'error': 'Entry not found'}), 404
+
+        moves, swaps = suggest_moves(model, entry_id)
+        entry = model.entries[entry_id]
+        return jsonify({
+            'entry': dict(model.describe_cell(entry['cell']), id=entry_id,
+                          subject_id=entry['subject_id'], teacher_id=entry['teacher_id'],
+                          room_id=entry['room_id'], class_id=entry['class_id']),
+            'moves': moves,
+            'swaps': swaps,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@main.route('/api/substitutes')
+@login_required
+def api_substitutes():
+    """Rank substitute teachers for each lecture of an absent teacher (?teacher_id=&day=)"""
+    from scheduler import TimetableModel, find_substitutes
+
+    try:
+        teacher_id = request.args.get('teacher_id', type=int)
+        day = request.args.get('day')
+
+        conn = get_db_connection()
+        model = TimetableModel.load(conn, session['user_id'])
+        conn.close()
+
+        if teacher_id not in model.teachers:
+            return jsonify({'success': False, 'error': 'Teacher not found'}), 404
+        if day not in model.days:
+            return jsonify({'success': False, 'error': 'Invalid day'}), 400
+
+        lectures = find_substitutes(model, teacher_id, model.days.index(day),
+                                    limit=request.args.get('limit', 5, type=int))
+        return jsonify({'teacher_id': teacher_id, 'day': day, 'lectures': lectures})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@main.route('/api/simulate', methods=['POST'])
+@login_required
+def api_simulate():
+    """Evaluate hypothetical changes against an in-memory copy of the timetable"""
+    from scheduler import TimetableModel
+    from simulation import Simulation
+
+    try:
+        data = request.get_json() or {}
+
+        conn = get_db_connection()
+        model = TimetableModel.load(conn, session['user_id'])
+        conn.close()
+
+        simulation = Simulation(model)
+        try:
+            for mutation in data.get('mutations', []):
+                simulation.apply(mutation)
+        except (ValueError, TypeError) as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+
+        simulation.repair(resolve_conflicts=data.get('repair_conflicts', True))
+
+        return jsonify(dict(simulation.result(), success=True))
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@main.route('/api/validate')
+@login_required
+def api_validate():
+    """Audit the whole timetable against hard constraints and weekly hours"""
+    import validator
+    from scheduler import TimetableModel
+
+    try:
+        started = time.perf_counter()
+        conn = get_db_connection()
+        model = TimetableModel.load(conn, session['user_id'], include_entries=False)
+        columns = validator.load_columns(conn, session['user_id'], model)
+        requirements = validator.load_requirements(conn, session['user_id'])
+        conn.close()
+
+        report = validator.validate(model, columns, requirements)
+        report['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        return jsonify(report)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@main.route('/api/<any(teachers, subjects, rooms, classes):kind>')
+@login_required
+def api_list_entities(kind):
+    """Paginated entity list (?sort=&order=&limit=&cursor=&q= plus exact-match filters)"""
+    import listing
+
+    try:
+        conn = get_db_connection()
+        page = listing.list_page(conn, session['user_id'], kind,
+                                 sort=request.args.get('sort'),
+                                 order=request.args.get('order', 'asc'),
+                                 cursor=request.args.get('cursor'),
+                                 limit=request.args.get('limit', listing.DEFAULT_PAGE_SIZE, type=int),
+                                 q=request.args.get('q'),
+                                 filters=request.args)
+        conn.close()
+        return jsonify(page)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@main.route('/api/<any(teachers, subjects, rooms, classes, time_slots):kind>/batch', methods=['POST'])
+@login_required
+def api_batch_entities(kind):
+    """Apply many create/update/delete operations in one transaction"""
+    import batch
+
+    try:
+        data = request.get_json()
+        conn = get_db_connection()
+        applied, results = batch.apply_batch(conn, session['user_id'], kind, data.get('operations'),
+                                             atomic=data.get('atomic', True))
+        conn.commit()
+        conn.close()
+        return jsonify({'success': applied == len(results), 'applied': applied, 'results': results})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@main.route('/api/changes')
+@login_required
+def api_changes():
+    """Changes after sequence number ?since=N; without since, only the current sequence number"""
+    import changes
+
+    try:
+        conn = get_db_connection()
+        since = request.args.get('since', type=int)
+        if since is None:
+            result = {'last_seq': changes.last_seq(conn, session['user_id'])}
+        else:
+            result = changes.changes_since(conn, session['user_id'], since,
+                                           request.args.get('limit', changes.DEFAULT_LIMIT, type=int))
+        conn.close()
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@main.route('/api/get-available-rooms', methods=['POST'])
 @login_required
 def get_available_rooms():
     """Get available rooms for a time slot"""
@@ -671,7 +1120,7 @@ def get_available_rooms():
     except Exception as e:
         return jsonify({'error': str(e)})
 
-@app.route('/api/stats')
+@main.route('/api/stats')
 @login_required
 def api_stats():
     """Get dashboard statistics"""
@@ -695,27 +1144,29 @@ def api_stats():
 # SETTINGS
 # ============================================================================
 
-@app.route('/settings', methods=['GET', 'POST'])
+@main.route('/settings', methods=['GET', 'POST'])
 @login_required
 def settings():
     """User settings"""
-    conn = get_db_connection()
+    users_conn = get_users_connection()
     
     if request.method == 'POST':
         try:
-            conn.execute('''
+            users_conn.execute('''
                 UPDATE users SET name=?, institution=?, phone=?
                 WHERE id=?
             ''', (request.form['name'], request.form['institution'],
                   request.form['phone'], session['user_id']))
-            conn.commit()
+            users_conn.commit()
             session['user_name'] = request.form['name']
             flash('Settings updated successfully!', 'success')
         except Exception as e:
             flash(f'Error: {str(e)}', 'error')
     
-    user = conn.execute('SELECT * FROM users WHERE id=?', (session['user_id'],)).fetchone()
+    user = users_conn.execute('SELECT * FROM users WHERE id=?', (session['user_id'],)).fetchone()
+    users_conn.close()
     
+    conn = get_db_connection()
     stats = {
         'teachers': conn.execute('SELECT COUNT(*) as c FROM teachers WHERE user_id=?', 
                                 (session['user_id'],)).fetchone()['c'],
@@ -731,7 +1182,7 @@ def settings():
     
     return render_template('settings.html', user=user, stats=stats)
 
-@app.route('/change-password', methods=['POST'])
+@main.route('/change-password', methods=['POST'])
 @login_required
 def change_password():
     """Change password"""
@@ -739,13 +1190,13 @@ def change_password():
         current = request.form['current_password']
         new = request.form['new_password']
         
-        conn = get_db_connection()
+        conn = get_users_connection()
         user = conn.execute('SELECT password FROM users WHERE id=?', 
                           (session['user_id'],)).fetchone()
         
         if not check_password_hash(user['password'], current):
             flash('Current password is incorrect!', 'error')
-            return redirect(url_for('settings'))
+            return redirect(url_for('main.settings'))
         
         hashed = generate_password_hash(new)
         conn.execute('UPDATE users SET password=? WHERE id=?', 
@@ -757,7 +1208,7 @@ def change_password():
     except Exception as e:
         flash(f'Error: {str(e)}', 'error')
     
-    return redirect(url_for('settings'))
+    return redirect(url_for('main.settings'))
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5001)
\ No newline at end of file
+    create_app().run(debug=True, port=5001)
@@ -0,0 +1,196 @@
+"""Fingerprinted, pre-compressed static assets and response compression.
+
+Stylesheets and scripts under static/css and static/js are copied to
+static/dist with a content hash in their name, next to .gz (and, when the
+brotli package is installed, .br) variants. The files every page shares are
+merged into the bundles listed in BUNDLES first. Templates link assets
+through asset_url(), so a changed file gets a new URL and every file can be
+cached forever.
+
+The copies and their manifest are written by `manage.py assets` at deploy
+time; the app only reads the manifest and never writes under static/.
+Without a manifest, pages still render and link the unhashed files.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import threading
+
+from flask import request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:  # brotli is optional: serve gzip only
+    brotli = None
+
+ASSET_DIRS = ('css', 'js')
+# Shared bundles: {logical path: source files concatenated into it, in order}
+BUNDLES = {
+    'css/app.css': ('css/style.css', 'css/shared.css'),
+    'js/app.js': ('js/shared.js',),
+}
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+HASH_LENGTH = 12
+# One year; hashed names change whenever the content does
+ASSET_MAX_AGE = 365 * 24 * 3600
+COMPRESSIBLE_TYPES = ('text/html', 'application/json')
+MIN_COMPRESS_SIZE = 500
+
+
+def fingerprinted_name(path, content):
+    stem, ext = os.path.splitext(path)
+    return f'{stem}.{hashlib.sha256(content).hexdigest()[:HASH_LENGTH]}{ext}'
+
+
+def bundle_content(static_folder, logical):
+    """The concatenated sources of a bundle"""
+    parts = []
+    for source in BUNDLES[logical]:
+        with open(os.path.join(static_folder, source), 'rb') as f:
+            parts.append(f.read().rstrip(b'\r\n') + b'\n')
+    return b''.join(parts)
+
+
+def _write_asset(dist, hashed, content):
+    target = os.path.join(dist, hashed)
+    if os.path.exists(target):
+        return
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target + '.gz', 'wb') as f:
+        f.write(gzip.compress(content, 9, mtime=0))
+    if brotli is not None:
+        with open(target + '.br', 'wb') as f:
+            f.write(brotli.compress(content))
+    # Written last: its presence marks the variants as complete
+    with open(target + '.tmp', 'wb') as f:
+        f.write(content)
+    os.replace(target + '.tmp', target)
+
+
+def build_assets(static_folder):
+    """Write hashed, compressed copies of every asset and bundle, and the manifest
+
+    Files that go into a bundle are only published as part of it. Returns
+    {logical path: hashed path}.
+    """
+    dist = os.path.join(static_folder, DIST_DIR)
+    bundled = {source for sources in BUNDLES.values() for source in sources}
+    contents = {logical: bundle_content(static_folder, logical) for logical in BUNDLES}
+    for directory in ASSET_DIRS:
+        for root, _, files in os.walk(os.path.join(static_folder, directory)):
+            for filename in sorted(files):
+                source = os.path.join(root, filename)
+                logical = os.path.relpath(source, static_folder).replace(os.sep, '/')
+                if logical in bundled or logical in contents:
+                    continue
+                with open(source, 'rb') as f:
+                    contents[logical] = f.read()
+
+    manifest = {}
+    for logical, content in sorted(contents.items()):
+        manifest[logical] = fingerprinted_name(logical, content)
+        _write_asset(dist, manifest[logical], content)
+
+    # Replaced in one step, so running workers never read a partial manifest
+    os.makedirs(dist, exist_ok=True)
+    path = os.path.join(dist, MANIFEST_NAME)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+    return manifest
+
+
+def read_manifest(static_folder):
+    """The manifest written by build_assets, or None when the assets were never built"""
+    try:
+        with open(os.path.join(static_folder, DIST_DIR, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _accepted_encodings():
+    return {part.split(';')[0].strip() for part in request.headers.get('Accept-Encoding', '').split(',')}
+
+
+def init_app(app):
+    """Register asset_url(), the /assets route and HTML compression
+
+    The manifest is read when the first page is rendered, not at import time.
+    When it is missing a warning is logged and pages link the unhashed files
+    under /static, with bundles put together per request; run `manage.py
+    assets` and restart to serve the hashed copies.
+    """
+    manifest = {}
+    loaded = threading.Event()
+    lock = threading.Lock()
+
+    def load_manifest():
+        if not loaded.is_set():
+            with lock:
+                if not loaded.is_set():
+                    built = read_manifest(app.static_folder)
+                    if built is None:
+                        app.logger.warning('%s is missing; serving unhashed assets until `python manage.py assets` '
+                                           'is run', os.path.join(app.static_folder, DIST_DIR, MANIFEST_NAME))
+                    manifest.update(built or {})
+                    loaded.set()
+        return manifest
+
+    @app.template_global()
+    def asset_url(path):
+        hashed = load_manifest().get(path)
+        if hashed:
+            return url_for('asset', filename=hashed)
+        if path in BUNDLES:
+            return url_for('asset', filename=path)
+        return url_for('static', filename=path)
+
+    @app.route('/assets/<path:filename>')
+    def asset(filename):
+        dist = os.path.join(app.static_folder, DIST_DIR)
+        if filename in BUNDLES and not os.path.exists(os.path.join(dist, filename)):
+            # Unbuilt bundle under its logical name: never cached, as its content is not in the URL
+            response = app.response_class(bundle_content(app.static_folder, filename),
+                                          mimetype=mimetypes.guess_type(filename)[0])
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        encodings = _accepted_encodings()
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        for encoding, ext in (('br', '.br'), ('gzip', '.gz')):
+            if encoding in encodings and os.path.exists(os.path.join(dist, filename + ext)):
+                response = send_from_directory(dist, filename + ext, mimetype=mimetype,
+                                               max_age=ASSET_MAX_AGE)
+                response.headers['Content-Encoding'] = encoding
+                break
+        else:
+            response = send_from_directory(dist, filename, mimetype=mimetype, max_age=ASSET_MAX_AGE)
+        response.headers['Cache-Control'] = f'public, max-age={ASSET_MAX_AGE}, immutable'
+        response.vary.add('Accept-Encoding')
+        return response
+
+    @app.after_request
+    def compress_response(response):
+        if not app.config.get('COMPRESS_RESPONSES', True):
+            return response
+        if (response.status_code != 200 or response.direct_passthrough
+                or response.mimetype not in COMPRESSIBLE_TYPES
+                or 'Content-Encoding' in response.headers
+                or 'gzip' not in _accepted_encodings()):
+            return response
+        data = response.get_data()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return response
+        response.set_data(gzip.compress(data, 6))
+        response.headers['Content-Encoding'] = 'gzip'
+        # The compressed body differs byte-wise, so a strong validator becomes weak
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        response.vary.add('Accept-Encoding')
+        return response
+
+    return load_manifest
@@ -0,0 +1,194 @@
+import sqlite3
+
+import entry_storage
+
+# Writable columns per entity and the ones a create must provide
+ENTITY_COLUMNS = {
+    'teachers': ('name', 'email', 'phone', 'department', 'specialization',
+                 'max_hours_per_day', 'max_hours_per_week', 'preferred_days'),
+    'subjects': ('name', 'code', 'department', 'credits', 'hours_per_week', 'theory_practical'),
+    'rooms': ('name', 'room_number', 'capacity', 'room_type', 'has_projector', 'has_lab_equipment'),
+    'classes': ('name', 'semester', 'department', 'num_students'),
+    'time_slots': ('day', 'start_time', 'end_time', 'slot_number'),
+}
+REQUIRED_COLUMNS = {
+    'teachers': ('name',),
+    'subjects': ('name', 'code'),
+    'rooms': ('name', 'room_number'),
+    'classes': ('name',),
+    'time_slots': ('day', 'start_time', 'end_time'),
+}
+OPERATIONS = ('create', 'update', 'delete')
+MAX_BATCH_SIZE = 1000
+
+
+def _check_time_slot(data):
+    """Entries store a weekday index and slot number, so a slot needs a weekday name and an integer"""
+    if 'day' in data and data['day'] not in entry_storage.DAY_INDEX:
+        return f'day must be one of {", ".join(entry_storage.WEEKDAYS)}'
+    if data.get('slot_number') is not None:
+        try:
+            int(data['slot_number'])
+        except (TypeError, ValueError):
+            return 'slot_number must be an integer'
+    return None
+
+
+# Extra checks per entity, returning an error message or None
+VALIDATORS = {
+    'time_slots': _check_time_slot,
+}
+
+
+def _check(kind, index, operation):
+    """Validate one operation; returns its result stub, with 'error' set when invalid"""
+    op = operation.get('op') if isinstance(operation, dict) else None
+    result = {'index': index, 'op': op, 'id': None}
+    if op not in OPERATIONS:
+        return dict(result, status='error', error=f'op must be one of {", ".join(OPERATIONS)}')
+
+    if op != 'create':
+        try:
+            result['id'] = int(operation['id'])
+        except (KeyError, TypeError, ValueError):
+            return dict(result, status='error', error='id is required')
+    if op == 'delete':
+        return result
+
+    data = operation.get('data')
+    if not isinstance(data, dict) or not data:
+        return dict(result, status='error', error='data is required')
+    unknown = sorted(set(data) - set(ENTITY_COLUMNS[kind]))
+    if unknown:
+        return dict(result, status='error', error=f'Unknown fields: {", ".join(unknown)}')
+    if op == 'create':
+        missing = [c for c in REQUIRED_COLUMNS[kind] if data.get(c) in (None, '')]
+        if missing:
+            return dict(result, status='error', error=f'Missing fields: {", ".join(missing)}')
+    error = VALIDATORS[kind](data) if kind in VALIDATORS else None
+    if error:
+        return dict(result, status='error', error=error)
+    return result
+
+
+def _runs(items):
+    """Split (key, value) pairs into consecutive runs sharing a key, so order is kept"""
+    runs = []
+    for key, value in items:
+        if runs and runs[-1][0] == key:
+            runs[-1][1].append(value)
+        else:
+            runs.append((key, [value]))
+    return runs
+
+
+def _write_run(conn, user_id, kind, op, columns, run, operations):
+    """Apply a run of operations sharing one shape: updates and deletes with a single executemany,
+    creates one statement each (the statement is cached) so every item gets its own lastrowid"""
+    rows = [operations[r['index']].get('data') for r in run]
+    if op == 'create':
+        sql = f'''
+            INSERT INTO {kind} ({", ".join(columns)}, user_id)
+            VALUES ({", ".join("?" * len(columns))}, ?)
+        '''
+        for row, result in zip(rows, run):
+            result.update(id=conn.execute(sql, [row[c] for c in columns] + [user_id]).lastrowid, status='created')
+    elif op == 'update':
+        conn.executemany(f'''
+            UPDATE {kind} SET {", ".join(f"{c} = ?" for c in columns)}
+            WHERE id = ? AND user_id = ?
+        ''', [[row[c] for c in columns] + [r['id'], user_id] for row, r in zip(rows, run)])
+        for result in run:
+            result['status'] = 'updated'
+    else:
+        conn.executemany(f'DELETE FROM {kind} WHERE id = ? AND user_id = ?', [(r['id'], user_id) for r in run])
+        for result in run:
+            result['status'] = 'deleted'
+
+
+def _first_failure(conn, user_id, kind, op, columns, run, operations):
+    """Retry a failed run item by item, each in a savepoint, to find the one the database rejects"""
+    for result in run:
+        error = _in_savepoint(conn, lambda: _write_run(conn, user_id, kind, op, columns, [result], operations))
+        if error:
+            return result, error
+    return None, None
+
+
+def _in_savepoint(conn, write):
+    """Run write() in a savepoint; on a database error undo only its changes and return the error"""
+    conn.execute('SAVEPOINT batch_item')
+    try:
+        write()
+    except sqlite3.Error as e:
+        conn.execute('ROLLBACK TO batch_item')
+        conn.execute('RELEASE batch_item')
+        return e
+    conn.execute('RELEASE batch_item')
+    return None
+
+
+def apply_batch(conn, user_id, kind, operations, atomic=True):
+    """Apply create/update/delete operations on one entity table in a single transaction.
+
+    Consecutive updates and deletes of the same shape go through one
+    executemany. With atomic=True (the default) an invalid item rejects the
+    whole batch, and an item the database rejects rolls it back; either way
+    the failing item carries the error and the others are marked skipped.
+    Otherwise invalid items are skipped, each run is written in a savepoint,
+    and an item the database rejects is undone alone and reported in its
+    result. Returns (applied count, per-item results). The caller commits.
+    """
+    if kind not in ENTITY_COLUMNS:
+        raise ValueError(f'Unknown entity: {kind}')
+    if not isinstance(operations, list):
+        raise ValueError('operations must be a list')
+    if len(operations) > MAX_BATCH_SIZE:
+        raise ValueError(f'At most {MAX_BATCH_SIZE} operations per batch')
+
+    results = [_check(kind, i, operation) for i, operation in enumerate(operations)]
+
+    # Updates and deletes only touch the user's own rows
+    ids = sorted({r['id'] for r in results if r['id'] is not None and 'error' not in r})
+    existing = set()
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        existing.update(row[0] for row in conn.execute(
+            f'SELECT id FROM {kind} WHERE user_id = ? AND id IN ({",".join("?" * len(chunk))})',
+            [user_id] + chunk))
+    for result in results:
+        if result['op'] in ('update', 'delete') and 'error' not in result and result['id'] not in existing:
+            result.update(status='not_found', error=f"{kind} {result['id']} not found")
+
+    valid = [r for r in results if 'error' not in r]
+    if atomic and len(valid) < len(results):
+        for result in valid:
+            result['status'] = 'skipped'
+        return 0, results
+
+    def shape(result):
+        data = operations[result['index']].get('data') or {}
+        return (result['op'], tuple(c for c in ENTITY_COLUMNS[kind] if c in data))
+
+    # Savepoints opened outside a transaction would commit on release
+    if not conn.in_transaction:
+        conn.execute('BEGIN IMMEDIATE')
+    for (op, columns), run in _runs((shape(r), r) for r in valid):
+        if not _in_savepoint(conn, lambda: _write_run(conn, user_id, kind, op, columns, run, operations)):
+            continue
+        if atomic:
+            failed, error = _first_failure(conn, user_id, kind, op, columns, run, operations)
+            conn.rollback()
+            for result in valid:
+                result['status'] = 'skipped'
+                if result['op'] == 'create':
+                    result['id'] = None
+            if failed is not None:
+                failed.update(status='error', error=f'Batch rolled back: {error}')
+            return 0, results
+        # Something in the run failed: apply its items one by one to find which
+        for result in run:
+            error = _in_savepoint(conn, lambda: _write_run(conn, user_id, kind, op, columns, [result], operations))
+            if error:
+                result.update(status='error', error=str(error))
+    return sum('error' not in r for r in results), results
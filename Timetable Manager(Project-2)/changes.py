@@ -0,0 +1,126 @@
+import entry_storage
+
+# Tables whose writes are recorded in the change log
+TRACKED_TABLES = ('teachers', 'subjects', 'rooms', 'classes', 'time_slots', 'timetable_entries')
+# Entities stored in another table: (table, id expression, condition for the rows clients see) for a trigger row
+STORAGE = {'timetable_entries': ('entries', lambda row: f'{row}.id', entry_storage.live_sql)}
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 5000
+# Changes older than this are pruned by `manage.py vacuum`
+RETENTION_DAYS = 30
+
+
+def create_change_log(conn):
+    """Change log with a monotonically increasing sequence, appended to by triggers"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            entity TEXT NOT NULL,
+            entity_id INTEGER NOT NULL,
+            op TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_changes_user_seq ON changes (user_id, seq)')
+    # Highest sequence number removed by pruning
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS change_log_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            pruned_through INTEGER DEFAULT 0
+        )
+    ''')
+    for entity in TRACKED_TABLES:
+        table, id_of, visible = STORAGE.get(entity, (entity, lambda row: f'{row}.id', None))
+        new_id, old_id = id_of('NEW'), id_of('OLD')
+        # Rows of versions no class shows are not part of the feed
+        when_new, when_old = (f'WHEN {visible("NEW")}', f'WHEN {visible("OLD")}') if visible else ('', '')
+        when_either = f'WHEN {visible("NEW")} OR {visible("OLD")}' if visible else ''
+        conn.executescript(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_log_insert AFTER INSERT ON {table} {when_new} BEGIN
+                INSERT INTO changes (user_id, entity, entity_id, op) VALUES (NEW.user_id, '{entity}', {new_id}, 'upsert');
+            END;
+            CREATE TRIGGER IF NOT EXISTS {table}_log_update AFTER UPDATE ON {table} {when_either} BEGIN
+                INSERT INTO changes (user_id, entity, entity_id, op)
+                SELECT OLD.user_id, '{entity}', {old_id}, 'delete' WHERE {old_id} <> {new_id};
+                INSERT INTO changes (user_id, entity, entity_id, op) VALUES (NEW.user_id, '{entity}', {new_id}, 'upsert');
+            END;
+            CREATE TRIGGER IF NOT EXISTS {table}_log_delete AFTER DELETE ON {table} {when_old} BEGIN
+                INSERT INTO changes (user_id, entity, entity_id, op) VALUES (OLD.user_id, '{entity}', {old_id}, 'delete');
+            END;
+        ''')
+
+
+def last_seq(conn, user_id):
+    row = conn.execute('SELECT MAX(seq) FROM changes WHERE user_id = ?', (user_id,)).fetchone()
+    return row[0] or 0
+
+
+def _load_rows(conn, entity, user_id, ids):
+    rows = []
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        # The unary + keeps SQLite on the id lookup instead of walking all of the user's rows
+        rows += conn.execute(f'SELECT * FROM {entity} WHERE +user_id = ? AND id IN ({",".join("?" * len(chunk))})',
+                             [user_id] + chunk).fetchall()
+    return rows
+
+
+def changes_since(conn, user_id, since, limit=DEFAULT_LIMIT):
+    """Deltas after sequence number `since`, one per changed row, with current row data.
+
+    Several changes to one row collapse into its latest state. `reset` is set
+    when `since` is older than the retained log, in which case the client
+    must reload everything and continue from `last_seq`.
+    """
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    state = conn.execute('SELECT pruned_through FROM change_log_state WHERE id = 1').fetchone()
+    if state and since < state['pruned_through']:
+        return {'reset': True, 'changes': [], 'last_seq': last_seq(conn, user_id), 'has_more': False}
+
+    rows = conn.execute('''
+        SELECT seq, entity, entity_id, op FROM changes
+        WHERE user_id = ? AND seq > ?
+        ORDER BY seq LIMIT ?
+    ''', (user_id, since, limit + 1)).fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    latest = {}
+    for row in rows:
+        latest[(row['entity'], row['entity_id'])] = row
+    upserts = {}
+    for (entity, entity_id), row in latest.items():
+        if row['op'] == 'upsert':
+            upserts.setdefault(entity, []).append(entity_id)
+
+    data = {}
+    for entity, ids in upserts.items():
+        for record in _load_rows(conn, entity, user_id, ids):
+            data[(entity, record['id'])] = dict(record)
+
+    deltas = []
+    for key, row in sorted(latest.items(), key=lambda item: item[1]['seq']):
+        record = data.get(key)
+        # A row deleted after its last logged upsert shows up as a delete
+        op = row['op'] if row['op'] == 'delete' or record is not None else 'delete'
+        deltas.append({'seq': row['seq'], 'entity': row['entity'], 'id': row['entity_id'],
+                       'op': op, 'data': record if op == 'upsert' else None})
+
+    return {
+        'reset': False,
+        'changes': deltas,
+        'last_seq': rows[-1]['seq'] if rows else max(since, last_seq(conn, user_id)),
+        'has_more': has_more,
+    }
+
+
+def prune_changes(conn, days=RETENTION_DAYS):
+    """Drop changes older than `days`; clients behind the cut get a reset"""
+    through = conn.execute("SELECT MAX(seq) FROM changes WHERE created_at < datetime('now', ?)",
+                           (f'-{int(days)} days',)).fetchone()[0]
+    if through is None:
+        return 0
+    conn.execute('INSERT OR REPLACE INTO change_log_state (id, pruned_through) VALUES (1, ?)', (through,))
+    return conn.execute('DELETE FROM changes WHERE seq <= ?', (through,)).rowcount
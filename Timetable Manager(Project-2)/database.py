@@ -1,19 +1,212 @@
+import os
 import sqlite3
+import threading
+from urllib.parse import quote
 from datetime import datetime
 from werkzeug.security import generate_password_hash
 import random
 
 DATABASE = 'timetable.db'
 
-def get_db_connection():
-    """Create database connection"""
-    conn = sqlite3.connect(DATABASE)
+# Optional per-tenant storage: when set, each user's data lives in its own
+# SQLite file in this directory and only the users table stays in DATABASE.
+SHARD_DIR = os.environ.get('TIMETABLE_SHARD_DIR')
+
+# Tenant tables without a user_id column, with the filter selecting one user's rows
+SHARED_TABLE_FILTERS = {
+    'teacher_availability': 'teacher_id IN (SELECT id FROM main.teachers WHERE user_id = :user_id)',
+    'version_entries': 'class_id IN (SELECT id FROM main.classes WHERE user_id = :user_id)',
+    # How far the change log was pruned; the copied log keeps the same sequence numbers
+    'change_log_state': 'id = 1',
+}
+
+# Seconds a connection waits for another writer before raising "database is locked"
+BUSY_TIMEOUT = float(os.environ.get('TIMETABLE_BUSY_TIMEOUT', 10))
+
+# Bump whenever init_db or create_tenant_tables changes; stored in each file's PRAGMA user_version
+SCHEMA_VERSION = 1
+
+_ready_shards = set()
+_initialized = False
+_init_lock = threading.Lock()
+
+def _connect(path, readonly=False):
+    """Open a connection; writers take the write lock at their first statement that writes
+
+    Read-only connections open the file with mode=ro, so under WAL they never
+    block or wait on the writer. Writers use BEGIN IMMEDIATE, so two writers
+    queue on the busy timeout instead of failing mid-transaction on a lock upgrade.
+    """
+    if readonly:
+        conn = sqlite3.connect(f'file:{quote(os.path.abspath(path))}?mode=ro', uri=True,
+                               timeout=BUSY_TIMEOUT)
+    else:
+        conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level='IMMEDIATE')
     conn.row_factory = sqlite3.Row
     return conn
 
-def init_db():
-    """Initialize database with all tables"""
-    conn = get_db_connection()
+def enable_wal(conn):
+    """Switch a database file to write-ahead logging (persistent, so once per file is enough)"""
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+
+def schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def stamp_schema_version(conn):
+    conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+def add_column(conn, table, column, definition):
+    """Add a column introduced after a table first shipped; CREATE TABLE IF NOT EXISTS skips existing tables"""
+    if column not in {row['name'] for row in conn.execute(f'PRAGMA table_info({table})')}:
+        conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+def prepare_shard(path):
+    """Create a tenant file's tables unless its schema is already current"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    conn = _connect(path)
+    if schema_version(conn) < SCHEMA_VERSION:
+        enable_wal(conn)
+        create_tenant_tables(conn)
+        stamp_schema_version(conn)
+    conn.close()
+
+def shard_path(user_id):
+    return os.path.join(SHARD_DIR, f'user_{int(user_id)}.db')
+
+def _session_user_id():
+    try:
+        from flask import has_request_context, session
+    except ImportError:
+        return None
+    return session.get('user_id') if has_request_context() else None
+
+def _is_read_request():
+    try:
+        from flask import has_request_context, request
+    except ImportError:
+        return False
+    return has_request_context() and request.method in ('GET', 'HEAD')
+
+def get_db_connection(user_id=None, readonly=None):
+    """Create database connection
+
+    GET and HEAD requests get a read-only connection unless readonly is given;
+    everything else goes through the writer path. With sharding enabled the
+    connection is routed to the tenant's file, using the logged-in user from
+    the session when no user_id is given.
+    """
+    if readonly is None:
+        readonly = _is_read_request()
+    if not SHARD_DIR:
+        return _connect(DATABASE, readonly)
+    if user_id is None:
+        user_id = _session_user_id()
+    if user_id is None:
+        return _connect(DATABASE, readonly)
+
+    path = shard_path(user_id)
+    if path not in _ready_shards:
+        prepare_shard(path)
+        _ready_shards.add(path)
+    return _connect(path, readonly)
+
+def get_users_connection():
+    """Connection to the database holding the users table (never sharded)"""
+    return _connect(DATABASE)
+
+def database_files():
+    """Every SQLite file in use: the main database plus any tenant shards"""
+    files = [DATABASE]
+    if SHARD_DIR and os.path.isdir(SHARD_DIR):
+        files += sorted(os.path.join(SHARD_DIR, name) for name in os.listdir(SHARD_DIR)
+                        if name.startswith('user_') and name.endswith('.db'))
+    return files
+
+def tenant_tables(conn):
+    """(table, filter selecting one user's rows) for every tenant table in the live schema
+
+    Tables with a user_id column are filtered on it, a few others through
+    SHARED_TABLE_FILTERS. Full-text index tables are left out: the triggers
+    that maintain them fill them as rows are copied. The change log comes
+    first, so rows the copy itself logs are numbered after the copied ones.
+    """
+    virtual = [row['name'] for row in conn.execute(
+        "SELECT name FROM main.sqlite_master WHERE type = 'table' AND sql LIKE 'CREATE VIRTUAL TABLE%'")]
+    tables = []
+    for (table,) in conn.execute("""
+        SELECT name FROM main.sqlite_master
+        WHERE type = 'table' AND name NOT LIKE 'sqlite%' AND sql NOT LIKE 'CREATE VIRTUAL TABLE%'
+        ORDER BY name != 'changes', name
+    """).fetchall():
+        if any(table.startswith(f'{name}_') for name in virtual):
+            continue
+        columns = {row['name'] for row in conn.execute(f'PRAGMA main.table_info({table})')}
+        if 'user_id' in columns:
+            tables.append((table, 'user_id = :user_id'))
+        elif table in SHARED_TABLE_FILTERS:
+            tables.append((table, SHARED_TABLE_FILTERS[table]))
+    return tables
+
+def split_into_shards(shard_dir, source=DATABASE):
+    """Copy each user's rows from a shared database into per-user files under shard_dir.
+
+    Ids are kept so references between tables stay valid. The source database is
+    left untouched; the users table stays there. Returns {user_id: rows copied}.
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+    conn = _connect(source)
+    copied = {}
+    for (user_id,) in conn.execute('SELECT id FROM users ORDER BY id').fetchall():
+        path = os.path.join(shard_dir, f'user_{user_id}.db')
+        prepare_shard(path)
+
+        conn.execute('ATTACH DATABASE ? AS shard', (path,))
+        total = 0
+        for table, where in tenant_tables(conn):
+            # Only columns both schemas share; older databases may carry extra ones
+            shard_columns = {row['name'] for row in conn.execute(f'PRAGMA shard.table_info({table})')}
+            columns = ', '.join(row['name'] for row in conn.execute(f'PRAGMA main.table_info({table})')
+                                if row['name'] in shard_columns)
+            if not columns:
+                continue
+            total += conn.execute(f'''
+                INSERT OR REPLACE INTO shard.{table} ({columns})
+                SELECT {columns} FROM main.{table} WHERE {where}
+            ''', {'user_id': user_id}).rowcount
+        conn.commit()
+        conn.execute('DETACH DATABASE shard')
+        copied[user_id] = total
+    conn.close()
+    return copied
+
+def ensure_db():
+    """Create or upgrade the schema once per process, and only when its schema version is behind
+
+    After the first call this is a flag check, so it is safe on every request.
+    It never seeds data: the demo account comes from `manage.py init-db`.
+    """
+    global _initialized
+    if _initialized:
+        return
+    with _init_lock:
+        if _initialized:
+            return
+        conn = get_users_connection()
+        current = schema_version(conn) >= SCHEMA_VERSION
+        conn.close()
+        if not current:
+            init_db(seed_demo=False)
+        _initialized = True
+
+def init_db(seed_demo=False):
+    """Create or upgrade all tables, seed the demo account if asked, and stamp the schema version"""
+    import feeds
+
+    if SHARD_DIR:
+        os.makedirs(SHARD_DIR, exist_ok=True)
+    conn = get_users_connection()
+    enable_wal(conn)
     
     # Users table
     conn.execute('''
@@ -28,7 +221,58 @@ def init_db():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     ''')
+
+    # Calendar feed tokens resolve to a user before any tenant database is opened
+    feeds.create_feed_token_table(conn)
+
+    if not SHARD_DIR:
+        create_tenant_tables(conn)
+
+    if seed_demo:
+        seed_demo_data(conn)
+
+    # Stamped last, so an interrupted initialization runs again
+    stamp_schema_version(conn)
+    conn.close()
+
+def seed_demo_data(conn):
+    """Create the demo admin with sample data when there are no users yet"""
+    user_count = conn.execute('SELECT COUNT(*) FROM users').fetchone()[0]
     
+    if user_count == 0:
+        # Create demo admin user
+        demo_password = generate_password_hash('admin123')
+        conn.execute('''
+            INSERT INTO users (name, email, password, role, institution)
+            VALUES (?, ?, ?, ?, ?)
+        ''', ('Admin User', 'admin@timetable.com', demo_password, 'admin', 'Demo University'))
+        conn.commit()
+        
+        admin_id = conn.execute('SELECT id FROM users WHERE email = ?', 
+                               ('admin@timetable.com',)).fetchone()[0]
+        
+        print("=" * 70)
+        print("✅ Demo admin user created!")
+        print("=" * 70)
+        print("Email:    admin@timetable.com")
+        print("Password: admin123")
+        print("=" * 70)
+        
+        # Add sample data
+        data_conn = get_db_connection(admin_id, readonly=False)
+        add_sample_data(data_conn, admin_id)
+        data_conn.close()
+
+def create_tenant_tables(conn):
+    """Create the tables holding tenant data"""
+    # Only needed when the schema is created or upgraded, so importing this module stays cheap
+    import changes
+    import entry_storage
+    import feeds
+    import listing
+    import snapshot
+    import versions
+
     # Teachers table
     conn.execute('''
         CREATE TABLE IF NOT EXISTS teachers (
@@ -102,26 +346,11 @@ def init_db():
         )
     ''')
     
-    # Timetable entries table
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS timetable_entries (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            class_id INTEGER,
-            subject_id INTEGER,
-            teacher_id INTEGER,
-            room_id INTEGER,
-            time_slot_id INTEGER,
-            day TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            user_id INTEGER,
-            FOREIGN KEY (class_id) REFERENCES classes (id),
-            FOREIGN KEY (subject_id) REFERENCES subjects (id),
-            FOREIGN KEY (teacher_id) REFERENCES teachers (id),
-            FOREIGN KEY (room_id) REFERENCES rooms (id),
-            FOREIGN KEY (time_slot_id) REFERENCES time_slots (id),
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    ''')
+    # Timetable versions and the version each class shows; versions share unchanged entries
+    versions.create_version_tables(conn)
+
+    # Timetable entries: compact WITHOUT ROWID table plus the timetable_entries view
+    entry_storage.create_entry_storage(conn)
     
     # Teacher availability table
     conn.execute('''
@@ -136,32 +365,65 @@ def init_db():
         )
     ''')
     
-    # Check if demo user exists
-    user_count = conn.execute('SELECT COUNT(*) FROM users').fetchone()[0]
-    
-    if user_count == 0:
-        # Create demo admin user
-        demo_password = generate_password_hash('admin123')
-        conn.execute('''
-            INSERT INTO users (name, email, password, role, institution)
-            VALUES (?, ?, ?, ?, ?)
-        ''', ('Admin User', 'admin@timetable.com', demo_password, 'admin', 'Demo University'))
-        conn.commit()
-        
-        admin_id = conn.execute('SELECT id FROM users WHERE email = ?', 
-                               ('admin@timetable.com',)).fetchone()[0]
-        
-        print("=" * 70)
-        print("✅ Demo admin user created!")
-        print("=" * 70)
-        print("Email:    admin@timetable.com")
-        print("Password: admin123")
-        print("=" * 70)
-        
-        # Add sample data
-        add_sample_data(conn, admin_id)
-    
-    conn.close()
+    # Generation runs: status, search statistics and optional cProfile capture
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS generation_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            class_id INTEGER,
+            status TEXT DEFAULT 'running',
+            stats TEXT,
+            profile BLOB,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP,
+            user_id INTEGER,
+            FOREIGN KEY (class_id) REFERENCES classes (id),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    # Result of a completed run, returned to requests that coalesced onto it
+    add_column(conn, 'generation_runs', 'result', 'TEXT')
+
+    # Weekly lectures each class needs per subject, as last generated; the validator checks coverage against it
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS class_subjects (
+            class_id INTEGER NOT NULL,
+            subject_id INTEGER NOT NULL,
+            hours INTEGER NOT NULL,
+            user_id INTEGER,
+            PRIMARY KEY (class_id, subject_id),
+            FOREIGN KEY (class_id) REFERENCES classes (id),
+            FOREIGN KEY (subject_id) REFERENCES subjects (id),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+    # At most one generation per class at a time, across worker processes
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS generation_locks (
+            user_id INTEGER NOT NULL,
+            class_id INTEGER NOT NULL,
+            run_id INTEGER NOT NULL,
+            owner TEXT,
+            acquired_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            expires_at TIMESTAMP NOT NULL,
+            PRIMARY KEY (user_id, class_id)
+        )
+    ''')
+
+    # Keyset pagination indexes and the FTS5 search index for entity lists
+    listing.create_list_indexes(conn)
+    listing.create_search_index(conn)
+
+    # Change feed for incremental client sync
+    changes.create_change_log(conn)
+
+    # Published public display snapshots
+    snapshot.create_snapshot_table(conn)
+
+    # Term dates and holidays for calendar feeds
+    feeds.create_term_tables(conn)
+    conn.commit()
 
 def add_sample_data(conn, user_id):
     """Add comprehensive sample data with realistic timetable entries"""
@@ -409,5 +671,5 @@ def generate_timetable_entries(conn, user_id, days, slots_per_day):
     print("   • Timetable entries populated for all classes")
 
 if __name__ == '__main__':
-    init_db()
-    print("✅ Timetable database setup complete!")
\ No newline at end of file
+    init_db(seed_demo=True)
+    print("✅ Timetable database setup complete!")
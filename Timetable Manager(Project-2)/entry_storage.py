@@ -0,0 +1,261 @@
+"""Compact storage for timetable entries.
+
+Entries live in the WITHOUT ROWID table `entries`, keyed by the small
+integers (class_id, day_index, slot_number, id): the primary key b-tree
+holds the rows themselves, so a class's week is one contiguous range.
+Nothing repeats the day name or the time slot row; both are implied by the key.
+
+Timetable versions do not copy entries. `version_entries` lists the entries
+of each version (version 0 for a class that has never been versioned), so
+an entry unchanged between versions is stored once. A class shows the
+version named in active_timetable_versions, so rolling back only moves that
+pointer.
+
+`timetable_entries` stays available as a view of the entries each class
+shows, with the original columns, and INSTEAD OF triggers map writes through
+it, so existing queries keep working. An entry keeps its id when it is moved
+or edited; when other versions share it, they get a copy of the old row
+under a new id first, so editing one version never changes another.
+"""
+WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+DAY_INDEX = {day: i for i, day in enumerate(WEEKDAYS)}
+
+# Once the newest entry is deleted its id can be handed out again, as with a rowid table without AUTOINCREMENT
+NEXT_ID_SQL = '(SELECT COALESCE(MAX(id), 0) + 1 FROM entries)'
+
+
+def next_entry_id(conn):
+    """First id after every stored entry; callers inserting several entries count up from it"""
+    return conn.execute(f'SELECT {NEXT_ID_SQL}').fetchone()[0]
+
+
+def index_of_day(day):
+    try:
+        return DAY_INDEX[day]
+    except KeyError:
+        raise ValueError(f'Unknown day: {day}')
+
+
+SLOT_OF = 'SELECT {column} FROM time_slots ts JOIN weekdays w ON w.day = ts.day WHERE ts.id = NEW.time_slot_id'
+
+
+def active_version_sql(class_id):
+    """SQL expression of the version a class shows"""
+    return f'COALESCE((SELECT a.version_id FROM active_timetable_versions a WHERE a.class_id = {class_id}), 0)'
+
+
+def live_sql(row):
+    """SQL condition true for entries of the version their class currently shows"""
+    return (f'EXISTS (SELECT 1 FROM version_entries ve WHERE ve.class_id = {row}.class_id '
+            f'AND ve.version_id = {active_version_sql(f"{row}.class_id")} AND ve.entry_id = {row}.id)')
+
+
+def slot_checks(condition=''):
+    """Trigger statements rejecting a NEW.time_slot_id that does not fit the entry key"""
+    return (f"SELECT RAISE(ABORT, 'Unknown time slot, or its day is not a weekday name') "
+            f"WHERE {condition} NOT EXISTS ({SLOT_OF.format(column='1')}); "
+            f"SELECT RAISE(ABORT, 'Time slot has no slot number') "
+            f"WHERE {condition} ({SLOT_OF.format(column='ts.slot_number')}) IS NULL;")
+
+
+def cell_check(condition='', moving=False):
+    """Trigger statement rejecting a NEW entry for a cell its class already fills in the version shown"""
+    other = 'AND e.id <> OLD.id ' if moving else ''
+    return (f"SELECT RAISE(ABORT, 'Class already has an entry in this time slot') "
+            f"WHERE {condition} EXISTS (SELECT 1 FROM entries e "
+            f"JOIN time_slots ts ON ts.id = NEW.time_slot_id JOIN weekdays w ON w.day = ts.day "
+            f"WHERE e.class_id = NEW.class_id AND e.day_index = w.day_index AND e.slot_number = ts.slot_number "
+            f"{other}AND {live_sql('e')});")
+
+
+def copy_for_other_versions():
+    """Trigger statements moving the versions not shown that share the OLD entry onto a copy of it"""
+    shown = active_version_sql('OLD.class_id')
+    return f'''
+        INSERT INTO entries (id, class_id, day_index, slot_number, subject_id, teacher_id, room_id, user_id)
+        SELECT {NEXT_ID_SQL}, class_id, day_index, slot_number, subject_id, teacher_id, room_id, user_id
+        FROM entries WHERE id = OLD.id
+          AND EXISTS (SELECT 1 FROM version_entries WHERE entry_id = OLD.id AND version_id <> {shown});
+        UPDATE version_entries SET entry_id = (SELECT MAX(id) FROM entries)
+        WHERE entry_id = OLD.id AND version_id <> {shown};
+    '''
+
+
+def create_entry_storage(conn):
+    """Create the compact table and the compatibility view, migrating the old timetable_entries table.
+
+    Needs active_timetable_versions to exist. Returns the number of entries
+    migrated from the old table (0 when there was none).
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS weekdays (
+            day_index INTEGER PRIMARY KEY,
+            day TEXT UNIQUE NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    conn.executemany('INSERT OR IGNORE INTO weekdays (day_index, day) VALUES (?, ?)', enumerate(WEEKDAYS))
+
+    # Rebuilt on every schema upgrade (dropping the view drops its triggers), so both follow this code
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = 'timetable_entries'").fetchone()
+    if row and row[0] == 'view':
+        conn.execute('DROP VIEW timetable_entries')
+
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS entries (
+            id INTEGER NOT NULL,
+            class_id INTEGER NOT NULL,
+            day_index INTEGER NOT NULL CHECK (day_index BETWEEN 0 AND {len(WEEKDAYS) - 1}),
+            slot_number INTEGER NOT NULL,
+            subject_id INTEGER,
+            teacher_id INTEGER,
+            room_id INTEGER,
+            user_id INTEGER NOT NULL,
+            PRIMARY KEY (class_id, day_index, slot_number, id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_entries_id ON entries (id)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS version_entries (
+            class_id INTEGER NOT NULL,
+            version_id INTEGER NOT NULL,
+            entry_id INTEGER NOT NULL,
+            PRIMARY KEY (class_id, version_id, entry_id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_version_entries_entry ON version_entries (entry_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_entries_teacher ON entries (teacher_id, day_index, slot_number)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_entries_room ON entries (room_id, day_index, slot_number)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_entries_user ON entries (user_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_time_slots_cell ON time_slots (user_id, day, slot_number)')
+
+    # Present even when empty, so every tenant file has the same tables
+    create_unmigrated_table(conn)
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = 'timetable_entries'").fetchone()
+    migrated = _migrate(conn) if row and row[0] == 'table' else 0
+
+    conn.execute(f'''
+        CREATE VIEW timetable_entries AS
+        SELECT e.id, e.class_id, e.subject_id, e.teacher_id, e.room_id,
+               (SELECT MIN(ts.id) FROM time_slots ts
+                WHERE ts.user_id = e.user_id AND ts.day = w.day AND ts.slot_number = e.slot_number) AS time_slot_id,
+               w.day, e.user_id
+        FROM entries e JOIN weekdays w ON w.day_index = e.day_index
+        WHERE {live_sql('e')}
+    ''')
+    # The version entry is listed first, so the change log triggers on `entries` see the row as shown
+    conn.execute(f'''
+        CREATE TRIGGER timetable_entries_insert INSTEAD OF INSERT ON timetable_entries BEGIN
+            {slot_checks()}
+            {cell_check()}
+            INSERT INTO version_entries (class_id, version_id, entry_id)
+            VALUES (NEW.class_id, {active_version_sql('NEW.class_id')}, COALESCE(NEW.id, {NEXT_ID_SQL}));
+            INSERT INTO entries
+            (id, class_id, day_index, slot_number, subject_id, teacher_id, room_id, user_id)
+            SELECT COALESCE(NEW.id, {NEXT_ID_SQL}), NEW.class_id, w.day_index, ts.slot_number,
+                   NEW.subject_id, NEW.teacher_id, NEW.room_id, COALESCE(NEW.user_id, ts.user_id)
+            FROM time_slots ts JOIN weekdays w ON w.day = ts.day WHERE ts.id = NEW.time_slot_id;
+        END
+    ''')
+    # Rows are changed in place, so an entry keeps its id when it moves
+    conn.execute(f'''
+        CREATE TRIGGER timetable_entries_update INSTEAD OF UPDATE ON timetable_entries BEGIN
+            {slot_checks('NEW.time_slot_id IS NOT OLD.time_slot_id AND')}
+            {cell_check('(NEW.time_slot_id IS NOT OLD.time_slot_id OR NEW.class_id IS NOT OLD.class_id) AND', moving=True)}
+            {copy_for_other_versions()}
+            UPDATE version_entries SET
+                class_id = NEW.class_id, version_id = {active_version_sql('NEW.class_id')}, entry_id = NEW.id
+            WHERE entry_id = OLD.id;
+            UPDATE entries SET
+                id = NEW.id, class_id = NEW.class_id,
+                subject_id = NEW.subject_id, teacher_id = NEW.teacher_id, room_id = NEW.room_id,
+                user_id = NEW.user_id,
+                day_index = COALESCE(({SLOT_OF.format(column='w.day_index')}), day_index),
+                slot_number = COALESCE(({SLOT_OF.format(column='ts.slot_number')}), slot_number)
+            WHERE id = OLD.id;
+        END
+    ''')
+    # The version entry goes last, so the change log triggers on `entries` still see the row as shown
+    conn.execute(f'''
+        CREATE TRIGGER timetable_entries_delete INSTEAD OF DELETE ON timetable_entries BEGIN
+            {copy_for_other_versions()}
+            DELETE FROM entries WHERE id = OLD.id;
+            DELETE FROM version_entries WHERE entry_id = OLD.id;
+        END
+    ''')
+    return migrated
+
+
+def create_unmigrated_table(conn):
+    """Rows the migration could not place, kept with the reason instead of being dropped"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS unmigrated_entries (
+            id INTEGER PRIMARY KEY,
+            class_id INTEGER,
+            subject_id INTEGER,
+            teacher_id INTEGER,
+            room_id INTEGER,
+            time_slot_id INTEGER,
+            day TEXT,
+            user_id INTEGER,
+            reason TEXT NOT NULL
+        )
+    ''')
+
+
+def _migrate(conn):
+    """Move rows from the old rowid timetable_entries table into `entries` and drop it; the caller commits.
+
+    Entries keep their ids and start out unversioned (version 0). Rows that do
+    not fit the new key (no class or owner, an unknown time slot, a day outside
+    WEEKDAYS, no slot number, or the older of two entries in one cell) are
+    kept in `unmigrated_entries` with the reason.
+    """
+    create_unmigrated_table(conn)
+    conn.execute('DROP TABLE IF EXISTS temp.entry_migration')
+    conn.execute('''
+        CREATE TEMP TABLE entry_migration AS
+        SELECT te.id, te.class_id, te.subject_id, te.teacher_id, te.room_id, te.time_slot_id, te.day,
+               COALESCE(te.user_id, ts.user_id) AS user_id, w.day_index, ts.slot_number,
+               CASE
+                   WHEN te.class_id IS NULL THEN 'no class'
+                   WHEN ts.id IS NULL THEN 'unknown time slot'
+                   WHEN COALESCE(te.user_id, ts.user_id) IS NULL THEN 'no owner'
+                   WHEN w.day_index IS NULL THEN 'unsupported day'
+                   WHEN ts.slot_number IS NULL THEN 'no slot number'
+               END AS reason
+        FROM timetable_entries te
+        LEFT JOIN time_slots ts ON ts.id = te.time_slot_id
+        LEFT JOIN weekdays w ON w.day = ts.day
+    ''')
+    # The newest entry of a cell is migrated, as the grids showed it last
+    conn.execute('''
+        UPDATE entry_migration SET reason = 'duplicate cell'
+        WHERE reason IS NULL AND EXISTS (
+            SELECT 1 FROM entry_migration newer
+            WHERE newer.reason IS NULL AND newer.id > entry_migration.id AND newer.class_id = entry_migration.class_id
+              AND newer.day_index = entry_migration.day_index AND newer.slot_number = entry_migration.slot_number)
+    ''')
+
+    conn.execute('''
+        INSERT INTO version_entries (class_id, version_id, entry_id)
+        SELECT class_id, 0, id FROM entry_migration WHERE reason IS NULL
+    ''')
+    migrated = conn.execute('''
+        INSERT INTO entries
+        (id, class_id, day_index, slot_number, subject_id, teacher_id, room_id, user_id)
+        SELECT id, class_id, day_index, slot_number, subject_id, teacher_id, room_id, user_id
+        FROM entry_migration WHERE reason IS NULL
+    ''').rowcount
+    set_aside = conn.execute('''
+        INSERT INTO unmigrated_entries
+        (id, class_id, subject_id, teacher_id, room_id, time_slot_id, day, user_id, reason)
+        SELECT id, class_id, subject_id, teacher_id, room_id, time_slot_id, day, user_id, reason
+        FROM entry_migration WHERE reason IS NOT NULL
+    ''').rowcount
+    source = conn.execute('SELECT COUNT(*) FROM timetable_entries').fetchone()[0]
+    if migrated + set_aside != source:
+        raise RuntimeError(f'Entry migration accounted for {migrated + set_aside} of {source} rows; '
+                           'nothing was changed')
+    conn.execute('DROP TABLE temp.entry_migration')
+    conn.execute('DROP TABLE timetable_entries')
+    return migrated
@@ -0,0 +1,259 @@
+"""Term calendars and iCalendar (.ics) feeds of the weekly timetable.
+
+The weekly pattern of a class, teacher or room is small, so it is fetched up
+front; the dated events of a term are expanded lazily by generators and
+streamed, so a whole semester is never held in memory.
+"""
+import hashlib
+import secrets
+from datetime import date, datetime, timedelta, timezone
+
+# Feed kind -> (entry column, table, label column)
+FEED_KINDS = {
+    'class': ('class_id', 'classes', 'name'),
+    'teacher': ('teacher_id', 'teachers', 'name'),
+    'room': ('room_id', 'rooms', 'room_number'),
+}
+WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+TIME_FORMATS = ('%I:%M %p', '%H:%M', '%H:%M:%S')
+PRODID = '-//Timetable Manager//Timetable Feed//EN'
+
+PATTERN_QUERY = '''
+    SELECT te.id, ts.day, ts.start_time, ts.end_time,
+           s.name AS subject_name, s.code AS subject_code, t.name AS teacher_name,
+           r.room_number, c.name AS class_name
+    FROM timetable_entries te
+    JOIN time_slots ts ON te.time_slot_id = ts.id
+    JOIN subjects s ON te.subject_id = s.id
+    JOIN teachers t ON te.teacher_id = t.id
+    LEFT JOIN rooms r ON te.room_id = r.id
+    JOIN classes c ON te.class_id = c.id
+    WHERE te.user_id = ? AND te.{column} = ?
+'''
+
+
+def create_term_tables(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS terms (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            start_date TEXT NOT NULL,
+            end_date TEXT NOT NULL,
+            user_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS term_holidays (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            term_id INTEGER,
+            date TEXT NOT NULL,
+            name TEXT,
+            user_id INTEGER,
+            FOREIGN KEY (term_id) REFERENCES terms (id),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+
+def create_feed_token_table(conn):
+    """Feed tokens map a subscription URL to its user; kept next to the users table"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS calendar_feeds (
+            user_id INTEGER PRIMARY KEY,
+            token TEXT UNIQUE NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+
+# ----------------------------------------------------------------------
+# Terms
+# ----------------------------------------------------------------------
+
+def parse_date(value, field):
+    try:
+        return date.fromisoformat(str(value))
+    except ValueError:
+        raise ValueError(f'{field} must be a YYYY-MM-DD date')
+
+
+def save_term(conn, user_id, data):
+    """Create a term with its holidays; the caller commits"""
+    start = parse_date(data.get('start_date'), 'start_date')
+    end = parse_date(data.get('end_date'), 'end_date')
+    if end < start:
+        raise ValueError('end_date is before start_date')
+
+    holidays = []
+    for holiday in data.get('holidays') or []:
+        if not isinstance(holiday, dict):
+            holiday = {'date': holiday}
+        holidays.append((parse_date(holiday.get('date'), 'holiday date').isoformat(), holiday.get('name')))
+
+    term_id = conn.execute('''
+        INSERT INTO terms (name, start_date, end_date, user_id) VALUES (?, ?, ?, ?)
+    ''', (data.get('name') or f'{start.isoformat()} term', start.isoformat(), end.isoformat(),
+          user_id)).lastrowid
+    conn.executemany('INSERT INTO term_holidays (term_id, date, name, user_id) VALUES (?, ?, ?, ?)',
+                     [(term_id, day, name, user_id) for day, name in holidays])
+    return term_id
+
+
+def list_terms(conn, user_id):
+    terms = [dict(t) for t in conn.execute(
+        'SELECT id, name, start_date, end_date FROM terms WHERE user_id = ? ORDER BY start_date',
+        (user_id,))]
+    holidays = {}
+    for h in conn.execute('SELECT term_id, date, name FROM term_holidays WHERE user_id = ? ORDER BY date',
+                          (user_id,)):
+        holidays.setdefault(h['term_id'], []).append({'date': h['date'], 'name': h['name']})
+    for term in terms:
+        term['holidays'] = holidays.get(term['id'], [])
+    return terms
+
+
+def delete_term(conn, user_id, term_id):
+    conn.execute('DELETE FROM term_holidays WHERE term_id = ? AND user_id = ?', (term_id, user_id))
+    return conn.execute('DELETE FROM terms WHERE id = ? AND user_id = ?', (term_id, user_id)).rowcount > 0
+
+
+# ----------------------------------------------------------------------
+# Feed tokens
+# ----------------------------------------------------------------------
+
+def feed_token(users_conn, user_id):
+    """The user's feed token, created on first use; the caller commits"""
+    row = users_conn.execute('SELECT token FROM calendar_feeds WHERE user_id = ?', (user_id,)).fetchone()
+    if row:
+        return row['token']
+    token = secrets.token_urlsafe(16)
+    users_conn.execute('INSERT INTO calendar_feeds (user_id, token) VALUES (?, ?)', (user_id, token))
+    return token
+
+
+def user_for_token(users_conn, token):
+    row = users_conn.execute('SELECT user_id FROM calendar_feeds WHERE token = ?', (token,)).fetchone()
+    return row['user_id'] if row else None
+
+
+# ----------------------------------------------------------------------
+# Feeds
+# ----------------------------------------------------------------------
+
+def feed_etag(conn, user_id, kind, resource_id, last_seq):
+    """Validator that changes whenever timetable data or terms change, computed without expanding"""
+    digest = hashlib.sha1(f'{kind}:{resource_id}:{last_seq}'.encode())
+    for row in conn.execute('SELECT id, start_date, end_date FROM terms WHERE user_id = ? ORDER BY id',
+                            (user_id,)):
+        digest.update(repr(tuple(row)).encode())
+    for row in conn.execute('SELECT term_id, date FROM term_holidays WHERE user_id = ? ORDER BY id',
+                            (user_id,)):
+        digest.update(repr(tuple(row)).encode())
+    return digest.hexdigest()
+
+
+def feed_name(conn, user_id, kind, resource_id):
+    """Label of the class, teacher or room a feed covers; None when it does not exist"""
+    _, table, label = FEED_KINDS[kind]
+    row = conn.execute(f'SELECT {label} FROM {table} WHERE id = ? AND user_id = ?',
+                       (resource_id, user_id)).fetchone()
+    return row[0] if row else None
+
+
+def load_feed(conn, user_id, kind, resource_id):
+    """Everything a feed needs, fetched up front so the connection is closed before streaming"""
+    pattern = [dict(row) for row in conn.execute(PATTERN_QUERY.format(column=FEED_KINDS[kind][0]),
+                                                 (user_id, resource_id))]
+    terms = list_terms(conn, user_id)
+    return pattern, terms
+
+
+def parse_time(value):
+    for fmt in TIME_FORMATS:
+        try:
+            return datetime.strptime(value.strip(), fmt).time()
+        except (ValueError, AttributeError):
+            continue
+    return None
+
+
+def term_dates(term):
+    """Teaching dates of a term, lazily, skipping holidays"""
+    holidays = {h['date'] for h in term['holidays']}
+    day = date.fromisoformat(term['start_date'])
+    end = date.fromisoformat(term['end_date'])
+    while day <= end:
+        if day.isoformat() not in holidays:
+            yield day
+        day += timedelta(days=1)
+
+
+def expand_events(pattern, terms):
+    """Yield (uid, start, end, entry) for every dated occurrence of the weekly pattern"""
+    by_weekday = {}
+    for entry in pattern:
+        start, end = parse_time(entry['start_time']), parse_time(entry['end_time'])
+        if entry['day'] in WEEKDAYS and start and end:
+            by_weekday.setdefault(WEEKDAYS.index(entry['day']), []).append((start, end, entry))
+    for entries in by_weekday.values():
+        entries.sort(key=lambda e: e[0])
+
+    seen = set()
+    for term in terms:
+        for day in term_dates(term):
+            if day in seen:  # overlapping terms
+                continue
+            seen.add(day)
+            for start, end, entry in by_weekday.get(day.weekday(), ()):
+                yield (f"{entry['id']}-{day.strftime('%Y%m%d')}@timetable",
+                       datetime.combine(day, start), datetime.combine(day, end), entry)
+
+
+def escape(text):
+    return (str(text or '').replace('\\', '\\\\').replace(';', '\\;')
+            .replace(',', '\\,').replace('\n', '\\n'))
+
+
+def fold(line):
+    """Fold a content line at 75 octets as RFC 5545 requires"""
+    data = line.encode('utf-8')
+    if len(data) <= 75:
+        return line + '\r\n'
+    parts, limit = [], 75
+    while data:
+        cut = min(limit, len(data))
+        while cut < len(data) and (data[cut] & 0xC0) == 0x80:  # keep UTF-8 sequences whole
+            cut -= 1
+        parts.append(data[:cut].decode('utf-8'))
+        data = data[cut:]
+        limit = 74
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def stream_ics(kind, name, pattern, terms):
+    """Generate the .ics document chunk by chunk (one chunk per event)"""
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    yield ''.join(fold(line) for line in (
+        'BEGIN:VCALENDAR', 'VERSION:2.0', f'PRODID:{PRODID}', 'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH', f'X-WR-CALNAME:{escape(name)}'))
+
+    for uid, start, end, entry in expand_events(pattern, terms):
+        summary = f"{entry['subject_code']} {entry['subject_name']}"
+        if kind != 'class':
+            summary += f" ({entry['class_name']})"
+        # Lectures without a room yet get no LOCATION rather than an empty one
+        location = [f"LOCATION:{escape(entry['room_number'])}"] if entry['room_number'] is not None else []
+        yield ''.join(fold(line) for line in (
+            'BEGIN:VEVENT',
+            f'UID:{uid}',
+            f'DTSTAMP:{stamp}',
+            f"DTSTART:{start.strftime('%Y%m%dT%H%M%S')}",
+            f"DTEND:{end.strftime('%Y%m%dT%H%M%S')}",
+            f'SUMMARY:{escape(summary)}',
+            *location,
+            f"DESCRIPTION:{escape('Teacher: ' + str(entry['teacher_name']))}",
+            'END:VEVENT'))
+
+    yield 'END:VCALENDAR\r\n'
@@ -0,0 +1,421 @@
+import cProfile
+import json
+import marshal
+import os
+import pstats
+import socket
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import entry_storage
+import versions
+from scheduler import TimetableModel, bit_count, keywords
+from room_assignment import assign_rooms
+
+# How many teachers are considered for each subject, best match first
+MAX_TEACHER_CANDIDATES = 3
+# Penalty for splitting a subject of one class between two teachers
+TEACHER_SWITCH_PENALTY = 4
+# Search budget for the hard-constraint stage
+MAX_SEARCH_NODES = 2000
+# How many constraints are reported as the tightest
+TIGHTEST_CONSTRAINTS = 5
+# Seconds after which a generation lock left by a crashed worker can be taken over
+LOCK_TTL = 600
+# How long a request attached to a running generation waits for it before returning the run id to poll
+ATTACH_WAIT = 3
+# How often a request attached to a running generation checks whether it finished
+ATTACH_POLL_INTERVAL = 0.1
+
+# NumPy adds a noticeable import cost, so the optimizer loads on the first generation
+_optimize_placement = False  # not imported yet
+
+
+def load_optimizer():
+    """The NumPy optimizer, imported on first use; None when NumPy is not installed"""
+    global _optimize_placement
+    if _optimize_placement is False:
+        try:
+            from optimizer import optimize_placement
+        except ImportError:  # NumPy is not installed: keep the constructive solution
+            optimize_placement = None
+        _optimize_placement = optimize_placement
+    return _optimize_placement
+
+
+class GenerationStats:
+    """Search counters and phase timings collected during one generation run"""
+
+    def __init__(self):
+        self.nodes = 0
+        self.backtracks = 0
+        self.constraint_checks = 0
+        self.rejections = Counter()
+        self.phase_ms = {}
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phase_ms[name] = round((time.perf_counter() - started) * 1000, 2)
+
+    def as_dict(self):
+        return {
+            'nodes_expanded': self.nodes,
+            'backtracks': self.backtracks,
+            'constraint_checks': self.constraint_checks,
+            'phase_ms': self.phase_ms,
+            'tightest_constraints': [{'constraint': name, 'rejections': count}
+                                     for name, count in self.rejections.most_common(TIGHTEST_CONSTRAINTS)],
+        }
+
+
+def build_lectures(model, subject_ids=None):
+    """Lectures a class needs.
+
+    With explicit subject_ids every subject gets its hours_per_week. Otherwise
+    the long-standing default applies: one lecture per subject, in order, until
+    the week is full.
+    """
+    if subject_ids:
+        lectures = []
+        for subject_id in subject_ids:
+            subject = model.subjects.get(int(subject_id))
+            if subject is None:
+                raise ValueError(f'Subject {subject_id} not found')
+            lectures.extend([subject['id']] * (subject.get('hours_per_week') or 1))
+        return lectures
+    return sorted(model.subjects)[:model.n_cells]
+
+
+def teacher_candidates(model, subject_id):
+    """Teachers for a subject: specialization match, then department match, then lightest load"""
+    subject = model.subjects.get(subject_id) or {}
+    words = keywords(subject.get('name'))
+
+    def rank(teacher_id):
+        teacher = model.teachers[teacher_id]
+        return (not (words & keywords(teacher.get('specialization'))),
+                teacher.get('department') != subject.get('department'),
+                model.teacher_week_load(teacher_id), teacher_id)
+
+    return sorted(model.teachers, key=rank)[:MAX_TEACHER_CANDIDATES]
+
+
+class ConstructiveSearch:
+    """Depth-first placement of a class's lectures under the hard constraints.
+
+    Variables are lectures, values are (cell, teacher) pairs. The next lecture is
+    the one with the fewest feasible values, and values are tried in order of
+    soft-constraint penalty, so the first complete placement is already decent.
+    """
+
+    def __init__(self, model, class_id, lectures, stats=None, max_nodes=MAX_SEARCH_NODES):
+        self.model = model
+        self.class_id = class_id
+        self.lectures = lectures
+        self.candidates = {s: teacher_candidates(model, s) for s in set(lectures)}
+        self.stats = stats or GenerationStats()
+        self.max_nodes = max_nodes
+        self.placement = {}
+        self.best = {}
+        self.skipped = set()
+
+        # The class holds one lecture per cell, so free rooms per cell never change during search
+        self.room_cells = {}
+        for subject_id in set(lectures):
+            practical = (model.subjects[subject_id].get('theory_practical') == 'Practical')
+            if practical not in self.room_cells:
+                self.room_cells[practical] = sum(
+                    1 << cell for cell in range(model.n_cells)
+                    if model.pick_room(class_id, subject_id, cell) is not None)
+
+    def _feasible_cells(self, subject_id, teacher_id):
+        """Bitmap of cells open to a (lecture, teacher) pair; one constraint check covers all cells"""
+        model, stats = self.model, self.stats
+        stats.constraint_checks += 1
+        max_day, max_week = model.teacher_limits(teacher_id)
+        practical = (model.subjects[subject_id].get('theory_practical') == 'Practical')
+        full_days = 0
+        for day_idx in range(len(model.days)):
+            if model.teacher_day_load(teacher_id, day_idx) >= max_day:
+                full_days |= model.day_mask(day_idx)
+
+        cells = model.all_cells
+        for constraint, blocked in (
+                ('class_busy', model.busy_cells('class', self.class_id)),
+                ('teacher_busy', model.busy_cells('teacher', teacher_id)),
+                ('teacher_unavailable', model.unavailable.get(teacher_id, 0)),
+                ('no_free_room', ~self.room_cells[practical]),
+                ('teacher_daily_limit', full_days)):
+            rejected = cells & blocked
+            if rejected:
+                stats.rejections[constraint] += bit_count(rejected)
+                cells &= ~blocked
+        if cells and model.teacher_week_load(teacher_id) >= max_week:
+            stats.rejections['teacher_weekly_limit'] += bit_count(cells)
+            return 0
+        return cells
+
+    def _domain_size(self, index):
+        subject_id = self.lectures[index]
+        return sum(bit_count(self._feasible_cells(subject_id, t)) for t in self.candidates[subject_id])
+
+    def _values(self, index):
+        model, class_id = self.model, self.class_id
+        subject_id = self.lectures[index]
+        chosen = {model.entries[-i - 1]['teacher_id'] for i in self.placement
+                  if self.lectures[i] == subject_id}
+        values = []
+        for teacher_id in self.candidates[subject_id]:
+            for cell in model.cells(self._feasible_cells(subject_id, teacher_id)):
+                penalty = model.placement_penalty(class_id, subject_id, teacher_id, cell)
+                if chosen and teacher_id not in chosen:
+                    penalty += TEACHER_SWITCH_PENALTY
+                values.append((penalty, cell, teacher_id))
+        values.sort()
+        return values
+
+    def _place(self, index, cell, teacher_id):
+        model = self.model
+        subject_id = self.lectures[index]
+        room_id = model.pick_room(self.class_id, subject_id, cell)
+        model.add_entry({'id': -index - 1, 'class_id': self.class_id, 'subject_id': subject_id,
+                         'teacher_id': teacher_id, 'room_id': room_id}, cell)
+        self.placement[index] = cell
+
+    def _unplace(self, index):
+        self.model.remove_entry(-index - 1)
+        del self.placement[index]
+
+    def _search(self):
+        if len(self.placement) > len(self.best):
+            self.best = {i: (cell, self.model.entries[-i - 1]['teacher_id'])
+                         for i, cell in self.placement.items()}
+        if len(self.placement) + len(self.skipped) == len(self.lectures):
+            return True
+        if self.stats.nodes >= self.max_nodes:
+            return False
+
+        pending = [i for i in range(len(self.lectures))
+                   if i not in self.placement and i not in self.skipped]
+        index = min(pending, key=self._domain_size)
+        for _, cell, teacher_id in self._values(index):
+            self.stats.nodes += 1
+            self._place(index, cell, teacher_id)
+            if self._search():
+                return True
+            self._unplace(index)
+            self.stats.backtracks += 1
+            if self.stats.nodes >= self.max_nodes:
+                break
+        return False
+
+    def run(self):
+        """Search, then leave the best (possibly partial) placement in the model"""
+        # Lectures with no feasible value even on an empty timetable can never be placed
+        self.skipped = {i for i in range(len(self.lectures)) if self._domain_size(i) == 0}
+        self._search()
+        for index in list(self.placement):
+            self._unplace(index)
+        for index, (cell, teacher_id) in self.best.items():
+            self._place(index, cell, teacher_id)
+        return [i for i in range(len(self.lectures)) if i not in self.best]
+
+
+def generate_class_timetable(conn, user_id, class_id, subject_ids=None, optimize=True, stats=None):
+    """Generate and store the timetable of one class; the caller commits"""
+    class_id = int(class_id)
+    stats = stats or GenerationStats()
+
+    with stats.phase('load'):
+        rows = TimetableModel.fetch(conn, user_id)
+
+    with stats.phase('build_model'):
+        model = TimetableModel(*rows)
+        if class_id not in model.classes:
+            raise ValueError('Class not found')
+        for cell in list(model.cells(model.busy_cells('class', class_id))):
+            for entry in list(model.entries_at('class', class_id, cell)):
+                model.remove_entry(entry['id'])
+        lectures = build_lectures(model, subject_ids)
+
+    with stats.phase('search'):
+        search = ConstructiveSearch(model, class_id, lectures, stats)
+        unplaced = search.run()
+        placed_ids = [-i - 1 for i in sorted(search.placement)]
+
+    optimizer_stats = None
+    optimize_placement = load_optimizer() if optimize and placed_ids else None
+    if optimize_placement is not None:
+        with stats.phase('optimize'):
+            optimizer_stats = optimize_placement(model, placed_ids)
+
+    with stats.phase('room_assignment'):
+        _, roomless = assign_rooms(model, placed_ids)
+
+    with stats.phase('write'):
+        # The new timetable is written as its own version and then shown; the one it replaces stays listed
+        versions.sync_active_version(conn, user_id, class_id, 'Before regeneration')
+        version_id = versions.create_version(conn, user_id, class_id, 'Generated')
+        first_id = entry_storage.next_entry_id(conn)
+        placed = [model.entries[entry_id] for entry_id in placed_ids]
+        conn.executemany('INSERT INTO version_entries (class_id, version_id, entry_id) VALUES (?, ?, ?)',
+                         [(class_id, version_id, first_id + n) for n in range(len(placed))])
+        conn.executemany('''
+            INSERT INTO entries
+            (id, class_id, day_index, slot_number, subject_id, teacher_id, room_id, user_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(first_id + n, class_id, entry_storage.index_of_day(model.days[model.day_of(e['cell'])]),
+               model.slot_number_of(e['cell']), e['subject_id'], e['teacher_id'], e['room_id'], user_id)
+              for n, e in enumerate(placed)])
+        versions.activate_version(conn, user_id, class_id, version_id)
+        # What the class was generated for, with each subject's configured weekly hours, so validation
+        # can report subjects it did not get in full
+        conn.execute('DELETE FROM class_subjects WHERE class_id=? AND user_id=?', (class_id, user_id))
+        conn.executemany('INSERT INTO class_subjects (class_id, subject_id, hours, user_id) VALUES (?, ?, ?, ?)',
+                         [(class_id, subject_id, model.subjects[subject_id].get('hours_per_week'), user_id)
+                          for subject_id in sorted(set(lectures))])
+
+    return {
+        'version_id': version_id,
+        'placed': len(placed_ids),
+        'unplaced': [model.subjects[lectures[i]]['name'] for i in unplaced],
+        'without_room': [model.subjects[model.entries[entry_id]['subject_id']]['name'] for entry_id in roomless],
+        'optimizer': optimizer_stats,
+        'stats': stats.as_dict(),
+    }
+
+
+def _finish_run(conn, run_id, status, stats, profiler, result=None, error=None):
+    profile = marshal.dumps(pstats.Stats(profiler).stats) if profiler else None
+    conn.execute('''
+        UPDATE generation_runs SET status=?, stats=?, profile=?, result=?, error=?, finished_at=CURRENT_TIMESTAMP
+        WHERE id=?
+    ''', (status, json.dumps(stats.as_dict()), profile, json.dumps(result) if result is not None else None,
+          error, run_id))
+    conn.execute('DELETE FROM generation_locks WHERE run_id=?', (run_id,))
+
+
+def _start_run(conn, user_id, class_id):
+    """Open a run and take the class's generation lock in one transaction.
+
+    Returns (run_id, None) when this request should generate, or
+    (None, running run_id) when another request already holds the lock.
+    Both statements are single upserts under the write lock, so two workers
+    can never both win.
+    """
+    run_id = conn.execute('''
+        INSERT INTO generation_runs (class_id, status, user_id) VALUES (?, 'running', ?)
+    ''', (class_id, user_id)).lastrowid
+    claimed = conn.execute('''
+        INSERT INTO generation_locks (user_id, class_id, run_id, owner, expires_at)
+        VALUES (?, ?, ?, ?, datetime('now', ?))
+        ON CONFLICT (user_id, class_id) DO UPDATE SET
+            run_id = excluded.run_id, owner = excluded.owner,
+            acquired_at = CURRENT_TIMESTAMP, expires_at = excluded.expires_at
+        WHERE generation_locks.expires_at < datetime('now')
+    ''', (user_id, class_id, run_id, f'{socket.gethostname()}:{os.getpid()}', f'+{LOCK_TTL} seconds')).rowcount
+
+    if not claimed:
+        holder = conn.execute('SELECT run_id FROM generation_locks WHERE user_id=? AND class_id=?',
+                              (user_id, class_id)).fetchone()
+        conn.rollback()
+        return None, holder['run_id']
+
+    # Anything else still marked running for this class lost its lock to a crash
+    conn.execute('''
+        UPDATE generation_runs SET status='failed', error='Abandoned by its worker', finished_at=CURRENT_TIMESTAMP
+        WHERE user_id=? AND class_id=? AND status='running' AND id<>?
+    ''', (user_id, class_id, run_id))
+    conn.commit()
+    return run_id, None
+
+
+def _attach(conn, user_id, run_id, timeout):
+    """Wait briefly for another request's run and return its result instead of solving again.
+
+    A run still going after `timeout` seconds comes back as status 'running'
+    with its run_id, for the caller to poll, rather than holding the request.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        row = conn.execute('SELECT status, result, error FROM generation_runs WHERE id=? AND user_id=?',
+                           (run_id, user_id)).fetchone()
+        if row is None:
+            raise RuntimeError(f'Generation run {run_id} disappeared')
+        if row['status'] == 'completed':
+            return dict(json.loads(row['result'] or '{}'), run_id=run_id, status='completed', coalesced=True)
+        if row['status'] == 'failed':
+            raise RuntimeError(f"Concurrent generation failed: {row['error']}")
+        if time.monotonic() > deadline:
+            return {'run_id': run_id, 'status': 'running', 'coalesced': True}
+        time.sleep(ATTACH_POLL_INTERVAL)
+
+
+def run_generation(conn, user_id, class_id, subject_ids=None, optimize=True, profile=False):
+    """Generate a class timetable and record the run in generation_runs.
+
+    Generation is single-flight per class: while a run holds the class's row in
+    generation_locks, other requests (from any worker process) attach to it and
+    return its result with coalesced=True, or status 'running' and its run_id
+    if it does not finish within ATTACH_WAIT. The run row is committed as
+    'running' first so its status can be polled. With profile=True a cProfile
+    capture is stored with the run, in the same marshal format as pstats dump
+    files.
+    """
+    run_id, running_id = _start_run(conn, user_id, class_id)
+    if run_id is None:
+        return _attach(conn, user_id, running_id, ATTACH_WAIT)
+
+    stats = GenerationStats()
+    profiler = cProfile.Profile() if profile else None
+    try:
+        if profiler:
+            profiler.enable()
+        try:
+            result = generate_class_timetable(conn, user_id, class_id, subject_ids, optimize, stats)
+        finally:
+            if profiler:
+                profiler.disable()
+    except Exception as e:
+        conn.rollback()
+        _finish_run(conn, run_id, 'failed', stats, profiler, error=str(e))
+        conn.commit()
+        raise
+
+    _finish_run(conn, run_id, 'completed', stats, profiler, result=result)
+    conn.commit()
+    return dict(result, run_id=run_id, status='completed', coalesced=False)
+
+
+RUN_COLUMNS = '''
+    SELECT id, class_id, status, stats, result, error, created_at, finished_at, profile IS NOT NULL AS has_profile
+    FROM generation_runs
+'''
+
+
+def _run_dict(row):
+    run = dict(row)
+    run['stats'] = json.loads(run['stats']) if run['stats'] else None
+    run['result'] = json.loads(run['result']) if run['result'] else None
+    run['has_profile'] = bool(run['has_profile'])
+    return run
+
+
+def get_run(conn, user_id, run_id):
+    row = conn.execute(RUN_COLUMNS + ' WHERE id=? AND user_id=?', (run_id, user_id)).fetchone()
+    return _run_dict(row) if row else None
+
+
+def list_runs(conn, user_id, class_id=None, limit=50):
+    """Most recent runs first, optionally for one class"""
+    if class_id is None:
+        rows = conn.execute(RUN_COLUMNS + ' WHERE user_id=? ORDER BY id DESC LIMIT ?', (user_id, limit))
+    else:
+        rows = conn.execute(RUN_COLUMNS + ' WHERE user_id=? AND class_id=? ORDER BY id DESC LIMIT ?',
+                            (user_id, class_id, limit))
+    return [_run_dict(row) for row in rows]
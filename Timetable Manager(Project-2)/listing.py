@@ -0,0 +1,208 @@
+import base64
+import json
+import re
+import sqlite3
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Per entity: table, sortable columns (with the value NULLs sort as) and the
+# columns copied into the search index
+ENTITIES = {
+    'teachers': {
+        'sort': {'name': "''", 'department': "''", 'specialization': "''", 'email': "''",
+                 'max_hours_per_week': '0'},
+        'search': ('name', 'email', 'department', 'specialization'),
+    },
+    'subjects': {
+        'sort': {'name': "''", 'code': "''", 'department': "''", 'credits': '0', 'hours_per_week': '0'},
+        'search': ('name', 'code', 'department', 'theory_practical'),
+    },
+    'rooms': {
+        'sort': {'room_number': "''", 'name': "''", 'capacity': '0', 'room_type': "''"},
+        'search': ('name', 'room_number', 'room_type'),
+    },
+    'classes': {
+        'sort': {'name': "''", 'semester': "''", 'department': "''", 'num_students': '0'},
+        'search': ('name', 'semester', 'department'),
+    },
+}
+
+# Filters accepted as exact-match query parameters
+FILTERS = {
+    'teachers': ('department',),
+    'subjects': ('department', 'theory_practical'),
+    'rooms': ('room_type',),
+    'classes': ('department', 'semester'),
+}
+
+
+def search_document(spec, alias='NEW'):
+    """SQL expression joining an entity's searchable columns into one text"""
+    return " || ' ' || ".join(f"COALESCE({alias}.{column}, '')" for column in spec['search'])
+
+
+# Index rows are keyed by rowid = entity id * KIND_SLOTS + kind number, and
+# tagged with a "u<user_id><kind>" scope token in an indexed column. Both the
+# user/kind filter and the id lookup then stay inside the FTS index without
+# reading stored column values.
+KIND_SLOTS = 8
+KIND_NUMBERS = {kind: number for number, kind in enumerate(ENTITIES)}
+
+
+def _rowid_sql(kind, alias):
+    return f'{alias}.id * {KIND_SLOTS} + {KIND_NUMBERS[kind]}'
+
+
+def _scope_sql(kind, alias):
+    return f"'u' || {alias}.user_id || '{kind}'"
+
+
+def create_search_index(conn):
+    """FTS5 index over entity names, codes, departments and specializations.
+
+    Triggers keep it in step with every write path. Returns False when the
+    SQLite build has no FTS5; listing then falls back to LIKE matching.
+    """
+    existed = has_search_index(conn)
+    try:
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+                body, scope, tokenize = 'unicode61 remove_diacritics 2'
+            )
+        ''')
+    except sqlite3.OperationalError:
+        return False
+
+    for kind, spec in ENTITIES.items():
+        conn.executescript(f'''
+            CREATE TRIGGER IF NOT EXISTS {kind}_search_insert AFTER INSERT ON {kind} BEGIN
+                INSERT INTO search_index (rowid, body, scope)
+                VALUES ({_rowid_sql(kind, 'NEW')}, {search_document(spec)}, {_scope_sql(kind, 'NEW')});
+            END;
+            CREATE TRIGGER IF NOT EXISTS {kind}_search_update AFTER UPDATE ON {kind} BEGIN
+                DELETE FROM search_index WHERE rowid = {_rowid_sql(kind, 'OLD')};
+                INSERT INTO search_index (rowid, body, scope)
+                VALUES ({_rowid_sql(kind, 'NEW')}, {search_document(spec)}, {_scope_sql(kind, 'NEW')});
+            END;
+            CREATE TRIGGER IF NOT EXISTS {kind}_search_delete AFTER DELETE ON {kind} BEGIN
+                DELETE FROM search_index WHERE rowid = {_rowid_sql(kind, 'OLD')};
+            END;
+        ''')
+    if not existed:
+        rebuild_search_index(conn)
+    return True
+
+
+def create_list_indexes(conn):
+    """Indexes matching the keyset ORDER BY of every sortable column"""
+    for kind, spec in ENTITIES.items():
+        for column, null_value in spec['sort'].items():
+            conn.execute(f'''
+                CREATE INDEX IF NOT EXISTS idx_{kind}_{column}_keyset
+                ON {kind} (user_id, COALESCE({column}, {null_value}), id)
+            ''')
+
+
+def rebuild_search_index(conn, user_id=None):
+    """Re-index entities of one user, or everyone's (e.g. after imports that bypassed the triggers)"""
+    if not has_search_index(conn):
+        return 0
+    total = 0
+    for kind, spec in ENTITIES.items():
+        if user_id is None:
+            where, params = '', ()
+            conn.execute('DELETE FROM search_index WHERE rowid % ? = ?', (KIND_SLOTS, KIND_NUMBERS[kind]))
+        else:
+            where, params = 'WHERE user_id = ?', (user_id,)
+            conn.execute('DELETE FROM search_index WHERE rowid IN '
+                         '(SELECT rowid FROM search_index WHERE search_index MATCH ?)',
+                         (f'scope : "u{int(user_id)}{kind}"',))
+        total += conn.execute(f'''
+            INSERT INTO search_index (rowid, body, scope)
+            SELECT {_rowid_sql(kind, kind)}, {search_document(spec, kind)}, {_scope_sql(kind, kind)}
+            FROM {kind} {where}
+        ''', params).rowcount
+    return total
+
+
+def has_search_index(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'search_index'").fetchone() is not None
+
+
+def fts_query(text, user_id=None, kind=None):
+    """Turn free text into an FTS5 query: every word must match as a prefix"""
+    words = re.findall(r'\w+', text or '')
+    if not words:
+        return ''
+    query = 'body : (' + ' '.join(f'"{word}"*' for word in words) + ')'
+    if kind is not None:
+        query = f'scope : "u{int(user_id)}{kind}" AND {query}'
+    return query
+
+
+def encode_cursor(value, entity_id):
+    return base64.urlsafe_b64encode(json.dumps([value, entity_id]).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        value, entity_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return value, int(entity_id)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+
+def list_page(conn, user_id, kind, sort=None, order='asc', cursor=None, limit=DEFAULT_PAGE_SIZE,
+              q=None, filters=None):
+    """One keyset-paginated page of an entity list.
+
+    Rows are ordered by (sort column, id) and the cursor holds the last pair
+    seen, so every page is an index range scan no matter how deep it is.
+    """
+    spec = ENTITIES.get(kind)
+    if spec is None:
+        raise ValueError(f'Unknown list: {kind}')
+    sort = sort or next(iter(spec['sort']))
+    if sort not in spec['sort']:
+        raise ValueError(f'Cannot sort {kind} by {sort}')
+    if order not in ('asc', 'desc'):
+        raise ValueError('order must be asc or desc')
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+
+    key = f'COALESCE({sort}, {spec["sort"][sort]})'
+    where = ['user_id = ?']
+    params = [user_id]
+    for column, value in (filters or {}).items():
+        if column in FILTERS[kind] and value:
+            where.append(f'{column} = ?')
+            params.append(value)
+
+    if q and fts_query(q):
+        if has_search_index(conn):
+            where.append(f'''id IN (SELECT rowid / {KIND_SLOTS} FROM search_index
+                                    WHERE search_index MATCH ?)''')
+            params.append(fts_query(q, user_id, kind))
+        else:
+            for word in re.findall(r'\w+', q):
+                where.append('(' + ' OR '.join(f'{column} LIKE ?' for column in spec['search']) + ')')
+                params += [f'%{word}%'] * len(spec['search'])
+
+    if cursor:
+        value, last_id = decode_cursor(cursor)
+        op = '>' if order == 'asc' else '<'
+        where.append(f'({key} {op} ? OR ({key} = ? AND id {op} ?))')
+        params += [value, value, last_id]
+
+    direction = 'ASC' if order == 'asc' else 'DESC'
+    rows = conn.execute(f'''
+        SELECT *, {key} AS sort_key FROM {kind}
+        WHERE {' AND '.join(where)}
+        ORDER BY {key} {direction}, id {direction}
+        LIMIT ?
+    ''', params + [limit + 1]).fetchall()
+
+    items = [{k: row[k] for k in row.keys() if k != 'sort_key'} for row in rows[:limit]]
+    next_cursor = encode_cursor(rows[limit - 1]['sort_key'], rows[limit - 1]['id']) \
+        if len(rows) > limit else None
+    return {'items': items, 'next_cursor': next_cursor, 'sort': sort, 'order': order, 'limit': limit}
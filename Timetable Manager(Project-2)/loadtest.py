@@ -0,0 +1,342 @@
+"""Load test a running server with a mix of concurrent, logged-in traffic.
+
+Every worker logs in through /login with its own session and then replays a
+weighted mix of page views and API calls until the time or request budget
+runs out. The report gives throughput, latency percentiles and error rates
+per call, and counts SQLite lock/busy errors separately.
+
+    python wsgi.py &
+    python loadtest.py --workers 200 --duration 60
+    python loadtest.py --mix view_timetable=60,generate_timetable=1 --json
+"""
+import argparse
+import json
+import math
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, Request, build_opener
+
+# Roughly a term week: students reading timetables, staff checking, an admin regenerating
+DEFAULT_MIX = {
+    'view_timetable': 45,
+    'teacher_timetable': 25,
+    'analytics': 8,
+    'stats': 15,
+    'check_conflicts': 6,
+    'generate_timetable': 1,
+}
+PERCENTILES = (50, 90, 95, 99)
+# Messages SQLite raises when a connection gives up waiting for a lock
+LOCK_MESSAGES = (b'database is locked', b'database is busy', b'database table is locked')
+
+
+class Client:
+    """One browser-like session: keeps its cookie between requests"""
+
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.opener = build_opener(HTTPCookieProcessor(CookieJar()))
+
+    def request(self, path, form=None, payload=None):
+        """Returns (status, body, final path after redirects)"""
+        data, headers = None, {}
+        if form is not None:
+            data = urlencode(form).encode()
+        elif payload is not None:
+            data = json.dumps(payload).encode()
+            headers['Content-Type'] = 'application/json'
+        request = Request(self.base_url + path, data=data, headers=headers)
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                return response.status, response.read(), response.geturl()[len(self.base_url):]
+        except HTTPError as e:
+            return e.code, e.read(), path
+
+    def login(self, email, password):
+        _, _, final_path = self.request('/login', form={'email': email, 'password': password})
+        if final_path.startswith('/login'):
+            raise RuntimeError(f'Login failed for {email}')
+
+    def get_json(self, path):
+        status, body, _ = self.request(path)
+        if status != 200:
+            raise RuntimeError(f'GET {path} returned {status}')
+        return json.loads(body)
+
+
+def discover(client):
+    """Ids the scenarios pick from, read through the public API"""
+    targets = {}
+    for kind in ('classes', 'teachers', 'rooms'):
+        ids, cursor = [], None
+        while True:
+            page = client.get_json(f'/api/{kind}?limit=500' + (f'&cursor={cursor}' if cursor else ''))
+            ids.extend(item['id'] for item in page['items'])
+            cursor = page.get('next_cursor')
+            if not cursor:
+                break
+        targets[kind] = ids
+
+    feed = client.get_json('/api/changes?since=0&limit=5000')
+    targets['time_slots'] = [(c['id'], c['data']['day']) for c in feed.get('changes', [])
+                             if c['entity'] == 'time_slots' and c['data']] or [(1, 'Monday')]
+    if not targets['classes'] or not targets['teachers'] or not targets['rooms']:
+        raise RuntimeError('The account needs classes, teachers and rooms to load test')
+    return targets
+
+
+# ----------------------------------------------------------------------
+# Scenarios: each returns (status, body, final path)
+# ----------------------------------------------------------------------
+
+def view_timetable(client, targets, rng, options):
+    return client.request(f"/view/{rng.choice(targets['classes'])}")
+
+
+def teacher_timetable(client, targets, rng, options):
+    return client.request(f"/teacher-timetable/{rng.choice(targets['teachers'])}")
+
+
+def analytics(client, targets, rng, options):
+    return client.request('/analytics')
+
+
+def stats(client, targets, rng, options):
+    return client.request('/api/stats')
+
+
+def check_conflicts(client, targets, rng, options):
+    time_slot_id, day = rng.choice(targets['time_slots'])
+    return client.request('/api/check-conflicts', payload={
+        'teacher_id': rng.choice(targets['teachers']), 'room_id': rng.choice(targets['rooms']),
+        'time_slot_id': time_slot_id, 'day': day})
+
+
+def generate_timetable(client, targets, rng, options):
+    return client.request('/api/generate-timetable', payload={
+        'class_id': rng.choice(targets['classes']), 'optimize': options.optimize})
+
+
+SCENARIOS = {
+    'view_timetable': view_timetable,
+    'teacher_timetable': teacher_timetable,
+    'analytics': analytics,
+    'stats': stats,
+    'check_conflicts': check_conflicts,
+    'generate_timetable': generate_timetable,
+}
+
+
+def parse_mix(text):
+    """'view_timetable=50,stats=10' -> weights; scenarios left out get no traffic"""
+    mix = {}
+    for part in filter(None, (p.strip() for p in text.split(','))):
+        name, _, weight = part.partition('=')
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f'Unknown scenario {name}; choose from {", ".join(SCENARIOS)}')
+        try:
+            mix[name] = float(weight or 1)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f'Bad weight for {name}: {weight}')
+    if not mix or sum(mix.values()) <= 0:
+        raise argparse.ArgumentTypeError('The mix needs at least one positive weight')
+    return mix
+
+
+def classify(status, body, final_path):
+    """None for success, else an error kind; 'lock' when SQLite ran out of busy timeout"""
+    if any(message in body for message in LOCK_MESSAGES):
+        return 'lock'
+    if final_path.startswith('/login'):
+        return 'logged_out'
+    if status >= 400:
+        return f'http_{status}'
+    if body[:1] == b'{':
+        try:
+            if json.loads(body).get('success') is False:
+                return 'app_error'
+        except ValueError:
+            return 'bad_json'
+    return None
+
+
+class Recorder:
+    """Latencies and errors per scenario, shared by all workers"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {name: [] for name in SCENARIOS}
+        self.errors = {name: Counter() for name in SCENARIOS}
+        self.samples = {}
+
+    def record(self, name, seconds, error, sample=None):
+        with self.lock:
+            self.latencies[name].append(seconds * 1000)
+            if error:
+                self.errors[name][error] += 1
+                if sample:
+                    self.samples.setdefault(error, sample)
+
+
+def percentile(ordered, p):
+    """Nearest-rank percentile of a sorted list"""
+    if not ordered:
+        return None
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def run(options):
+    probe = Client(options.url, options.timeout)
+    probe.login(options.email, options.password)
+    targets = discover(probe)
+
+    names = list(options.mix)
+    weights = [options.mix[n] for n in names]
+    recorder = Recorder()
+    budget = {'left': options.requests}
+    budget_lock = threading.Lock()
+    ready = threading.Barrier(options.workers + 1)
+    login_errors = []
+
+    def take():
+        if budget['left'] is None:
+            return True
+        with budget_lock:
+            budget['left'] -= 1
+            return budget['left'] >= 0
+
+    def worker(number):
+        rng = random.Random(options.seed * 1000003 + number if options.seed is not None else None)
+        client = Client(options.url, options.timeout)
+        try:
+            client.login(options.email, options.password)
+        except Exception as e:
+            login_errors.append(str(e))
+        ready.wait()
+        if options.ramp_up:
+            time.sleep(options.ramp_up * number / options.workers)
+        while time.perf_counter() < deadline and take():
+            name = rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                status, body, final_path = SCENARIOS[name](client, targets, rng, options)
+                error = classify(status, body, final_path)
+                sample = body[:200].decode('utf-8', 'replace') if error else None
+            except (URLError, OSError) as e:
+                error, sample = 'connection', str(e)
+            recorder.record(name, time.perf_counter() - started, error, sample)
+
+    threads = [threading.Thread(target=worker, args=(n,), daemon=True) for n in range(options.workers)]
+    deadline = float('inf')
+    for thread in threads:
+        thread.start()
+    ready.wait()
+    started = time.perf_counter()
+    deadline = started + options.duration if options.duration else float('inf')
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return report(recorder, elapsed, options, login_errors)
+
+
+def report(recorder, elapsed, options, login_errors):
+    scenarios = {}
+    all_latencies, all_errors = [], Counter()
+    for name in SCENARIOS:
+        latencies = sorted(recorder.latencies[name])
+        if not latencies:
+            continue
+        errors = recorder.errors[name]
+        all_latencies.extend(latencies)
+        all_errors.update(errors)
+        scenarios[name] = summarize(latencies, errors, elapsed)
+    all_latencies.sort()
+    return {
+        'url': options.url,
+        'workers': options.workers,
+        'seconds': round(elapsed, 2),
+        'login_errors': len(login_errors),
+        'total': summarize(all_latencies, all_errors, elapsed),
+        'scenarios': scenarios,
+        'error_samples': recorder.samples,
+    }
+
+
+def summarize(latencies, errors, elapsed):
+    count = len(latencies)
+    failed = sum(errors.values())
+    return {
+        'requests': count,
+        'throughput': round(count / elapsed, 1) if elapsed else 0.0,
+        'latency_ms': dict({f'p{p}': round(percentile(latencies, p), 1) for p in PERCENTILES},
+                           max=round(latencies[-1], 1)) if latencies else {},
+        'errors': failed,
+        'error_rate': round(failed / count, 4) if count else 0.0,
+        'lock_errors': errors.get('lock', 0),
+        'error_kinds': dict(errors),
+    }
+
+
+def print_report(result):
+    print(f"{result['workers']} workers against {result['url']} for {result['seconds']}s"
+          + (f" ({result['login_errors']} failed logins)" if result['login_errors'] else ''))
+    header = f"{'scenario':<20}{'reqs':>8}{'req/s':>9}" + ''.join(f"{f'p{p}':>9}" for p in PERCENTILES) \
+        + f"{'max':>9}{'errors':>8}{'locks':>7}"
+    print(header)
+    print('-' * len(header))
+    rows = list(result['scenarios'].items()) + [('total', result['total'])]
+    for name, row in rows:
+        latency = row['latency_ms']
+        print(f"{name:<20}{row['requests']:>8}{row['throughput']:>9}"
+              + ''.join(f"{latency.get(f'p{p}', 0):>9}" for p in PERCENTILES)
+              + f"{latency.get('max', 0):>9}{row['error_rate']:>8.1%}{row['lock_errors']:>7}")
+    for kind, sample in result['error_samples'].items():
+        print(f"\n{kind}: {sample}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Load test a running Timetable Manager server')
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help='server to test (default: %(default)s)')
+    parser.add_argument('--email', default='admin@timetable.com')
+    parser.add_argument('--password', default='admin123')
+    parser.add_argument('--workers', type=int, default=50, help='concurrent sessions (default: %(default)s)')
+    parser.add_argument('--duration', type=float, default=30,
+                        help='seconds to run; 0 runs until --requests is used up (default: %(default)s)')
+    parser.add_argument('--requests', type=int, help='stop after this many requests in total')
+    parser.add_argument('--ramp-up', type=float, default=0, help='seconds over which workers start')
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help='weighted scenarios, e.g. view_timetable=50,stats=10 (default: %s)'
+                             % ','.join(f'{k}={v}' for k, v in DEFAULT_MIX.items()))
+    parser.add_argument('--no-optimize', dest='optimize', action='store_false',
+                        help='generate without the genetic optimization pass')
+    parser.add_argument('--timeout', type=float, default=60, help='per-request timeout in seconds')
+    parser.add_argument('--seed', type=int, help='seed for a repeatable request sequence')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    return parser
+
+
+def main(argv=None):
+    options = build_parser().parse_args(argv)
+    if not options.duration and options.requests is None:
+        build_parser().error('--duration 0 needs --requests')
+    try:
+        result = run(options)
+    except (RuntimeError, URLError) as e:
+        print(f'error: {e}', file=sys.stderr)
+        return 2
+    if options.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
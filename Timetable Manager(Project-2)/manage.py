@@ -0,0 +1,284 @@
+"""Command-line entry point for batch jobs that do not need the web server.
+
+    python manage.py init-db
+    python manage.py generate --all --workers 4
+    python manage.py validate --user 1
+    python manage.py export --user 1 --format csv --output timetable.csv
+    python manage.py rebuild
+    python manage.py vacuum
+    python manage.py shard-split --shard-dir shards
+    python manage.py assets
+"""
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import changes
+import listing
+import snapshot
+import validator
+import versions
+import database
+from database import ensure_db, init_db, get_db_connection, get_users_connection
+from scheduler import TimetableModel
+
+EXPORT_QUERY = '''
+    SELECT c.name AS class_name, ts.day, ts.slot_number, ts.start_time, ts.end_time,
+           s.code AS subject_code, s.name AS subject_name, t.name AS teacher_name,
+           r.room_number
+    FROM timetable_entries te
+    JOIN classes c ON te.class_id = c.id
+    JOIN subjects s ON te.subject_id = s.id
+    JOIN teachers t ON te.teacher_id = t.id
+    LEFT JOIN rooms r ON te.room_id = r.id
+    JOIN time_slots ts ON te.time_slot_id = ts.id
+    WHERE te.user_id = ?
+    ORDER BY c.name, ts.id
+'''
+
+
+def user_ids(args):
+    """Users selected by --user/--all; defaults to all users"""
+    if args.user:
+        return args.user
+    conn = get_users_connection()
+    ids = [row['id'] for row in conn.execute('SELECT id FROM users ORDER BY id')]
+    conn.close()
+    return ids
+
+
+def map_users(job, ids, workers):
+    """Run job(user_id) for every user, in a process pool when more than one worker is asked for"""
+    if workers <= 1 or len(ids) <= 1:
+        return [job(user_id) for user_id in ids]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(job, ids))
+
+
+# ----------------------------------------------------------------------
+# Per-user jobs (module level so worker processes can pickle them)
+# ----------------------------------------------------------------------
+
+def generate_user(user_id, optimize=True, profile=False):
+    import generator
+
+    conn = get_db_connection(user_id)
+    class_ids = [row['id'] for row in conn.execute(
+        'SELECT id FROM classes WHERE user_id = ? ORDER BY id', (user_id,))]
+    started = time.perf_counter()
+    results = []
+    for class_id in class_ids:
+        try:
+            result = generator.run_generation(conn, user_id, class_id, optimize=optimize, profile=profile)
+            if result['status'] == 'running':
+                results.append({'class_id': class_id, 'run_id': result['run_id'], 'status': 'running'})
+                continue
+            results.append({'class_id': class_id, 'run_id': result['run_id'],
+                            'placed': result['placed'], 'unplaced': result['unplaced']})
+        except Exception as e:
+            results.append({'class_id': class_id, 'error': str(e)})
+    conn.close()
+    return {'user_id': user_id, 'classes': results,
+            'elapsed_s': round(time.perf_counter() - started, 2)}
+
+
+def validate_user(user_id):
+    conn = get_db_connection(user_id)
+    model = TimetableModel.load(conn, user_id, include_entries=False)
+    columns = validator.load_columns(conn, user_id, model)
+    requirements = validator.load_requirements(conn, user_id)
+    conn.close()
+    return dict(validator.validate(model, columns, requirements)['summary'], user_id=user_id)
+
+
+def rebuild_user(user_id):
+    """Give never-versioned timetables a version, re-index search and republish the display snapshot"""
+    conn = get_db_connection(user_id)
+    class_ids = [row['id'] for row in conn.execute('SELECT id FROM classes WHERE user_id = ?', (user_id,))]
+    synced = [class_id for class_id in class_ids
+              if versions.sync_active_version(conn, user_id, class_id) is not None]
+    indexed = listing.rebuild_search_index(conn, user_id)
+    published = conn.execute('SELECT 1 FROM published_snapshots WHERE user_id = ?', (user_id,)).fetchone()
+    if published:
+        snapshot.publish_snapshot(conn, user_id)
+    conn.commit()
+    conn.close()
+    return {'user_id': user_id, 'versions_synced': synced, 'search_indexed': indexed,
+            'snapshot_republished': bool(published)}
+
+
+# ----------------------------------------------------------------------
+# Commands
+# ----------------------------------------------------------------------
+
+def cmd_init_db(args):
+    init_db(seed_demo=args.demo)
+    print(f'Schema at version {database.SCHEMA_VERSION}')
+    return 0
+
+
+def cmd_generate(args):
+    job = partial(generate_user, optimize=args.optimize, profile=args.profile)
+    ok = True
+    for result in map_users(job, user_ids(args), args.workers):
+        failed = [c for c in result['classes'] if 'error' in c]
+        running = [c for c in result['classes'] if c.get('status') == 'running']
+        ok = ok and not failed
+        print(f"user {result['user_id']}: {len(result['classes']) - len(failed) - len(running)} classes generated, "
+              f"{len(failed)} failed in {result['elapsed_s']}s")
+        for c in failed:
+            print(f"  class {c['class_id']}: {c['error']}", file=sys.stderr)
+        for c in running:
+            print(f"  class {c['class_id']}: already being generated by run {c['run_id']}")
+    return 0 if ok else 1
+
+
+def cmd_validate(args):
+    ok = True
+    for summary in map_users(validate_user, user_ids(args), args.workers):
+        ok = ok and summary['errors'] == 0
+        print(json.dumps(summary) if args.json else
+              f"user {summary['user_id']}: {summary['entries']} entries, "
+              f"{summary['errors']} errors, {summary['warnings']} warnings")
+    return 0 if ok else 1
+
+
+def cmd_export(args):
+    out = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        writer = None
+        for user_id in user_ids(args):
+            conn = get_db_connection(user_id)
+            rows = conn.execute(EXPORT_QUERY, (user_id,)).fetchall()
+            conn.close()
+            for row in rows:
+                row = dict(row, user_id=user_id)
+                if args.format == 'json':
+                    out.write(json.dumps(row) + '\n')
+                    continue
+                if writer is None:
+                    writer = csv.DictWriter(out, fieldnames=list(row))
+                    writer.writeheader()
+                writer.writerow(row)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+def cmd_rebuild(args):
+    for result in map_users(rebuild_user, user_ids(args), args.workers):
+        print(f"user {result['user_id']}: {len(result['versions_synced'])} version snapshots refreshed, "
+              f"{result['search_indexed']} entities re-indexed"
+              + (', display snapshot republished' if result['snapshot_republished'] else ''))
+    return 0
+
+
+def cmd_vacuum(args):
+    for path in database.database_files():
+        conn = sqlite3.connect(path)
+        conn.isolation_level = None  # VACUUM cannot run inside a transaction
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'changes'").fetchone():
+            conn.row_factory = sqlite3.Row
+            pruned = changes.prune_changes(conn, args.keep_changes_days)
+            print(f'{path}: {pruned} old changes pruned')
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'timetable_versions'").fetchone():
+            conn.row_factory = sqlite3.Row
+            conn.execute('BEGIN IMMEDIATE')
+            pruned = versions.prune_versions(conn, args.keep_versions)
+            conn.execute('COMMIT')
+            print(f'{path}: {pruned} old timetable versions pruned')
+        conn.execute('VACUUM')
+        conn.execute('ANALYZE')
+        conn.close()
+        print(f'{path}: vacuumed and analyzed')
+    return 0
+
+
+def cmd_shard_split(args):
+    copied = database.split_into_shards(args.shard_dir)
+    for user_id, rows in copied.items():
+        print(f'user {user_id}: {rows} rows copied')
+    print(f'Set TIMETABLE_SHARD_DIR={args.shard_dir} to serve from the per-user files')
+    return 0
+
+
+def cmd_assets(args):
+    import assets
+
+    static_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+    manifest = assets.build_assets(static_folder)
+    print(f'{len(manifest)} assets fingerprinted into static/{assets.DIST_DIR}'
+          + ('' if assets.brotli else ' (gzip only: brotli is not installed)'))
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Timetable Manager batch commands')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def add_users(command):
+        group = command.add_mutually_exclusive_group()
+        group.add_argument('--user', type=int, action='append', help='user id (repeatable)')
+        group.add_argument('--all', action='store_true', help='every user (default)')
+        command.add_argument('--workers', type=int, default=1, help='worker processes across users')
+
+    init = commands.add_parser('init-db', help='create or upgrade the schema (and seed the demo account)')
+    init.add_argument('--no-demo', dest='demo', action='store_false',
+                      help='do not create the demo account in an empty database')
+    init.set_defaults(handler=cmd_init_db)
+
+    generate = commands.add_parser('generate', help='regenerate timetables for every class')
+    add_users(generate)
+    generate.add_argument('--no-optimize', dest='optimize', action='store_false',
+                          help='skip the genetic optimization stage')
+    generate.add_argument('--profile', action='store_true', help='store a cProfile capture per run')
+    generate.set_defaults(handler=cmd_generate)
+
+    validate = commands.add_parser('validate', help='audit timetables; exit status 1 on errors')
+    add_users(validate)
+    validate.add_argument('--json', action='store_true', help='print summaries as JSON lines')
+    validate.set_defaults(handler=cmd_validate)
+
+    export = commands.add_parser('export', help='export timetable entries as CSV or JSON lines')
+    add_users(export)
+    export.add_argument('--format', choices=('csv', 'json'), default='csv')
+    export.add_argument('--output', help='file to write (default: stdout)')
+    export.set_defaults(handler=cmd_export)
+
+    rebuild = commands.add_parser('rebuild', help='refresh versions, search index and display snapshots')
+    add_users(rebuild)
+    rebuild.set_defaults(handler=cmd_rebuild)
+
+    vacuum = commands.add_parser('vacuum', help='prune the change log and old versions, then VACUUM and ANALYZE')
+    vacuum.add_argument('--keep-changes-days', type=int, default=changes.RETENTION_DAYS,
+                        help='days of change history to keep')
+    vacuum.add_argument('--keep-versions', type=int, default=versions.VERSION_HISTORY,
+                        help='timetable versions to keep per class besides the one it shows')
+    vacuum.set_defaults(handler=cmd_vacuum)
+
+    shard_split = commands.add_parser('shard-split',
+                                      help='copy each user of the shared database into its own file')
+    shard_split.add_argument('--shard-dir', required=True, help='directory for the per-user files')
+    shard_split.set_defaults(handler=cmd_shard_split)
+
+    build_assets = commands.add_parser('assets', help='fingerprint and pre-compress static assets')
+    build_assets.set_defaults(handler=cmd_assets)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.handler is not cmd_init_db:
+        ensure_db()
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,178 @@
+import time
+
+import numpy as np
+
+from scheduler import (LUNCH_SLOT, LUNCH_PENALTY, NON_PREFERRED_DAY_PENALTY,
+                       SAME_SUBJECT_DAY_PENALTY, TEACHER_GAP_PENALTY)
+
+HARD_PENALTY = 1000
+POPULATION_SIZE = 200
+GENERATIONS = 150
+ELITE_SIZE = 4
+TOURNAMENT_SIZE = 3
+MUTATION_RATE = 0.05
+
+
+class PlacementProblem:
+    """Soft-constraint problem for one class, encoded as NumPy arrays.
+
+    An individual is an int array with the cell of each lecture; teachers stay
+    as chosen by the constructive stage. Everything the fitness needs (other
+    classes' teacher occupancy, allowed cells, preferred days) is precomputed
+    so a whole population is scored with a handful of array operations.
+    """
+
+    def __init__(self, model, entry_ids):
+        entries = [model.entries[entry_id] for entry_id in entry_ids]
+        for entry_id in entry_ids:
+            model.remove_entry(entry_id)
+        try:
+            self._build(model, entries)
+        finally:
+            for entry in entries:
+                model.add_entry(entry, entry['cell'])
+
+    def _build(self, model, entries):
+        self.n_days, self.n_slots, self.n_cells = len(model.days), model.n_slots, model.n_cells
+        teacher_ids = sorted({e['teacher_id'] for e in entries})
+        teacher_index = {tid: i for i, tid in enumerate(teacher_ids)}
+        subject_index = {sid: i for i, sid in enumerate(sorted({e['subject_id'] for e in entries}))}
+
+        self.seed = np.array([e['cell'] for e in entries], dtype=np.int64)
+        self.lecture_teacher = np.array([teacher_index[e['teacher_id']] for e in entries], dtype=np.int64)
+        self.lecture_subject = np.array([subject_index[e['subject_id']] for e in entries], dtype=np.int64)
+        self.n_teachers = len(teacher_ids)
+
+        cells = np.arange(self.n_cells)
+        self.day_of_cell = cells // self.n_slots
+        self.lunch_cells = np.array([model.slot_number_of(c) == LUNCH_SLOT for c in cells])
+
+        def mask_array(bitmap):
+            return np.array([(bitmap >> c) & 1 for c in cells], dtype=bool)
+
+        self.base_load = np.array([model.counts['teacher'].get(tid, [0] * self.n_cells)
+                                   for tid in teacher_ids], dtype=np.int64)
+        # Clashes among other classes are not this search's to fix
+        self.base_clashes = int(np.maximum(self.base_load - 1, 0).sum())
+        self.preferred = np.array([mask_array(model.teachers[tid]['preferred_mask'])
+                                   for tid in teacher_ids])
+        self.max_day = np.array([model.teacher_limits(tid)[0] for tid in teacher_ids], dtype=np.int64)
+
+        # Cells each lecture may use: teacher free and available, and a suitable room free
+        allowed = []
+        for entry in entries:
+            tid = entry['teacher_id']
+            free = model.all_cells & ~(model.busy_cells('teacher', tid) | model.unavailable.get(tid, 0))
+            mask = mask_array(free) & np.array([
+                model.pick_room(entry['class_id'], entry['subject_id'], c) is not None for c in cells])
+            mask[entry['cell']] = True
+            allowed.append(mask)
+        self.allowed = np.array(allowed)
+        self.allowed_count = self.allowed.sum(axis=1)
+        self.allowed_cells = np.zeros_like(self.allowed, dtype=np.int64)
+        for i, mask in enumerate(self.allowed):
+            choices = np.flatnonzero(mask)
+            self.allowed_cells[i, :len(choices)] = choices
+
+    def fitness(self, population):
+        """Score a (P, L) population; returns (total, hard violations) arrays"""
+        P, L = population.shape
+        T, D, S, C = self.n_teachers, self.n_days, self.n_slots, self.n_cells
+
+        # Two lectures of the class in one cell
+        class_clashes = (np.diff(np.sort(population, axis=1), axis=1) == 0).sum(axis=1)
+
+        # Teacher occupancy per individual, including the other classes' lectures
+        flat = (np.arange(P)[:, None] * T + self.lecture_teacher[None, :]) * C + population
+        load = np.bincount(flat.ravel(), minlength=P * T * C).reshape(P, T, C) + self.base_load[None]
+        teacher_clashes = np.maximum(load - 1, 0).sum(axis=(1, 2)) - self.base_clashes
+
+        disallowed = (~self.allowed[np.arange(L)[None, :], population]).sum(axis=1)
+        day_load = load.reshape(P, T, D, S).sum(axis=3)
+        over_daily = np.maximum(day_load - self.max_day[None, :, None], 0).sum(axis=(1, 2))
+        hard = class_clashes + teacher_clashes + disallowed + over_daily
+
+        lunch = self.lunch_cells[population].sum(axis=1)
+        non_preferred = (~self.preferred[self.lecture_teacher[None, :], population]).sum(axis=1)
+        subject_days = np.sort(self.lecture_subject[None, :] * D + self.day_of_cell[population], axis=1)
+        same_day = (np.diff(subject_days, axis=1) == 0).sum(axis=1)
+
+        busy = load.reshape(P, T, D, S) > 0
+        count = busy.sum(axis=3)
+        first = busy.argmax(axis=3)
+        last = S - 1 - busy[..., ::-1].argmax(axis=3)
+        gaps = np.where(count > 0, last - first + 1 - count, 0).sum(axis=(1, 2))
+
+        soft = (LUNCH_PENALTY * lunch + NON_PREFERRED_DAY_PENALTY * non_preferred
+                + SAME_SUBJECT_DAY_PENALTY * same_day + TEACHER_GAP_PENALTY * gaps)
+        return hard * HARD_PENALTY + soft, hard
+
+    def random_cells(self, rng, shape):
+        """A random allowed cell for every lecture position in an array of the given shape"""
+        picks = (rng.random(shape) * self.allowed_count[None, :]).astype(np.int64)
+        return self.allowed_cells[np.arange(shape[1])[None, :], picks]
+
+
+def evolve(problem, population_size=POPULATION_SIZE, generations=GENERATIONS, seed=None):
+    """Genetic search seeded with the constructive solution.
+
+    Returns (best individual, its fitness, its hard violations, evaluations).
+    """
+    rng = np.random.default_rng(seed)
+    L = len(problem.seed)
+    population = np.tile(problem.seed, (population_size, 1))
+    mutate = rng.random(population.shape) < MUTATION_RATE * 4
+    mutate[0] = False
+    population = np.where(mutate, problem.random_cells(rng, population.shape), population)
+
+    evaluations = 0
+    for _ in range(generations):
+        fitness, _ = problem.fitness(population)
+        evaluations += len(population)
+        order = np.argsort(fitness, kind='stable')
+        elite = population[order[:ELITE_SIZE]]
+
+        n_children = population_size - ELITE_SIZE
+        contenders = rng.integers(0, population_size, size=(2, n_children, TOURNAMENT_SIZE))
+        winners = np.take_along_axis(contenders, fitness[contenders].argmin(axis=2)[..., None], axis=2)[..., 0]
+        mothers, fathers = population[winners[0]], population[winners[1]]
+        children = np.where(rng.random((n_children, L)) < 0.5, mothers, fathers)
+
+        mutate = rng.random(children.shape) < MUTATION_RATE
+        children = np.where(mutate, problem.random_cells(rng, children.shape), children)
+
+        # Swap mutation keeps the class's set of cells and only reorders lectures
+        rows = np.flatnonzero(rng.random(n_children) < 0.5)
+        a, b = rng.integers(0, L, size=(2, len(rows)))
+        children[rows, a], children[rows, b] = children[rows, b], children[rows, a]
+
+        population = np.vstack([elite, children])
+
+    fitness, hard = problem.fitness(population)
+    evaluations += len(population)
+    best = int(np.argmin(fitness))
+    return population[best], int(fitness[best]), int(hard[best]), evaluations
+
+
+def optimize_placement(model, entry_ids, **options):
+    """Improve soft goals for a class's placed lectures; moves entries in the model in place"""
+    started = time.perf_counter()
+    problem = PlacementProblem(model, entry_ids)
+    seed_fitness, seed_hard = problem.fitness(problem.seed[None, :])
+    best, best_fitness, best_hard, evaluations = evolve(problem, **options)
+    elapsed = time.perf_counter() - started
+
+    improved = best_hard <= int(seed_hard[0]) and best_fitness < int(seed_fitness[0])
+    if improved:
+        # Move everything out first so intermediate states never collide
+        entries = [model.remove_entry(entry_id) for entry_id in entry_ids]
+        for entry, cell in zip(entries, best.tolist()):
+            model.add_entry(entry, cell)
+
+    return {
+        'evaluations': evaluations,
+        'evaluations_per_second': round(evaluations / elapsed) if elapsed else None,
+        'fitness_before': int(seed_fitness[0]),
+        'fitness_after': best_fitness if improved else int(seed_fitness[0]),
+        'improved': improved,
+    }
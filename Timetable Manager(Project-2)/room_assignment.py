@@ -0,0 +1,141 @@
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:  # scipy is optional: fall back to the pure-Python Hungarian algorithm
+    linear_sum_assignment = None
+
+# Costs for putting a lecture in a room (lower is better)
+WASTED_SEAT_COST = 1
+MISSING_SEAT_COST = 50
+NO_PROJECTOR_COST = 10
+INFEASIBLE_COST = 10 ** 6
+
+
+def room_cost(model, class_id, subject_id, room_id):
+    """Cost of a (lecture, room) pair from capacity fit and equipment"""
+    if not model.room_type_fits(room_id, subject_id):
+        return INFEASIBLE_COST
+    room = model.rooms[room_id]
+    subject = model.subjects.get(subject_id) or {}
+    if subject.get('theory_practical') == 'Practical' and not room.get('has_lab_equipment'):
+        return INFEASIBLE_COST
+
+    students = (model.classes.get(class_id) or {}).get('num_students') or 0
+    capacity = room.get('capacity') or 0
+    cost = (capacity - students) * WASTED_SEAT_COST if capacity >= students \
+        else (students - capacity) * MISSING_SEAT_COST
+    if not room.get('has_projector'):
+        cost += NO_PROJECTOR_COST
+    return cost
+
+
+def min_cost_assignment(cost):
+    """Column assigned to each row of a cost matrix (rows <= columns), by scipy when installed"""
+    n = len(cost)
+    m = len(cost[0]) if n else 0
+    if n == 0:
+        return []
+    if linear_sum_assignment is not None:
+        assignment = [None] * n
+        for i, j in zip(*linear_sum_assignment(cost)):
+            assignment[i] = int(j)
+        return assignment
+
+    # Hungarian algorithm
+
+    inf = float('inf')
+    u = [0] * (n + 1)
+    v = [0] * (m + 1)
+    p = [0] * (m + 1)
+    way = [0] * (m + 1)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = [inf] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            row = cost[i0 - 1]
+            delta = inf
+            j1 = 0
+            for j in range(1, m + 1):
+                if not used[j]:
+                    cur = row[j - 1] - u[i0] - v[j]
+                    if cur < minv[j]:
+                        minv[j] = cur
+                        way[j] = j0
+                    if minv[j] < delta:
+                        delta = minv[j]
+                        j1 = j
+            for j in range(m + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    assignment = [None] * n
+    for j in range(1, m + 1):
+        if p[j]:
+            assignment[p[j] - 1] = j - 1
+    return assignment
+
+
+def match_cell(model, lectures, room_ids):
+    """Best room for each lecture in one cell; None where no feasible room is left"""
+    if not lectures:
+        return []
+    # Pad with "no room" columns so every lecture can be matched
+    columns = list(room_ids) + [None] * max(0, len(lectures) - len(room_ids))
+    cost = [[room_cost(model, e['class_id'], e['subject_id'], room_id) if room_id is not None
+             else INFEASIBLE_COST for room_id in columns] for e in lectures]
+    assignment = min_cost_assignment(cost)
+    return [columns[j] if cost[i][j] < INFEASIBLE_COST else None
+            for i, j in enumerate(assignment)]
+
+
+def assign_rooms(model, entry_ids=None):
+    """Re-match rooms for the given entries (all by default) cell by cell.
+
+    Rooms held by entries outside the set stay fixed. A lecture no free room
+    suits (room type, lab equipment) is left without a room rather than put
+    in one that breaks those constraints. The model is updated in place.
+    Returns ({entry_id: room_id} of the rooms that changed, None where a room
+    was taken away; ids of the entries left without a room).
+    """
+    selected = set(model.entries if entry_ids is None else entry_ids)
+    by_cell = {}
+    for entry_id in selected:
+        entry = model.entries[entry_id]
+        by_cell.setdefault(entry['cell'], []).append(entry)
+
+    changes, unassigned = {}, []
+    for cell, lectures in by_cell.items():
+        lectures.sort(key=lambda e: e['id'])
+        for entry in lectures:
+            model.remove_entry(entry['id'])
+        free_rooms = sorted(room_id for room_id in model.rooms
+                            if not (model.busy_cells('room', room_id) >> cell) & 1)
+        matched = match_cell(model, lectures, free_rooms)
+
+        for entry, room_id in zip(lectures, matched):
+            if room_id is None:
+                unassigned.append(entry['id'])
+            if room_id != entry['room_id']:
+                changes[entry['id']] = room_id
+                entry['room_id'] = room_id
+            model.add_entry(entry, cell)
+    return changes, sorted(unassigned)
+
+
+def save_room_changes(conn, user_id, changes):
+    # Through the view, so saved versions sharing an entry keep their room
+    conn.executemany('UPDATE timetable_entries SET room_id = ? WHERE id = ? AND user_id = ?',
+                     [(room_id, entry_id, user_id) for entry_id, room_id in changes.items()])
@@ -0,0 +1,379 @@
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
+LUNCH_SLOT = 4
+LAB_ROOM_TYPES = ('Lab', 'Workshop')
+
+# Weights used to rank substitute teachers (higher total is better)
+SPECIALIZATION_MATCH_SCORE = 5
+DEPARTMENT_MATCH_SCORE = 3
+DAY_HEADROOM_SCORE = 1
+WEEK_HEADROOM_SCORE = 0.2
+WEEK_LOAD_PENALTY = 0.1
+
+# Soft-constraint weights used to rank placements (lower total is better)
+LUNCH_PENALTY = 3
+NON_PREFERRED_DAY_PENALTY = 2
+SAME_SUBJECT_DAY_PENALTY = 2
+TEACHER_GAP_PENALTY = 1
+
+RESOURCE_KINDS = ('teacher', 'room', 'class')
+
+# Column defaults from the teachers table, used when a limit is missing
+DEFAULT_MAX_HOURS_PER_DAY = 6
+DEFAULT_MAX_HOURS_PER_WEEK = 30
+
+
+def bit_count(bitmap):
+    return bin(bitmap).count('1')
+
+
+class TimetableModel:
+    """In-memory view of one user's timetable.
+
+    Every (day, slot) pair is flattened into a cell index. For each teacher, room
+    and class the model keeps a count per cell plus an integer bitmap of the
+    occupied cells, so "is this resource free" is a single bit test.
+    """
+
+    def __init__(self, time_slots, teachers, rooms, classes, subjects, entries, unavailable=()):
+        present_days = {ts['day'] for ts in time_slots}
+        self.days = [d for d in DAYS if d in present_days] + sorted(present_days - set(DAYS))
+        self.slot_numbers = sorted({ts['slot_number'] for ts in time_slots})
+        self.n_slots = len(self.slot_numbers)
+        self.n_cells = len(self.days) * self.n_slots
+        self.all_cells = (1 << self.n_cells) - 1
+
+        day_index = {day: i for i, day in enumerate(self.days)}
+        slot_index = {number: i for i, number in enumerate(self.slot_numbers)}
+        self.cell_of_slot = {}
+        self.slot_of_cell = {}
+        for ts in time_slots:
+            cell = day_index[ts['day']] * self.n_slots + slot_index[ts['slot_number']]
+            self.cell_of_slot[ts['id']] = cell
+            self.slot_of_cell.setdefault(cell, ts['id'])
+
+        self.teachers = {t['id']: dict(t) for t in teachers}
+        self.rooms = {r['id']: dict(r) for r in rooms}
+        self.classes = {c['id']: dict(c) for c in classes}
+        self.subjects = {s['id']: dict(s) for s in subjects}
+
+        for teacher in self.teachers.values():
+            preferred = [d.strip() for d in (teacher.get('preferred_days') or '').split(',') if d.strip()]
+            teacher['preferred_mask'] = self._days_mask(preferred) if preferred else self.all_cells
+
+        self.unavailable = {}
+        for teacher_id, time_slot_id in unavailable:
+            cell = self.cell_of_slot.get(time_slot_id)
+            if cell is not None:
+                self.unavailable[teacher_id] = self.unavailable.get(teacher_id, 0) | (1 << cell)
+
+        self.counts = {kind: {} for kind in RESOURCE_KINDS}
+        self.busy = {kind: {} for kind in RESOURCE_KINDS}
+        self.entries = {}
+        self.cell_entries = {kind: {} for kind in RESOURCE_KINDS}
+        for entry in entries:
+            cell = self.cell_of_slot.get(entry['time_slot_id'])
+            if cell is not None:
+                self.add_entry(dict(entry), cell)
+
+    @classmethod
+    def load(cls, conn, user_id, include_entries=True):
+        """Load the whole timetable of a user with one query per table"""
+        return cls(*cls.fetch(conn, user_id, include_entries))
+
+    @staticmethod
+    def fetch(conn, user_id, include_entries=True):
+        """The rows TimetableModel is built from, in constructor argument order"""
+        return (
+            conn.execute('SELECT id, day, slot_number FROM time_slots WHERE user_id = ?',
+                         (user_id,)).fetchall(),
+            conn.execute('SELECT * FROM teachers WHERE user_id = ?', (user_id,)).fetchall(),
+            conn.execute('SELECT * FROM rooms WHERE user_id = ?', (user_id,)).fetchall(),
+            conn.execute('SELECT * FROM classes WHERE user_id = ?', (user_id,)).fetchall(),
+            conn.execute('SELECT * FROM subjects WHERE user_id = ?', (user_id,)).fetchall(),
+            conn.execute('''
+                SELECT id, class_id, subject_id, teacher_id, room_id, time_slot_id
+                FROM timetable_entries WHERE user_id = ?
+            ''', (user_id,)).fetchall() if include_entries else [],
+            conn.execute('''
+                SELECT ta.teacher_id, ta.time_slot_id FROM teacher_availability ta
+                JOIN teachers t ON ta.teacher_id = t.id
+                WHERE t.user_id = ? AND ta.is_available = 0
+            ''', (user_id,)).fetchall(),
+        )
+
+    # ------------------------------------------------------------------
+    # Cells
+    # ------------------------------------------------------------------
+
+    def day_of(self, cell):
+        return cell // self.n_slots
+
+    def slot_number_of(self, cell):
+        return self.slot_numbers[cell % self.n_slots]
+
+    def day_mask(self, day_idx):
+        return ((1 << self.n_slots) - 1) << (day_idx * self.n_slots)
+
+    def _days_mask(self, days):
+        mask = 0
+        for i, day in enumerate(self.days):
+            if day in days:
+                mask |= self.day_mask(i)
+        return mask
+
+    def cells(self, bitmap):
+        """Yield the cell indexes set in a bitmap"""
+        while bitmap:
+            low = bitmap & -bitmap
+            yield low.bit_length() - 1
+            bitmap ^= low
+
+    def describe_cell(self, cell):
+        return {'time_slot_id': self.slot_of_cell.get(cell),
+                'day': self.days[self.day_of(cell)],
+                'slot_number': self.slot_number_of(cell)}
+
+    # ------------------------------------------------------------------
+    # Occupancy
+    # ------------------------------------------------------------------
+
+    def _resources(self, entry):
+        # A lecture without a room (or teacher) occupies no such resource, so roomless ones never clash
+        return tuple((kind, resource_id) for kind, resource_id in (
+            ('teacher', entry['teacher_id']), ('room', entry['room_id']), ('class', entry['class_id']))
+            if resource_id is not None)
+
+    def add_entry(self, entry, cell):
+        entry['cell'] = cell
+        entry['time_slot_id'] = self.slot_of_cell.get(cell, entry.get('time_slot_id'))
+        self.entries[entry['id']] = entry
+        for kind, resource_id in self._resources(entry):
+            self.cell_entries[kind].setdefault((resource_id, cell), []).append(entry)
+            counts = self.counts[kind].get(resource_id)
+            if counts is None:
+                counts = self.counts[kind][resource_id] = [0] * self.n_cells
+            counts[cell] += 1
+            self.busy[kind][resource_id] = self.busy[kind].get(resource_id, 0) | (1 << cell)
+
+    def remove_entry(self, entry_id):
+        entry = self.entries.pop(entry_id)
+        cell = entry['cell']
+        for kind, resource_id in self._resources(entry):
+            self.cell_entries[kind][(resource_id, cell)].remove(entry)
+            counts = self.counts[kind][resource_id]
+            counts[cell] -= 1
+            if counts[cell] == 0:
+                self.busy[kind][resource_id] &= ~(1 << cell)
+        return entry
+
+    def move_entry(self, entry_id, cell):
+        entry = self.remove_entry(entry_id)
+        self.add_entry(entry, cell)
+
+    def entries_at(self, kind, resource_id, cell):
+        return self.cell_entries[kind].get((resource_id, cell), ())
+
+    def busy_cells(self, kind, resource_id):
+        return self.busy[kind].get(resource_id, 0)
+
+    def teacher_day_load(self, teacher_id, day_idx):
+        return bit_count(self.busy_cells('teacher', teacher_id) & self.day_mask(day_idx))
+
+    def teacher_week_load(self, teacher_id):
+        return sum(self.counts['teacher'].get(teacher_id, ()))
+
+    def teacher_limits(self, teacher_id):
+        teacher = self.teachers.get(teacher_id) or {}
+        return (teacher.get('max_hours_per_day') or DEFAULT_MAX_HOURS_PER_DAY,
+                teacher.get('max_hours_per_week') or DEFAULT_MAX_HOURS_PER_WEEK)
+
+    def free_cells(self, class_id, teacher_id, room_id):
+        """Bitmap of cells where the class, teacher and room are all free"""
+        blocked = (self.busy_cells('class', class_id) | self.busy_cells('teacher', teacher_id)
+                   | self.busy_cells('room', room_id) | self.unavailable.get(teacher_id, 0))
+        return self.all_cells & ~blocked
+
+    def can_place(self, class_id, teacher_id, room_id, cell):
+        if not (self.free_cells(class_id, teacher_id, room_id) >> cell) & 1:
+            return False
+        max_day, max_week = self.teacher_limits(teacher_id)
+        if self.teacher_day_load(teacher_id, self.day_of(cell)) >= max_day:
+            return False
+        return self.teacher_week_load(teacher_id) < max_week
+
+    def double_bookings(self):
+        """Yield (kind, resource_id, cell, entries) for every resource booked twice in a cell"""
+        for kind in RESOURCE_KINDS:
+            for (resource_id, cell), entries in self.cell_entries[kind].items():
+                if len(entries) > 1:
+                    yield kind, resource_id, cell, entries
+
+    def room_type_fits(self, room_id, subject_id):
+        """Practical subjects need a lab room, theory subjects a non-lab room"""
+        room = self.rooms.get(room_id) or {}
+        subject = self.subjects.get(subject_id) or {}
+        return (subject.get('theory_practical') == 'Practical') == (room.get('room_type') in LAB_ROOM_TYPES)
+
+    def room_fits(self, room_id, class_id, subject_id):
+        """Whether a room suits a lecture by type and capacity"""
+        students = (self.classes.get(class_id) or {}).get('num_students') or 0
+        capacity = (self.rooms.get(room_id) or {}).get('capacity') or 0
+        return self.room_type_fits(room_id, subject_id) and capacity >= students
+
+    def pick_room(self, class_id, subject_id, cell):
+        """Free room of the right type at a cell: the smallest that fits, else the largest"""
+        students = (self.classes.get(class_id) or {}).get('num_students') or 0
+        candidates = []
+        for room_id, room in self.rooms.items():
+            if (self.busy_cells('room', room_id) >> cell) & 1 or not self.room_type_fits(room_id, subject_id):
+                continue
+            capacity = room.get('capacity') or 0
+            candidates.append((capacity < students, capacity if capacity >= students else -capacity, room_id))
+        return min(candidates)[2] if candidates else None
+
+    # ------------------------------------------------------------------
+    # Soft constraints
+    # ------------------------------------------------------------------
+
+    def teacher_gaps(self, busy, day_idx):
+        """Idle slots between a teacher's first and last lecture of a day"""
+        day_bits = (busy & self.day_mask(day_idx)) >> (day_idx * self.n_slots)
+        if not day_bits:
+            return 0
+        span = day_bits.bit_length() - ((day_bits & -day_bits).bit_length() - 1)
+        return span - bit_count(day_bits)
+
+    def placement_penalty(self, class_id, subject_id, teacher_id, cell):
+        """Soft-constraint penalty of putting a lecture at a cell (entry must be removed first)"""
+        penalty = 0
+        day_idx = self.day_of(cell)
+        if self.slot_number_of(cell) == LUNCH_SLOT:
+            penalty += LUNCH_PENALTY
+
+        teacher = self.teachers.get(teacher_id)
+        if teacher and not (teacher['preferred_mask'] >> cell) & 1:
+            penalty += NON_PREFERRED_DAY_PENALTY
+
+        class_day = self.busy_cells('class', class_id) & self.day_mask(day_idx)
+        for other in self.cells(class_day):
+            penalty += SAME_SUBJECT_DAY_PENALTY * sum(
+                1 for e in self.entries_at('class', class_id, other) if e['subject_id'] == subject_id)
+
+        busy = self.busy_cells('teacher', teacher_id) | (1 << cell)
+        penalty += TEACHER_GAP_PENALTY * self.teacher_gaps(busy, day_idx)
+        return penalty
+
+
+def suggest_moves(model, entry_id):
+    """Every feasible target cell and same-class swap for an entry, best first"""
+    entry = model.remove_entry(entry_id)
+    origin = entry['cell']
+    class_id, subject_id = entry['class_id'], entry['subject_id']
+    teacher_id, room_id = entry['teacher_id'], entry['room_id']
+    try:
+        base = model.placement_penalty(class_id, subject_id, teacher_id, origin)
+
+        moves = []
+        for cell in model.cells(model.free_cells(class_id, teacher_id, room_id) & ~(1 << origin)):
+            if model.can_place(class_id, teacher_id, room_id, cell):
+                score = model.placement_penalty(class_id, subject_id, teacher_id, cell) - base
+                moves.append(dict(model.describe_cell(cell), score=score))
+
+        swaps = []
+        others = [e for cell in model.cells(model.busy_cells('class', class_id))
+                  for e in model.entries_at('class', class_id, cell)]
+        for other in others:
+            other_id, target = other['id'], other['cell']
+            model.remove_entry(other_id)
+            try:
+                other_base = model.placement_penalty(class_id, other['subject_id'],
+                                                     other['teacher_id'], target)
+                if not model.can_place(class_id, teacher_id, room_id, target):
+                    continue
+                score = model.placement_penalty(class_id, subject_id, teacher_id, target) - base
+                model.add_entry(dict(entry, id=None), target)
+                try:
+                    if not model.can_place(class_id, other['teacher_id'], other['room_id'], origin):
+                        continue
+                    score += model.placement_penalty(class_id, other['subject_id'],
+                                                     other['teacher_id'], origin) - other_base
+                finally:
+                    model.remove_entry(None)
+                swaps.append(dict(model.describe_cell(target), entry_id=other_id,
+                                  subject_id=other['subject_id'], score=score))
+            finally:
+                model.add_entry(other, target)
+    finally:
+        model.add_entry(entry, origin)
+
+    moves.sort(key=lambda m: (m['score'], m['time_slot_id'] or 0))
+    swaps.sort(key=lambda s: (s['score'], s['entry_id']))
+    return moves, swaps
+
+
+def keywords(text):
+    return {word for word in ''.join(c if c.isalnum() else ' ' for c in (text or '').lower()).split()
+            if len(word) > 2 and word not in ('lab', 'and', 'the')}
+
+
+def rank_substitutes(model, entry, exclude=(), week_loads=None, day_loads=None):
+    """Teachers free at an entry's cell with load headroom, best match first"""
+    cell = entry['cell']
+    day_idx = model.day_of(cell)
+    subject = model.subjects.get(entry['subject_id'], {})
+    subject_words = keywords(subject.get('name'))
+
+    candidates = []
+    for tid, teacher in model.teachers.items():
+        if tid == entry['teacher_id'] or tid in exclude:
+            continue
+        blocked = model.busy_cells('teacher', tid) | model.unavailable.get(tid, 0)
+        if (blocked >> cell) & 1:
+            continue
+        day_load = day_loads[tid] if day_loads else model.teacher_day_load(tid, day_idx)
+        week_load = week_loads[tid] if week_loads else model.teacher_week_load(tid)
+        max_day, max_week = model.teacher_limits(tid)
+        day_headroom, week_headroom = max_day - day_load, max_week - week_load
+        if day_headroom <= 0 or week_headroom <= 0:
+            continue
+
+        specialization_match = bool(subject_words & keywords(teacher.get('specialization')))
+        department_match = bool(subject.get('department')) and \
+            subject.get('department') == teacher.get('department')
+        score = (SPECIALIZATION_MATCH_SCORE * specialization_match
+                 + DEPARTMENT_MATCH_SCORE * department_match
+                 + DAY_HEADROOM_SCORE * day_headroom
+                 + WEEK_HEADROOM_SCORE * week_headroom
+                 - WEEK_LOAD_PENALTY * week_load)
+        candidates.append({
+            'teacher_id': tid,
+            'name': teacher['name'],
+            'department': teacher.get('department'),
+            'specialization': teacher.get('specialization'),
+            'specialization_match': specialization_match,
+            'department_match': department_match,
+            'day_load': day_load,
+            'week_load': week_load,
+            'score': round(score, 2),
+        })
+
+    candidates.sort(key=lambda c: (-c['score'], c['week_load'], c['teacher_id']))
+    return candidates
+
+
+def find_substitutes(model, teacher_id, day_idx, limit=5):
+    """Rank free teachers for each of a teacher's lectures on one day"""
+    week_loads = {tid: model.teacher_week_load(tid) for tid in model.teachers}
+    day_loads = {tid: model.teacher_day_load(tid, day_idx) for tid in model.teachers}
+
+    results = []
+    day_cells = model.busy_cells('teacher', teacher_id) & model.day_mask(day_idx)
+    for cell in model.cells(day_cells):
+        for entry in list(model.entries_at('teacher', teacher_id, cell)):
+            candidates = rank_substitutes(model, entry, week_loads=week_loads, day_loads=day_loads)
+            results.append(dict(model.describe_cell(cell), entry_id=entry['id'],
+                                class_id=entry['class_id'], subject_id=entry['subject_id'],
+                                subject_name=model.subjects.get(entry['subject_id'], {}).get('name'),
+                                room_id=entry['room_id'],
+                                candidates=candidates[:limit] if limit else candidates))
+    return results
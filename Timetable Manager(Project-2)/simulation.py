@@ -0,0 +1,212 @@
+from scheduler import LUNCH_SLOT, rank_substitutes
+
+ENTRY_FIELDS = ('class_id', 'subject_id', 'teacher_id', 'room_id')
+
+
+def quality_metrics(model):
+    """Headline quality numbers for a timetable model"""
+    conflicts = {'teacher': 0, 'room': 0, 'class': 0}
+    for kind, _, _, entries in model.double_bookings():
+        conflicts[kind] += len(entries) - 1
+
+    lunch_lectures = sum(1 for e in model.entries.values()
+                         if model.slot_number_of(e['cell']) == LUNCH_SLOT)
+    room_misfits = sum(1 for e in model.entries.values()
+                       if not model.room_fits(e['room_id'], e['class_id'], e['subject_id']))
+    non_preferred = sum(1 for e in model.entries.values()
+                        if e['teacher_id'] in model.teachers
+                        and not (model.teachers[e['teacher_id']]['preferred_mask'] >> e['cell']) & 1)
+    teacher_gaps = sum(model.teacher_gaps(model.busy_cells('teacher', tid), day_idx)
+                       for tid in model.teachers for day_idx in range(len(model.days)))
+
+    return {
+        'entries': len(model.entries),
+        'teacher_conflicts': conflicts['teacher'],
+        'room_conflicts': conflicts['room'],
+        'class_conflicts': conflicts['class'],
+        'room_misfits': room_misfits,
+        'lunch_slot_lectures': lunch_lectures,
+        'non_preferred_day_lectures': non_preferred,
+        'teacher_gaps': teacher_gaps,
+    }
+
+
+class Simulation:
+    """Applies hypothetical mutations to an in-memory TimetableModel.
+
+    Nothing here touches the database; the caller loads the model, runs the
+    mutations and repair, and reads back the diff and metric deltas.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.before = self._snapshot()
+        self.metrics_before = quality_metrics(model)
+        self.pending = []
+        self.locked = set()
+        self.unplaced = []
+        self._last_id = 0
+
+    def _snapshot(self):
+        return {entry_id: (entry['cell'],) + tuple(entry[f] for f in ENTRY_FIELDS)
+                for entry_id, entry in self.model.entries.items()}
+
+    def _new_id(self):
+        self._last_id -= 1
+        return self._last_id
+
+    def _unschedule(self, entry_id, **changes):
+        entry = self.model.remove_entry(entry_id)
+        entry.update(changes)
+        self.pending.append((entry, entry['cell']))
+
+    def _entries_of(self, kind, resource_id):
+        model = self.model
+        return [e['id'] for cell in model.cells(model.busy_cells(kind, resource_id))
+                for e in model.entries_at(kind, resource_id, cell)]
+
+    # ------------------------------------------------------------------
+    # Mutations
+    # ------------------------------------------------------------------
+
+    def apply(self, mutation):
+        handlers = {
+            'remove_teacher': self.remove_teacher,
+            'remove_room': self.remove_room,
+            'remove_class': self.remove_class,
+            'add_class': self.add_class,
+            'move_entry': self.move_entry,
+            'remove_entry': self.remove_entry,
+        }
+        handler = handlers.get(mutation.get('type'))
+        if handler is None:
+            raise ValueError(f"Unknown mutation type: {mutation.get('type')}")
+        params = {k: v for k, v in mutation.items() if k != 'type'}
+        handler(**params)
+
+    def remove_teacher(self, teacher_id):
+        if teacher_id not in self.model.teachers:
+            raise ValueError(f'Teacher {teacher_id} not found')
+        for entry_id in self._entries_of('teacher', teacher_id):
+            self._unschedule(entry_id, teacher_id=None)
+        del self.model.teachers[teacher_id]
+
+    def remove_room(self, room_id):
+        if room_id not in self.model.rooms:
+            raise ValueError(f'Room {room_id} not found')
+        for entry_id in self._entries_of('room', room_id):
+            self._unschedule(entry_id, room_id=None)
+        del self.model.rooms[room_id]
+
+    def remove_class(self, class_id):
+        if class_id not in self.model.classes:
+            raise ValueError(f'Class {class_id} not found')
+        for entry_id in self._entries_of('class', class_id):
+            self.model.remove_entry(entry_id)
+        del self.model.classes[class_id]
+
+    def add_class(self, name, like_class_id, num_students=None, **fields):
+        """Add a section that follows the same subjects and teachers as an existing class"""
+        template = self.model.classes.get(like_class_id)
+        if template is None:
+            raise ValueError(f'Class {like_class_id} not found')
+        class_id = self._new_id()
+        self.model.classes[class_id] = dict(template, id=class_id, name=name,
+                                            num_students=num_students or template.get('num_students'),
+                                            **fields)
+        for entry_id in self._entries_of('class', like_class_id):
+            source = self.model.entries[entry_id]
+            entry = {'id': self._new_id(), 'class_id': class_id, 'subject_id': source['subject_id'],
+                     'teacher_id': source['teacher_id'], 'room_id': source['room_id']}
+            self.pending.append((entry, source['cell']))
+        return class_id
+
+    def move_entry(self, entry_id, time_slot_id):
+        cell = self.model.cell_of_slot.get(time_slot_id)
+        if entry_id not in self.model.entries or cell is None:
+            raise ValueError(f'Cannot move entry {entry_id} to slot {time_slot_id}')
+        self.model.move_entry(entry_id, cell)
+        self.locked.add(entry_id)
+
+    def remove_entry(self, entry_id):
+        if entry_id not in self.model.entries:
+            raise ValueError(f'Entry {entry_id} not found')
+        self.model.remove_entry(entry_id)
+
+    # ------------------------------------------------------------------
+    # Repair
+    # ------------------------------------------------------------------
+
+    def repair(self, resolve_conflicts=True):
+        """Re-place lectures displaced by mutations, optionally clearing double bookings first"""
+        if resolve_conflicts:
+            for _, _, _, entries in list(self.model.double_bookings()):
+                live = [e for e in entries if e['id'] in self.model.entries]
+                live.sort(key=lambda e: e['id'] not in self.locked)
+                for entry in live[1:]:
+                    self._unschedule(entry['id'])
+
+        pending, self.pending = self.pending, []
+        for entry, preferred_cell in pending:
+            if not self._place(entry, preferred_cell):
+                self.unplaced.append(dict(entry, **self.model.describe_cell(preferred_cell)))
+
+    def _place(self, entry, preferred_cell):
+        model = self.model
+        class_id, subject_id = entry['class_id'], entry['subject_id']
+        free = model.all_cells & ~model.busy_cells('class', class_id)
+        best = None
+        for cell in sorted(model.cells(free), key=lambda c: c != preferred_cell):
+            teacher_id = entry['teacher_id']
+            if teacher_id not in model.teachers or not model.can_place(class_id, teacher_id, None, cell):
+                ranked = rank_substitutes(model, dict(entry, cell=cell))
+                if not ranked:
+                    continue
+                teacher_id = ranked[0]['teacher_id']
+
+            room_id = entry['room_id']
+            if room_id not in model.rooms or (model.busy_cells('room', room_id) >> cell) & 1:
+                room_id = model.pick_room(class_id, subject_id, cell)
+                if room_id is None:
+                    continue
+
+            penalty = model.placement_penalty(class_id, subject_id, teacher_id, cell)
+            if cell == preferred_cell:
+                best = (penalty, cell, teacher_id, room_id)
+                break
+            if best is None or penalty < best[0]:
+                best = (penalty, cell, teacher_id, room_id)
+
+        if best is None:
+            return False
+        _, cell, teacher_id, room_id = best
+        model.add_entry(dict(entry, teacher_id=teacher_id, room_id=room_id), cell)
+        return True
+
+    # ------------------------------------------------------------------
+    # Results
+    # ------------------------------------------------------------------
+
+    def result(self):
+        model = self.model
+        after = self._snapshot()
+
+        def describe(row, entry_id):
+            return dict(model.describe_cell(row[0]), id=entry_id, **dict(zip(ENTRY_FIELDS, row[1:])))
+
+        added = [describe(row, entry_id) for entry_id, row in after.items() if entry_id not in self.before]
+        removed = [describe(row, entry_id) for entry_id, row in self.before.items() if entry_id not in after]
+        changed = [{'from': describe(self.before[entry_id], entry_id), 'to': describe(row, entry_id)}
+                   for entry_id, row in after.items()
+                   if entry_id in self.before and self.before[entry_id] != row]
+
+        metrics_after = quality_metrics(model)
+        return {
+            'diff': {'added': added, 'removed': removed, 'changed': changed},
+            'unplaced': self.unplaced,
+            'metrics': {
+                'before': self.metrics_before,
+                'after': metrics_after,
+                'delta': {k: metrics_after[k] - self.metrics_before[k] for k in metrics_after},
+            },
+        }
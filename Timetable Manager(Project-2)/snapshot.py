@@ -0,0 +1,260 @@
+"""Binary timetable snapshots for public, login-free display endpoints.
+
+A snapshot is one file per published timetable; public reads map it with
+mmap and never touch SQLite. Everything is little-endian:
+
+    header      HEADER
+    strings     (n_strings + 1) u32 offsets, then the UTF-8 blob padded to 4 bytes
+    days        n_days u32 string ids
+    slots       n_slots SLOT records (start, end, slot_number)
+    classes     n_classes INDEX records sorted by id -> range of records
+    rooms       n_rooms INDEX records sorted by id -> range of room_index
+    room_index  n_records u32 record numbers, grouped by room and sorted by cell
+    records     n_records RECORD, grouped by class and sorted by cell
+"""
+import mmap
+import os
+import re
+import secrets
+import struct
+import time
+
+SNAPSHOT_DIR = os.environ.get('TIMETABLE_SNAPSHOT_DIR', 'snapshots')
+MAGIC = b'TTSN'
+FORMAT_VERSION = 1
+
+# magic, version, days, slots, pad, published_at, strings, classes, rooms, records
+HEADER = struct.Struct('<4sHHHHIIIII')
+U32 = struct.Struct('<I')
+SLOT = struct.Struct('<III')
+INDEX = struct.Struct('<IIII')  # id, label string, first, count
+RECORD = struct.Struct('<HHIIIII')  # cell, pad, class, subject name, subject code, teacher, room (string ids)
+
+TOKEN_PATTERN = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+SNAPSHOT_QUERY = '''
+    SELECT te.class_id, te.room_id, te.time_slot_id,
+           s.name AS subject_name, s.code AS subject_code, t.name AS teacher_name
+    FROM timetable_entries te
+    JOIN subjects s ON te.subject_id = s.id
+    JOIN teachers t ON te.teacher_id = t.id
+    WHERE te.user_id = ?
+'''
+
+
+def create_snapshot_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS published_snapshots (
+            user_id INTEGER PRIMARY KEY,
+            token TEXT UNIQUE NOT NULL,
+            records INTEGER DEFAULT 0,
+            bytes INTEGER DEFAULT 0,
+            published_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def snapshot_path(token):
+    if not TOKEN_PATTERN.match(token or ''):
+        raise ValueError('Invalid snapshot token')
+    return os.path.join(SNAPSHOT_DIR, f'{token}.ttsnap')
+
+
+def build_snapshot(conn, user_id):
+    """Serialize a user's current timetable; returns (bytes, record count)"""
+    from scheduler import TimetableModel
+
+    model = TimetableModel.load(conn, user_id, include_entries=False)
+    strings, string_ids = [], {}
+
+    def sid(text):
+        text = '' if text is None else str(text)
+        if text not in string_ids:
+            string_ids[text] = len(strings)
+            strings.append(text)
+        return string_ids[text]
+
+    slot_rows = {}
+    for row in conn.execute('SELECT start_time, end_time, slot_number FROM time_slots WHERE user_id = ?',
+                            (user_id,)):
+        slot_rows.setdefault(row['slot_number'], (row['start_time'], row['end_time']))
+
+    rows = []
+    for row in conn.execute(SNAPSHOT_QUERY, (user_id,)):
+        cell = model.cell_of_slot.get(row['time_slot_id'])
+        if cell is not None and row['class_id'] in model.classes:
+            rows.append((row['class_id'], cell, row['room_id'], row['subject_name'],
+                         row['subject_code'], row['teacher_name']))
+    rows.sort(key=lambda r: (r[0], r[1]))
+
+    class_ids = sorted(model.classes)
+    room_ids = sorted(model.rooms)
+    records = []
+    class_ranges = {}
+    for number, (class_id, cell, room_id, subject_name, subject_code, teacher_name) in enumerate(rows):
+        first, count = class_ranges.get(class_id, (number, 0))
+        class_ranges[class_id] = (first, count + 1)
+        room = model.rooms.get(room_id) or {}
+        records.append(RECORD.pack(cell, 0, sid(model.classes[class_id]['name']), sid(subject_name),
+                                   sid(subject_code), sid(teacher_name), sid(room.get('room_number'))))
+
+    by_room = sorted((rows[n][2], rows[n][1], n) for n in range(len(rows)) if rows[n][2] in model.rooms)
+    room_ranges = {}
+    for position, (room_id, _, _) in enumerate(by_room):
+        first, count = room_ranges.get(room_id, (position, 0))
+        room_ranges[room_id] = (first, count + 1)
+
+    slots = [(n, *slot_rows.get(n, ('', ''))) for n in model.slot_numbers]
+    sections = [
+        b''.join(U32.pack(sid(day)) for day in model.days),
+        b''.join(SLOT.pack(sid(start), sid(end), n or 0) for n, start, end in slots),
+        b''.join(INDEX.pack(class_id, sid(model.classes[class_id]['name']),
+                            *class_ranges.get(class_id, (0, 0))) for class_id in class_ids),
+        b''.join(INDEX.pack(room_id, sid(model.rooms[room_id].get('room_number')),
+                            *room_ranges.get(room_id, (0, 0))) for room_id in room_ids),
+        b''.join(U32.pack(n) for _, _, n in by_room),
+        b''.join(records),
+    ]
+
+    # The string table is complete only after every section above was built
+    encoded = [text.encode('utf-8') for text in strings]
+    offsets, position = [], 0
+    for blob in encoded:
+        offsets.append(position)
+        position += len(blob)
+    offsets.append(position)
+    blob = b''.join(encoded)
+    blob += b'\0' * (-len(blob) % 4)
+
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, len(model.days), len(model.slot_numbers), 0,
+                         int(time.time()), len(strings), len(class_ids), len(room_ids), len(records))
+    data = header + b''.join(U32.pack(o) for o in offsets) + blob + b''.join(sections)
+    return data, len(records)
+
+
+def publish_snapshot(conn, user_id):
+    """Write the user's snapshot file atomically and return its publication record; the caller commits"""
+    row = conn.execute('SELECT token FROM published_snapshots WHERE user_id = ?', (user_id,)).fetchone()
+    token = row['token'] if row else secrets.token_urlsafe(16)
+    data, records = build_snapshot(conn, user_id)
+
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    path = snapshot_path(token)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+    conn.execute('''
+        INSERT OR REPLACE INTO published_snapshots (user_id, token, records, bytes, published_at)
+        VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ''', (user_id, token, records, len(data)))
+    return {'token': token, 'records': records, 'bytes': len(data)}
+
+
+class SnapshotReader:
+    """Lookups served straight from an mmap of a snapshot file"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.n_days, self.n_slots, _, self.published_at,
+         n_strings, self.n_classes, self.n_rooms, self.n_records) = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError('Not a timetable snapshot')
+
+        self.string_offsets = HEADER.size
+        self.string_blob = self.string_offsets + (n_strings + 1) * U32.size
+        blob_size = U32.unpack_from(self.buffer, self.string_offsets + n_strings * U32.size)[0]
+        self.days_at = self.string_blob + blob_size + (-blob_size % 4)
+        self.slots_at = self.days_at + self.n_days * U32.size
+        self.classes_at = self.slots_at + self.n_slots * SLOT.size
+        self.rooms_at = self.classes_at + self.n_classes * INDEX.size
+        self.room_index_at = self.rooms_at + self.n_rooms * INDEX.size
+        self.records_at = self.room_index_at + self.n_records * U32.size
+
+    def string(self, string_id):
+        start, end = struct.unpack_from('<II', self.buffer, self.string_offsets + string_id * U32.size)
+        return self.buffer[self.string_blob + start:self.string_blob + end].decode('utf-8')
+
+    def days(self):
+        return [self.string(U32.unpack_from(self.buffer, self.days_at + i * U32.size)[0])
+                for i in range(self.n_days)]
+
+    def slots(self):
+        slots = []
+        for i in range(self.n_slots):
+            start, end, number = SLOT.unpack_from(self.buffer, self.slots_at + i * SLOT.size)
+            slots.append({'slot_number': number, 'start_time': self.string(start), 'end_time': self.string(end)})
+        return slots
+
+    def _index(self, at, count):
+        return [INDEX.unpack_from(self.buffer, at + i * INDEX.size) for i in range(count)]
+
+    def _find(self, at, count, entity_id):
+        """Binary search an id-sorted INDEX section"""
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            found = INDEX.unpack_from(self.buffer, at + mid * INDEX.size)
+            if found[0] == entity_id:
+                return found
+            if found[0] < entity_id:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def classes(self):
+        return [{'id': i, 'name': self.string(label)}
+                for i, label, _, _ in self._index(self.classes_at, self.n_classes)]
+
+    def rooms(self):
+        return [{'id': i, 'room_number': self.string(label)}
+                for i, label, _, _ in self._index(self.rooms_at, self.n_rooms)]
+
+    def _record(self, number, days):
+        cell, _, class_name, subject, code, teacher, room = RECORD.unpack_from(
+            self.buffer, self.records_at + number * RECORD.size)
+        slot_number = SLOT.unpack_from(self.buffer, self.slots_at + (cell % self.n_slots) * SLOT.size)[2]
+        return {'day': days[cell // self.n_slots], 'slot_number': slot_number,
+                'class_name': self.string(class_name), 'subject_name': self.string(subject),
+                'subject_code': self.string(code), 'teacher_name': self.string(teacher),
+                'room_number': self.string(room)}
+
+    def class_timetable(self, class_id):
+        found = self._find(self.classes_at, self.n_classes, class_id)
+        if found is None:
+            return None
+        _, label, first, count = found
+        days = self.days()
+        return {'id': class_id, 'name': self.string(label), 'days': days, 'slots': self.slots(),
+                'entries': [self._record(n, days) for n in range(first, first + count)]}
+
+    def room_timetable(self, room_id):
+        found = self._find(self.rooms_at, self.n_rooms, room_id)
+        if found is None:
+            return None
+        _, label, first, count = found
+        days = self.days()
+        numbers = struct.unpack_from(f'<{count}I', self.buffer, self.room_index_at + first * U32.size)
+        return {'id': room_id, 'room_number': self.string(label), 'days': days, 'slots': self.slots(),
+                'entries': [self._record(n, days) for n in numbers]}
+
+
+_readers = {}
+
+
+def open_snapshot(token):
+    """Reader for a published snapshot, re-mapped when the file is republished; None if unpublished"""
+    path = snapshot_path(token)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    key = (stat.st_ino, stat.st_mtime_ns)
+    cached = _readers.get(path)
+    if cached is None or cached[0] != key:
+        cached = (key, SnapshotReader(path))
+        _readers[path] = cached
+    return cached[1]
@@ -0,0 +1,86 @@
+const studentsInput = document.getElementById('studentsInput');
+const studentsRange = document.getElementById('studentsRange');
+const currentValue = document.getElementById('currentValue');
+
+function syncSlider() {
+    studentsRange.value = studentsInput.value;
+    currentValue.textContent = studentsInput.value;
+    updateSizeIndicator(parseInt(studentsInput.value));
+    updatePreview();
+}
+
+function syncInput() {
+    studentsInput.value = studentsRange.value;
+    currentValue.textContent = studentsRange.value;
+    updateSizeIndicator(parseInt(studentsRange.value));
+    updatePreview();
+}
+
+studentsInput.addEventListener('input', syncSlider);
+studentsRange.addEventListener('input', syncInput);
+
+function updateSizeIndicator(count) {
+    const smallBar = document.getElementById('smallBar');
+    const mediumBar = document.getElementById('mediumBar');
+    const largeBar = document.getElementById('largeBar');
+    const sizeCategory = document.getElementById('sizeCategory');
+
+    // Reset all
+    smallBar.style.width = '0%';
+    mediumBar.style.width = '0%';
+    largeBar.style.width = '0%';
+
+    let categoryName, categoryDesc, categoryIcon;
+
+    if (count <= 30) {
+        smallBar.style.width = (count / 30 * 100) + '%';
+        document.getElementById('smallPercentage').textContent = '100%';
+        document.getElementById('mediumPercentage').textContent = '0%';
+        document.getElementById('largePercentage').textContent = '0%';
+        categoryName = 'Small Class';
+        categoryDesc = 'Perfect for personalized attention';
+        categoryIcon = '👤';
+    } else if (count <= 80) {
+        mediumBar.style.width = ((count - 30) / 50 * 100) + '%';
+        document.getElementById('smallPercentage').textContent = '0%';
+        document.getElementById('mediumPercentage').textContent = '100%';
+        document.getElementById('largePercentage').textContent = '0%';
+        categoryName = 'Medium Class';
+        categoryDesc = 'Ideal for regular instruction';
+        categoryIcon = '👥';
+    } else {
+        largeBar.style.width = ((count - 80) / 120 * 100) + '%';
+        document.getElementById('smallPercentage').textContent = '0%';
+        document.getElementById('mediumPercentage').textContent = '0%';
+        document.getElementById('largePercentage').textContent = '100%';
+        categoryName = 'Large Class';
+        categoryDesc = 'Best for lectures and seminars';
+        categoryIcon = '👨‍👩‍👧‍👦';
+    }
+
+    sizeCategory.innerHTML = `
+        <div class="category-icon">${categoryIcon}</div>
+        <div class="category-name">${categoryName}</div>
+        <div class="category-desc">${categoryDesc}</div>
+    `;
+}
+
+function updatePreview() {
+    const name = document.getElementById('className').value || 'Class Name';
+    const semester = document.getElementById('semesterSelect').value || 'Semester';
+    const dept = document.getElementById('deptSelect').value || 'Department';
+    const students = studentsInput.value;
+
+    document.getElementById('previewName').textContent = name;
+    document.getElementById('previewSemester').textContent = semester;
+    document.getElementById('previewDept').textContent = dept;
+    document.getElementById('previewStudents').textContent = students;
+}
+
+document.getElementById('className').addEventListener('input', updatePreview);
+document.getElementById('semesterSelect').addEventListener('change', updatePreview);
+document.getElementById('deptSelect').addEventListener('change', updatePreview);
+
+// Initialize
+updateSizeIndicator(60);
+updatePreview();
@@ -0,0 +1,57 @@
+function updatePreview() {
+    const name = document.getElementById('roomName').value || 'Room Name';
+    const number = document.getElementById('roomNumber').value.toUpperCase() || 'ROOM-000';
+    const capacity = document.getElementById('capacityInput').value;
+    const type = document.getElementById('roomType').value;
+    const hasProjector = document.getElementById('projectorCheck').checked;
+    const hasLab = document.getElementById('labCheck').checked;
+
+    // Update preview
+    document.getElementById('previewName').textContent = name;
+    document.getElementById('previewNumber').textContent = number;
+    document.getElementById('previewCapacity').textContent = capacity;
+
+    // Update icon based on type
+    const icons = {
+        'Classroom': '📖',
+        'Lab': '🔬',
+        'Lecture Hall': '🎭',
+        'Seminar Hall': '💼',
+        'Tutorial Room': '✍️',
+        'Auditorium': '🎪'
+    };
+    document.getElementById('previewIcon').textContent = icons[type] || '🏛️';
+
+    // Update facilities
+    let facilities = [];
+    if (hasProjector) facilities.push('<span class="facility-tag">📽️ Projector</span>');
+    if (hasLab) facilities.push('<span class="facility-tag">🔬 Lab Equipment</span>');
+    document.getElementById('previewFacilities').innerHTML = facilities.join('') || '<span class="facility-tag">No special equipment</span>';
+
+    // Update capacity bars
+    const cap = parseInt(capacity);
+    document.getElementById('smallBar').style.width = cap < 40 ? '100%' : '0%';
+    document.getElementById('mediumBar').style.width = (cap >= 40 && cap <= 80) ? '100%' : '0%';
+    document.getElementById('largeBar').style.width = cap > 80 ? '100%' : '0%';
+
+    // Recommendation
+    let rec = '';
+    if (cap < 40) rec = '✅ Perfect for small classes and tutorials';
+    else if (cap <= 80) rec = '✅ Ideal for regular classes';
+    else rec = '✅ Great for large lectures and seminars';
+
+    document.getElementById('recommendation').textContent = `Current capacity: ${cap} students. ${rec}`;
+}
+
+// Live updates
+document.getElementById('roomName').addEventListener('input', updatePreview);
+document.getElementById('roomNumber').addEventListener('input', function() {
+    this.value = this.value.toUpperCase();
+    updatePreview();
+});
+document.getElementById('capacityInput').addEventListener('input', updatePreview);
+document.getElementById('projectorCheck').addEventListener('change', updatePreview);
+document.getElementById('labCheck').addEventListener('change', updatePreview);
+
+// Initialize
+updatePreview();
@@ -0,0 +1,28 @@
+function updatePreview() {
+    const name = document.querySelector('input[name="name"]').value || 'Subject Name';
+    const code = document.querySelector('input[name="code"]').value.toUpperCase() || 'CODE';
+    const credits = document.getElementById('creditsInput').value;
+    const hours = document.getElementById('hoursInput').value;
+
+    document.getElementById('previewName').textContent = name;
+    document.getElementById('previewCode').textContent = code;
+    document.getElementById('previewCredits').textContent = credits;
+    document.getElementById('previewHours').textContent = hours;
+}
+
+function updateIcon() {
+    const type = document.getElementById('subjectType').value;
+    const icon = type === 'Theory' ? '📖' : '🔬';
+    document.getElementById('previewIcon').textContent = icon;
+}
+
+// Live preview updates
+document.querySelector('input[name="name"]').addEventListener('input', updatePreview);
+document.querySelector('input[name="code"]').addEventListener('input', updatePreview);
+document.getElementById('creditsInput').addEventListener('input', updatePreview);
+document.getElementById('hoursInput').addEventListener('input', updatePreview);
+
+// Auto uppercase for code
+document.querySelector('input[name="code"]').addEventListener('input', function() {
+    this.value = this.value.toUpperCase();
+});
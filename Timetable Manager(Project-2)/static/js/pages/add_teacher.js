@@ -0,0 +1,59 @@
+// Live preview updates
+const maxHoursDay = document.getElementById('maxHoursDay');
+const maxHoursWeek = document.getElementById('maxHoursWeek');
+const dailyPreview = document.getElementById('dailyPreview');
+const weeklyPreview = document.getElementById('weeklyPreview');
+const dailyProgress = document.getElementById('dailyProgress');
+const weeklyProgress = document.getElementById('weeklyProgress');
+
+function updatePreview() {
+    const daily = parseInt(maxHoursDay.value) || 0;
+    const weekly = parseInt(maxHoursWeek.value) || 0;
+
+    dailyPreview.textContent = `${daily} hours`;
+    weeklyPreview.textContent = `${weekly} hours`;
+
+    dailyProgress.style.width = `${(daily / 10) * 100}%`;
+    weeklyProgress.style.width = `${(weekly / 50) * 100}%`;
+
+    // Color coding
+    if (daily <= 4) {
+        dailyProgress.style.background = 'linear-gradient(90deg, #4caf50, #66bb6a)';
+    } else if (daily <= 6) {
+        dailyProgress.style.background = 'linear-gradient(90deg, #ff9800, #ffa726)';
+    } else {
+        dailyProgress.style.background = 'linear-gradient(90deg, #f44336, #ef5350)';
+    }
+
+    if (weekly <= 24) {
+        weeklyProgress.style.background = 'linear-gradient(90deg, #4caf50, #66bb6a)';
+    } else if (weekly <= 32) {
+        weeklyProgress.style.background = 'linear-gradient(90deg, #ff9800, #ffa726)';
+    } else {
+        weeklyProgress.style.background = 'linear-gradient(90deg, #f44336, #ef5350)';
+    }
+}
+
+maxHoursDay.addEventListener('input', updatePreview);
+maxHoursWeek.addEventListener('input', updatePreview);
+
+// Form validation
+document.getElementById('teacherForm').addEventListener('submit', function(e) {
+    const daily = parseInt(maxHoursDay.value);
+    const weekly = parseInt(maxHoursWeek.value);
+
+    if (daily > 8) {
+        if (!confirm('Warning: Daily hours exceed recommended limit (8 hours). Continue?')) {
+            e.preventDefault();
+        }
+    }
+
+    if (weekly > 40) {
+        if (!confirm('Warning: Weekly hours exceed recommended limit (40 hours). Continue?')) {
+            e.preventDefault();
+        }
+    }
+});
+
+// Initialize preview
+updatePreview();
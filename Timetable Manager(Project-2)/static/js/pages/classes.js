@@ -0,0 +1,33 @@
+function filterBySemester(semester) {
+    const cards = document.querySelectorAll('.class-card');
+    const tabs = document.querySelectorAll('.tab-btn');
+
+    tabs.forEach(tab => tab.classList.remove('active'));
+    event.target.classList.add('active');
+
+    cards.forEach(card => {
+        if (semester === 'all' || card.dataset.semester === semester) {
+            card.style.display = 'block';
+            card.style.animation = 'fadeInScale 0.5s ease-out';
+        } else {
+            card.style.display = 'none';
+        }
+    });
+}
+
+function deleteClass(id, name) {
+    if (confirm(`Delete class "${name}"?\n\nThis will remove all associated timetable entries.`)) {
+        fetch(`/classes/delete/${id}`, {
+            method: 'POST'
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                showNotification('Class deleted successfully!', 'success');
+                setTimeout(() => location.reload(), 1000);
+            } else {
+                showNotification('Error: ' + data.error, 'error');
+            }
+        });
+    }
+}
@@ -0,0 +1,87 @@
+// Poll a generation run another request started until it finishes; resolves like the generate response
+function waitForRun(pollUrl) {
+    return new Promise(resolve => setTimeout(resolve, 1000))
+        .then(() => fetch(pollUrl))
+        .then(response => response.json())
+        .then(run => {
+            if (run.status === 'running') {
+                return waitForRun(pollUrl);
+            }
+            return run.status === 'completed' ? { success: true } : { success: false, error: run.error };
+        });
+}
+
+function generateTimetable() {
+    const classSelect = document.getElementById('classSelect');
+    const classId = classSelect.value;
+
+    if (!classId) {
+        alert('Please select a class first!');
+        return;
+    }
+
+    const className = classSelect.options[classSelect.selectedIndex].dataset.name;
+    const btn = document.getElementById('generateBtn');
+    const progressContainer = document.getElementById('progressContainer');
+    const progressBar = document.getElementById('progressBar');
+    const progressSteps = document.getElementById('progressSteps');
+
+    // Show progress
+    btn.disabled = true;
+    btn.textContent = '⚙️ Generating...';
+    progressContainer.style.display = 'block';
+
+    // Simulate progress steps
+    const steps = [
+        '📊 Analyzing constraints...',
+        '🧬 Initializing genetic algorithm...',
+        '🔄 Running generations...',
+        '⚖️ Balancing workload...',
+        '🚫 Checking for conflicts...',
+        '✨ Optimizing schedule...',
+        '💾 Saving timetable...'
+    ];
+
+    let currentStep = 0;
+    let progress = 0;
+
+    const stepInterval = setInterval(() => {
+        if (currentStep < steps.length) {
+            progressSteps.innerHTML = `<div class="step bounce-in">${steps[currentStep]}</div>`;
+            currentStep++;
+            progress += 14;
+            progressBar.style.width = progress + '%';
+        }
+    }, 800);
+
+    // Call API
+    fetch('/api/generate-timetable', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({ class_id: classId })
+    })
+    .then(response => response.json().then(data => response.status === 202 ? waitForRun(data.poll_url) : data))
+    .then(data => {
+        clearInterval(stepInterval);
+        progressBar.style.width = '100%';
+
+        if (data.success) {
+            progressSteps.innerHTML = '<div class="step success-step">✅ Timetable generated successfully!</div>';
+            setTimeout(() => {
+                window.location.href = `/view/${classId}`;
+            }, 1500);
+        } else {
+            progressSteps.innerHTML = '<div class="step error-step">❌ Error: ' + data.error + '</div>';
+            btn.disabled = false;
+            btn.textContent = '🚀 Generate Timetable';
+        }
+    })
+    .catch(error => {
+        clearInterval(stepInterval);
+        progressSteps.innerHTML = '<div class="step error-step">❌ Error: ' + error + '</div>';
+        btn.disabled = false;
+        btn.textContent = '🚀 Generate Timetable';
+    });
+}
@@ -0,0 +1,63 @@
+function filterRooms(type) {
+    const cards = document.querySelectorAll('.room-card');
+    const tabs = document.querySelectorAll('.tab-btn');
+
+    tabs.forEach(tab => tab.classList.remove('active'));
+    event.target.classList.add('active');
+
+    cards.forEach(card => {
+        if (type === 'all' || card.dataset.type === type) {
+            card.style.display = 'block';
+            card.style.animation = 'fadeInScale 0.5s ease-out';
+        } else {
+            card.style.display = 'none';
+        }
+    });
+}
+
+function searchRooms() {
+    const input = document.getElementById('searchInput').value.toLowerCase();
+    const cards = document.querySelectorAll('.room-card');
+
+    cards.forEach(card => {
+        const text = card.textContent.toLowerCase();
+        card.style.display = text.includes(input) ? 'block' : 'none';
+    });
+}
+
+function filterByCapacity() {
+    const filter = document.getElementById('capacityFilter').value;
+    const cards = document.querySelectorAll('.room-card');
+
+    cards.forEach(card => {
+        const capacity = parseInt(card.dataset.capacity);
+        let show = true;
+
+        if (filter === 'small') show = capacity < 40;
+        else if (filter === 'medium') show = capacity >= 40 && capacity <= 80;
+        else if (filter === 'large') show = capacity > 80;
+
+        card.style.display = show ? 'block' : 'none';
+    });
+}
+
+function viewRoomSchedule(id) {
+    alert('Room schedule view will show all bookings for this room.');
+}
+
+function deleteRoom(id, roomNumber) {
+    if (confirm(`Delete room ${roomNumber}?\n\nThis will affect all timetable entries.`)) {
+        fetch(`/rooms/delete/${id}`, {
+            method: 'POST'
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                showNotification('Room deleted successfully!', 'success');
+                setTimeout(() => location.reload(), 1000);
+            } else {
+                showNotification('Error: ' + data.error, 'error');
+            }
+        });
+    }
+}
@@ -0,0 +1,13 @@
+function showTab(tab) {
+    // Hide all tabs
+    document.getElementById('profile-tab').style.display = 'none';
+    document.getElementById('security-tab').style.display = 'none';
+    document.getElementById('stats-tab').style.display = 'none';
+
+    // Show selected tab
+    document.getElementById(tab + '-tab').style.display = 'block';
+
+    // Update active nav
+    document.querySelectorAll('.settings-nav a').forEach(a => a.classList.remove('active'));
+    event.target.classList.add('active');
+}
@@ -0,0 +1,39 @@
+const passwordInput = document.getElementById('password');
+const strengthDiv = document.getElementById('passwordStrength');
+const confirmInput = document.getElementById('confirm_password');
+
+passwordInput.addEventListener('input', function() {
+    const password = this.value;
+    let strength = 'weak';
+    let strengthText = '';
+    let strengthClass = 'strength-weak';
+
+    if (password.length === 0) {
+        strengthDiv.textContent = '';
+        return;
+    }
+
+    if (password.length >= 6 && password.length < 10) {
+        strength = 'medium';
+        strengthText = '🟡 Medium strength';
+        strengthClass = 'strength-medium';
+    } else if (password.length >= 10) {
+        strength = 'strong';
+        strengthText = '🟢 Strong password';
+        strengthClass = 'strength-strong';
+    } else {
+        strengthText = '🔴 Weak password (min 6 characters)';
+        strengthClass = 'strength-weak';
+    }
+
+    strengthDiv.textContent = strengthText;
+    strengthDiv.className = 'password-strength ' + strengthClass;
+});
+
+confirmInput.addEventListener('input', function() {
+    if (this.value !== passwordInput.value) {
+        this.setCustomValidity('Passwords do not match');
+    } else {
+        this.setCustomValidity('');
+    }
+});
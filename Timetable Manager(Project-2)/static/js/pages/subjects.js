@@ -0,0 +1,33 @@
+function filterByType(type) {
+    const cards = document.querySelectorAll('.subject-card');
+    const tabs = document.querySelectorAll('.tab-btn');
+
+    tabs.forEach(tab => tab.classList.remove('active'));
+    event.target.classList.add('active');
+
+    cards.forEach(card => {
+        if (type === 'all' || card.dataset.type === type) {
+            card.style.display = 'block';
+            card.style.animation = 'fadeInScale 0.5s ease-out';
+        } else {
+            card.style.display = 'none';
+        }
+    });
+}
+
+function deleteSubject(id, name) {
+    if (confirm(`Are you sure you want to delete "${name}"?\n\nThis will affect all timetable entries with this subject.`)) {
+        fetch(`/subjects/delete/${id}`, {
+            method: 'POST'
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                showNotification('Subject deleted successfully!', 'success');
+                setTimeout(() => location.reload(), 1000);
+            } else {
+                showNotification('Error: ' + data.error, 'error');
+            }
+        });
+    }
+}
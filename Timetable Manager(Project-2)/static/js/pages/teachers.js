@@ -0,0 +1,35 @@
+function filterTable() {
+    const searchInput = document.getElementById('searchInput').value.toLowerCase();
+    const deptFilter = document.getElementById('deptFilter').value;
+    const table = document.getElementById('teachersTable');
+    const rows = table.getElementsByTagName('tbody')[0].getElementsByTagName('tr');
+
+    for (let i = 0; i < rows.length; i++) {
+        const row = rows[i];
+        const name = row.cells[1].textContent.toLowerCase();
+        const email = row.cells[2].textContent.toLowerCase();
+        const dept = row.cells[4].textContent;
+
+        const matchesSearch = name.includes(searchInput) || email.includes(searchInput);
+        const matchesDept = !deptFilter || dept === deptFilter;
+
+        row.style.display = (matchesSearch && matchesDept) ? '' : 'none';
+    }
+}
+
+function deleteTeacher(id, name) {
+    if (confirm(`Are you sure you want to delete ${name}?\n\nThis will remove all associated timetable entries.`)) {
+        fetch(`/teachers/delete/${id}`, {
+            method: 'POST'
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                showNotification('Teacher deleted successfully!', 'success');
+                setTimeout(() => location.reload(), 1000);
+            } else {
+                showNotification('Error: ' + data.error, 'error');
+            }
+        });
+    }
+}
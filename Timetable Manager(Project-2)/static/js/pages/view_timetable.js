@@ -0,0 +1,29 @@
+function setView(view) {
+    const gridView = document.getElementById('gridView');
+    const listView = document.getElementById('listView');
+    const buttons = document.querySelectorAll('.view-btn');
+
+    buttons.forEach(btn => btn.classList.remove('active'));
+    event.target.classList.add('active');
+
+    if (view === 'grid') {
+        gridView.style.display = 'block';
+        listView.style.display = 'none';
+    } else {
+        gridView.style.display = 'none';
+        listView.style.display = 'block';
+    }
+}
+
+function exportToPDF() {
+    alert('PDF export feature would be implemented here using libraries like jsPDF or server-side PDF generation.');
+}
+
+// Add print-friendly class names when printing
+window.onbeforeprint = function() {
+    document.body.classList.add('printing');
+};
+
+window.onafterprint = function() {
+    document.body.classList.remove('printing');
+};
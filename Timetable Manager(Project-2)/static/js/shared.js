@@ -0,0 +1,48 @@
+// Helpers used by several pages; bundled into js/app.js
+
+function showNotification(message, type) {
+    const notification = document.createElement('div');
+    notification.className = `notification ${type} slide-in-right`;
+    notification.textContent = message;
+    notification.style.cssText = `
+        position: fixed;
+        top: 20px;
+        right: 20px;
+        padding: 15px 25px;
+        background: ${type === 'success' ? '#4caf50' : '#f44336'};
+        color: white;
+        border-radius: 10px;
+        box-shadow: 0 4px 15px rgba(0,0,0,0.2);
+        z-index: 10000;
+        animation: slideInRight 0.5s;
+    `;
+    document.body.appendChild(notification);
+    setTimeout(() => notification.remove(), 3000);
+}
+
+// Delete every checked .select-item on a list page with one batch request
+function deleteSelected(kind) {
+    const ids = Array.from(document.querySelectorAll('.select-item:checked'), box => parseInt(box.value));
+    if (!ids.length) {
+        showNotification(`Select the ${kind} to delete first`, 'error');
+        return;
+    }
+    if (!confirm(`Delete ${ids.length} selected ${kind}?\n\nThis will affect all timetable entries that use them.`)) {
+        return;
+    }
+    fetch(`/api/${kind}/batch`, {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({operations: ids.map(id => ({op: 'delete', id: id}))})
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            showNotification(`Deleted ${data.applied} ${kind}`, 'success');
+            setTimeout(() => location.reload(), 1000);
+        } else {
+            const failed = (data.results || []).find(result => result.status !== 'skipped' && result.error);
+            showNotification('Error: ' + (failed ? failed.error : data.error), 'error');
+        }
+    });
+}
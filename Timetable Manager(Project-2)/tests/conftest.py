@@ -0,0 +1,58 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """A fresh, unsharded database file for one test"""
+    path = str(tmp_path / 'timetable.db')
+    monkeypatch.setattr(database, 'DATABASE', path)
+    monkeypatch.setattr(database, 'SHARD_DIR', None)
+    monkeypatch.setattr(database, '_initialized', False)
+    monkeypatch.setattr(database, '_ready_shards', set())
+    return path
+
+
+@pytest.fixture
+def app(db_path):
+    """An application built by the factory over the test database, without built assets"""
+    from app import create_app
+
+    return create_app({'TESTING': True})
+
+
+@pytest.fixture
+def conn(db_path):
+    """Writer connection to an initialized database without the demo account"""
+    database.init_db(seed_demo=False)
+    conn = database.get_db_connection(readonly=False)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def tenant(conn):
+    """A user with one class, two subjects, teachers, rooms and a Monday/Tuesday grid of slots"""
+    user_id = conn.execute("INSERT INTO users (name, email, password) VALUES ('T', 't@example.com', 'x')").lastrowid
+    class_id = conn.execute("INSERT INTO classes (name, user_id) VALUES ('CS-A', ?)", (user_id,)).lastrowid
+    subjects = [conn.execute('INSERT INTO subjects (name, code, user_id) VALUES (?, ?, ?)',
+                             (f'Subject {i}', f'S{i}', user_id)).lastrowid for i in range(2)]
+    teachers = [conn.execute('INSERT INTO teachers (name, user_id) VALUES (?, ?)',
+                             (f'Teacher {i}', user_id)).lastrowid for i in range(2)]
+    rooms = [conn.execute('INSERT INTO rooms (name, room_number, user_id) VALUES (?, ?, ?)',
+                          (f'Room {i}', f'R{i}', user_id)).lastrowid for i in range(2)]
+    slots = {}
+    for day in ('Monday', 'Tuesday'):
+        for number in range(1, 4):
+            slots[day, number] = conn.execute('''
+                INSERT INTO time_slots (day, start_time, end_time, slot_number, user_id) VALUES (?, ?, ?, ?, ?)
+            ''', (day, f'0{8 + number}:00', f'0{8 + number}:50', number, user_id)).lastrowid
+    conn.commit()
+    return {'user_id': user_id, 'class_id': class_id, 'subjects': subjects, 'teachers': teachers,
+            'rooms': rooms, 'slots': slots}
@@ -0,0 +1,48 @@
+import os
+
+import pytest
+from flask import Flask, render_template_string
+
+import assets
+
+
+@pytest.fixture
+def site(tmp_path):
+    os.makedirs(tmp_path / 'css' / 'pages')
+    (tmp_path / 'css' / 'style.css').write_text('body { color: black; }\n' * 50)
+    (tmp_path / 'css' / 'shared.css').write_text('.preview-icon { font-size: 64px; }\n')
+    (tmp_path / 'css' / 'pages' / 'rooms.css').write_text('.room-card { padding: 4px; }\n')
+    os.makedirs(tmp_path / 'js')
+    (tmp_path / 'js' / 'shared.js').write_text('function showNotification() {}\n')
+    site = Flask(__name__, static_folder=str(tmp_path), static_url_path='/static')
+    site.testing = True
+    assets.init_app(site)
+    site.add_url_rule('/', 'page', lambda: render_template_string(
+        "{{ asset_url('css/app.css') }} {{ asset_url('css/pages/rooms.css') }}"))
+    return site
+
+
+def test_pages_link_unhashed_files_without_built_assets(site):
+    client = site.test_client()
+    bundle_url, page_url = client.get('/').get_data(as_text=True).split()
+    assert page_url == '/static/css/pages/rooms.css'
+
+    bundle = client.get(bundle_url)
+    assert bundle.status_code == 200
+    assert bundle.get_data(as_text=True).endswith('.preview-icon { font-size: 64px; }\n')
+    assert bundle.headers['Cache-Control'] == 'no-cache'
+    assert not os.path.exists(os.path.join(site.static_folder, assets.DIST_DIR))
+
+
+def test_pages_link_the_built_assets(site):
+    manifest = assets.build_assets(site.static_folder)
+    assert sorted(manifest) == ['css/app.css', 'css/pages/rooms.css', 'js/app.js']
+    client = site.test_client()
+
+    bundle_url, page_url = client.get('/').get_data(as_text=True).split()
+    assert bundle_url == f"/assets/{manifest['css/app.css']}"
+    assert page_url == f"/assets/{manifest['css/pages/rooms.css']}"
+    response = client.get(bundle_url, headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'immutable' in response.headers['Cache-Control']
+    assert client.get(bundle_url).get_data() == assets.bundle_content(site.static_folder, 'css/app.css')
@@ -0,0 +1,63 @@
+import sqlite3
+
+import pytest
+
+import batch
+
+
+def slot(day='Monday', slot_number=1):
+    return {'op': 'create', 'data': {'day': day, 'start_time': '09:00', 'end_time': '09:50',
+                                     'slot_number': slot_number}}
+
+
+def test_time_slots_must_fit_the_entry_key(conn, tenant):
+    applied, results = batch.apply_batch(conn, tenant['user_id'], 'time_slots', [
+        slot(), slot(day='Day A'), slot(slot_number=32), slot(slot_number='late')], atomic=False)
+
+    assert applied == 2
+    assert [r['status'] for r in results] == ['created', 'error', 'created', 'error']
+    assert 'day must be one of Monday' in results[1]['error']
+    assert results[3]['error'] == 'slot_number must be an integer'
+
+
+def test_entry_in_an_unusable_slot_is_rejected_clearly(conn, tenant):
+    unnumbered = conn.execute("INSERT INTO time_slots (day, start_time, end_time, user_id) "
+                              "VALUES ('Monday', '23:00', '23:50', ?)", (tenant['user_id'],)).lastrowid
+    with pytest.raises(sqlite3.IntegrityError, match='Time slot has no slot number'):
+        conn.execute('INSERT INTO timetable_entries (class_id, time_slot_id, day, user_id) VALUES (?, ?, ?, ?)',
+                     (tenant['class_id'], unnumbered, 'Monday', tenant['user_id']))
+
+
+def subject(code):
+    return {'op': 'create', 'data': {'name': f'Subject {code}', 'code': code}}
+
+
+def codes(conn, user_id):
+    return [row[0] for row in conn.execute('SELECT code FROM subjects WHERE user_id = ? ORDER BY id', (user_id,))]
+
+
+def test_atomic_batch_rolls_back_on_a_database_error(conn, tenant):
+    applied, results = batch.apply_batch(conn, tenant['user_id'], 'subjects',
+                                         [subject('X1'), subject('S0'), subject('X2')])
+
+    assert applied == 0
+    assert [(r['status'], r['id']) for r in results] == [('skipped', None), ('error', None), ('skipped', None)]
+    assert results[1]['error'].startswith('Batch rolled back: UNIQUE constraint failed')
+    assert codes(conn, tenant['user_id']) == ['S0', 'S1']
+
+
+
+def test_non_atomic_batch_undoes_only_the_failing_item(conn, tenant):
+    user_id = tenant['user_id']
+    applied, results = batch.apply_batch(conn, user_id, 'subjects', [
+        subject('X1'), subject('S0'), subject('X2'),
+        {'op': 'update', 'id': tenant['subjects'][1], 'data': {'code': 'X1'}},
+        {'op': 'delete', 'id': tenant['subjects'][1]}], atomic=False)
+    conn.commit()
+
+    assert applied == 3
+    assert [r['status'] for r in results] == ['created', 'error', 'created', 'error', 'deleted']
+    assert 'UNIQUE constraint failed' in results[1]['error']
+    assert codes(conn, user_id) == ['S0', 'X1', 'X2']
+    assert [r['id'] for r in results[:3:2]] == [row[0] for row in conn.execute(
+        "SELECT id FROM subjects WHERE code IN ('X1', 'X2') ORDER BY id")]
@@ -0,0 +1,71 @@
+import changes
+
+
+def add_entry(conn, tenant, day, number, room=0):
+    conn.execute('''
+        INSERT INTO timetable_entries (class_id, subject_id, teacher_id, room_id, time_slot_id, day, user_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (tenant['class_id'], tenant['subjects'][0], tenant['teachers'][0], tenant['rooms'][room],
+          tenant['slots'][day, number], day, tenant['user_id']))
+    return conn.execute('SELECT id FROM timetable_entries WHERE class_id = ? AND time_slot_id = ?',
+                        (tenant['class_id'], tenant['slots'][day, number])).fetchone()[0]
+
+
+def test_changes_since_returns_current_entry_rows(conn, tenant):
+    user_id = tenant['user_id']
+    since = changes.last_seq(conn, user_id)
+    kept = add_entry(conn, tenant, 'Monday', 1)
+    dropped = add_entry(conn, tenant, 'Tuesday', 2)
+    conn.execute('UPDATE timetable_entries SET room_id = ? WHERE id = ?', (tenant['rooms'][1], kept))
+    conn.execute('DELETE FROM timetable_entries WHERE id = ?', (dropped,))
+    conn.commit()
+
+    feed = changes.changes_since(conn, user_id, since)
+    deltas = {(d['entity'], d['id']): d for d in feed['changes']}
+    assert deltas['timetable_entries', dropped]['op'] == 'delete'
+    upsert = deltas['timetable_entries', kept]
+    assert upsert['op'] == 'upsert'
+    assert upsert['data'] == dict(conn.execute('SELECT * FROM timetable_entries WHERE id = ?', (kept,)).fetchone())
+    assert upsert['data']['room_id'] == tenant['rooms'][1]
+    assert upsert['data']['time_slot_id'] == tenant['slots']['Monday', 1]
+
+
+def test_changes_since_pages_through_the_log(conn, tenant):
+    user_id = tenant['user_id']
+    since = changes.last_seq(conn, user_id)
+    ids = [add_entry(conn, tenant, day, number) for day in ('Monday', 'Tuesday') for number in (1, 2, 3)]
+    conn.commit()
+
+    seen = []
+    while True:
+        page = changes.changes_since(conn, user_id, since, limit=4)
+        seen += [d['id'] for d in page['changes']]
+        since = page['last_seq']
+        if not page['has_more']:
+            break
+    assert seen == ids
+
+
+def test_moved_entry_keeps_its_id(conn, tenant):
+    user_id = tenant['user_id']
+    entry_id = add_entry(conn, tenant, 'Monday', 1)
+    conn.commit()
+    since = changes.last_seq(conn, user_id)
+    conn.execute('UPDATE timetable_entries SET time_slot_id = ? WHERE id = ?',
+                 (tenant['slots']['Tuesday', 2], entry_id))
+
+    feed = changes.changes_since(conn, user_id, since)['changes']
+    assert [(d['id'], d['op'], d['data']['time_slot_id']) for d in feed] == [
+        (entry_id, 'upsert', tenant['slots']['Tuesday', 2])]
+
+
+def test_entry_rows_are_read_by_their_id_index(conn, tenant):
+    entry_id = add_entry(conn, tenant, 'Monday', 1)
+    statements = []
+    conn.set_trace_callback(statements.append)
+    changes._load_rows(conn, 'timetable_entries', tenant['user_id'], [entry_id])
+    conn.set_trace_callback(None)
+
+    plan = ' '.join(row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + statements[-1]))
+    assert 'SEARCH e USING INDEX idx_entries_id' in plan
+    assert 'SCAN e' not in plan
@@ -0,0 +1,84 @@
+import pytest
+
+import entry_storage
+
+
+def make_old_table(conn, rows):
+    """Turn a fresh database back into the rowid timetable_entries layout with the given rows"""
+    conn.execute('DROP VIEW timetable_entries')
+    conn.execute('''
+        CREATE TABLE timetable_entries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            class_id INTEGER, subject_id INTEGER, teacher_id INTEGER, room_id INTEGER,
+            time_slot_id INTEGER, day TEXT NOT NULL, user_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.executemany('''
+        INSERT INTO timetable_entries (id, class_id, subject_id, teacher_id, room_id, time_slot_id, day, user_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    conn.commit()
+
+
+def test_migration_keeps_every_row(conn, tenant):
+    user_id, class_id = tenant['user_id'], tenant['class_id']
+    subject, teacher, room = tenant['subjects'][0], tenant['teachers'][0], tenant['rooms'][0]
+    monday_1 = tenant['slots']['Monday', 1]
+    custom_day = conn.execute("INSERT INTO time_slots (day, start_time, end_time, slot_number, user_id) "
+                              "VALUES ('Day A', '09:00', '09:50', 1, ?)", (user_id,)).lastrowid
+    late_slot = conn.execute("INSERT INTO time_slots (day, start_time, end_time, slot_number, user_id) "
+                             "VALUES ('Monday', '23:00', '23:50', 40, ?)", (user_id,)).lastrowid
+    unnumbered = conn.execute("INSERT INTO time_slots (day, start_time, end_time, user_id) "
+                              "VALUES ('Friday', '08:00', '08:50', ?)", (user_id,)).lastrowid
+    make_old_table(conn, [
+        (1, class_id, subject, teacher, room, monday_1, 'Monday', user_id),
+        (2, class_id, subject, teacher, room, tenant['slots']['Tuesday', 2], 'Tuesday', user_id),
+        (3, class_id, subject, teacher, None, monday_1, 'Monday', user_id),   # newer entry in the same cell
+        (4, None, subject, teacher, room, monday_1, 'Monday', user_id),
+        (5, class_id, subject, teacher, room, 999, 'Monday', user_id),
+        (6, class_id, subject, teacher, room, custom_day, 'Day A', user_id),
+        (7, class_id, subject, teacher, room, late_slot, 'Monday', user_id),
+        (8, class_id, subject, teacher, room, unnumbered, 'Friday', user_id),
+    ])
+
+    assert entry_storage.create_entry_storage(conn) == 3
+    conn.commit()
+
+    kept = conn.execute('SELECT id, day, time_slot_id, room_id FROM timetable_entries ORDER BY id').fetchall()
+    assert [tuple(row) for row in kept] == [(2, 'Tuesday', tenant['slots']['Tuesday', 2], room),
+                                            (3, 'Monday', monday_1, None), (7, 'Monday', late_slot, room)]
+    set_aside = dict(conn.execute('SELECT id, reason FROM unmigrated_entries').fetchall())
+    assert set_aside == {1: 'duplicate cell', 4: 'no class', 5: 'unknown time slot',
+                         6: 'unsupported day', 8: 'no slot number'}
+
+    # New entries are numbered after the migrated ones
+    conn.execute('INSERT INTO timetable_entries (class_id, time_slot_id, day) VALUES (?, ?, ?)',
+                 (class_id, tenant['slots']['Monday', 2], 'Monday'))
+    assert conn.execute('SELECT MAX(id) FROM timetable_entries').fetchone()[0] == 8
+
+
+class UndercountingConnection:
+    """Reports no rows for the copy into entries, as if they had been lost on the way"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, *args):
+        cursor = self.conn.execute(sql, *args)
+        if sql.strip().startswith('INSERT INTO entries'):
+            return type('Cursor', (), {'rowcount': 0})()
+        return cursor
+
+
+def test_migration_aborts_when_rows_go_missing(conn, tenant):
+    make_old_table(conn, [(1, tenant['class_id'], None, None, None, tenant['slots']['Monday', 1], 'Monday',
+                           tenant['user_id'])])
+
+    with pytest.raises(RuntimeError, match='accounted for 0 of 1 rows'):
+        entry_storage._migrate(UndercountingConnection(conn))
+    conn.rollback()
+
+    assert conn.execute("SELECT type FROM sqlite_master WHERE name = 'timetable_entries'").fetchone()[0] == 'table'
+    assert conn.execute('SELECT COUNT(*) FROM timetable_entries').fetchone()[0] == 1
+    assert conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0] == 0
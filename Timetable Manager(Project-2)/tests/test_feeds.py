@@ -0,0 +1,39 @@
+import argparse
+import json
+
+import feeds
+import manage
+
+
+def add_lectures(conn, tenant):
+    """A Monday lecture in room R0 and a Tuesday one that has no room yet"""
+    for (day, number), room in ((('Monday', 1), tenant['rooms'][0]), (('Tuesday', 1), None)):
+        conn.execute('''
+            INSERT INTO timetable_entries (class_id, subject_id, teacher_id, room_id, time_slot_id, day, user_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (tenant['class_id'], tenant['subjects'][0], tenant['teachers'][0], room,
+              tenant['slots'][day, number], day, tenant['user_id']))
+    conn.commit()
+
+
+def test_feed_includes_a_lecture_without_a_room(conn, tenant):
+    add_lectures(conn, tenant)
+    feeds.save_term(conn, tenant['user_id'], {'start_date': '2024-09-02', 'end_date': '2024-09-08'})
+
+    pattern, terms = feeds.load_feed(conn, tenant['user_id'], 'class', tenant['class_id'])
+    assert sorted((entry['day'], entry['room_number']) for entry in pattern) == [('Monday', 'R0'), ('Tuesday', None)]
+
+    ics = ''.join(feeds.stream_ics('class', 'CS-A', pattern, terms))
+    assert ics.count('BEGIN:VEVENT') == 2
+    assert ics.count('LOCATION:') == 1 and 'LOCATION:R0' in ics
+
+
+def test_export_includes_a_lecture_without_a_room(conn, tenant, tmp_path):
+    add_lectures(conn, tenant)
+    output = tmp_path / 'timetable.jsonl'
+
+    args = argparse.Namespace(user=[tenant['user_id']], format='json', output=str(output))
+    assert manage.cmd_export(args) == 0
+
+    rows = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [(row['day'], row['room_number']) for row in rows] == [('Monday', 'R0'), ('Tuesday', None)]
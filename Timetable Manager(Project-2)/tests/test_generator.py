@@ -0,0 +1,29 @@
+import time
+
+import generator
+
+
+def test_request_for_a_class_being_generated_gets_the_run_to_poll(conn, tenant, monkeypatch):
+    user_id, class_id = tenant['user_id'], tenant['class_id']
+    monkeypatch.setattr(generator, 'ATTACH_WAIT', 0.2)
+    # Another worker holds the class's generation lock
+    running_id, _ = generator._start_run(conn, user_id, class_id)
+
+    started = time.monotonic()
+    result = generator.run_generation(conn, user_id, class_id, optimize=False)
+    assert time.monotonic() - started < 2
+    assert result == {'run_id': running_id, 'status': 'running', 'coalesced': True}
+
+
+def test_generate_api_answers_202_while_another_request_generates(app, conn, tenant, monkeypatch):
+    user_id, class_id = tenant['user_id'], tenant['class_id']
+    monkeypatch.setattr(generator, 'ATTACH_WAIT', 0)
+    running_id, _ = generator._start_run(conn, user_id, class_id)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+
+    response = client.post('/api/generate-timetable', json={'class_id': class_id})
+    assert response.status_code == 202
+    assert response.get_json()['poll_url'] == f'/api/generation-runs/{running_id}'
+    assert client.get(response.get_json()['poll_url']).get_json()['status'] == 'running'
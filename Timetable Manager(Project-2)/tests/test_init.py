@@ -0,0 +1,42 @@
+import os
+import subprocess
+import sys
+
+import database
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_create_app_creates_the_schema_only(db_path):
+    from app import create_app
+
+    assert not os.path.exists(db_path)
+    app = create_app({'TESTING': True, 'SECRET_KEY': 'test'})
+    assert app.config['SECRET_KEY'] == 'test'
+    conn = database.get_users_connection()
+    assert database.schema_version(conn) == database.SCHEMA_VERSION
+    conn.close()
+
+    assert app.test_client().get('/login').status_code == 200
+    conn = database.get_users_connection()
+    assert database.schema_version(conn) == database.SCHEMA_VERSION
+    assert conn.execute('SELECT COUNT(*) FROM users').fetchone()[0] == 0
+    conn.close()
+
+
+def test_demo_seeding_writes_even_during_a_read_request(db_path, app):
+    with app.test_request_context('/login', method='GET'):
+        database.init_db(seed_demo=True)
+    conn = database.get_users_connection()
+    assert conn.execute('SELECT COUNT(*) FROM users').fetchone()[0] == 1
+    assert conn.execute('SELECT COUNT(*) FROM teachers').fetchone()[0] > 0
+    conn.close()
+
+
+def test_importing_the_app_leaves_optional_modules_unloaded():
+    heavy = ('scheduler', 'generator', 'optimizer', 'simulation', 'room_assignment', 'validator', 'numpy',
+             'snapshot', 'feeds', 'versions', 'listing', 'batch', 'changes', 'entry_storage', 'assets')
+    loaded = subprocess.run(
+        [sys.executable, '-c', f'import sys, app; print(sorted(set({heavy!r}) & set(sys.modules)))'],
+        cwd=PROJECT_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    assert loaded == '[]'
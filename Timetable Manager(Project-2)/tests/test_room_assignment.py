@@ -0,0 +1,60 @@
+import itertools
+
+import pytest
+
+import room_assignment
+import validator
+from scheduler import TimetableModel
+
+
+@pytest.fixture
+def crowded(conn, tenant):
+    """Two classes with a practical lecture in the same slot and only one lab between them"""
+    user_id = tenant['user_id']
+    conn.execute("UPDATE subjects SET theory_practical = 'Practical' WHERE id = ?", (tenant['subjects'][1],))
+    conn.execute("UPDATE rooms SET room_type = 'Classroom', capacity = 200 WHERE id = ?", (tenant['rooms'][0],))
+    conn.execute("UPDATE rooms SET room_type = 'Lab', capacity = 30, has_lab_equipment = 1 WHERE id = ?",
+                 (tenant['rooms'][1],))
+    conn.execute('UPDATE classes SET num_students = 20 WHERE id = ?', (tenant['class_id'],))
+    other = conn.execute("INSERT INTO classes (name, num_students, user_id) VALUES ('CS-B', 20, ?)",
+                         (user_id,)).lastrowid
+    for class_id, teacher_id in zip((tenant['class_id'], other), tenant['teachers']):
+        conn.execute('''
+            INSERT INTO timetable_entries (class_id, subject_id, teacher_id, time_slot_id, day, user_id)
+            VALUES (?, ?, ?, ?, 'Monday', ?)
+        ''', (class_id, tenant['subjects'][1], teacher_id, tenant['slots']['Monday', 1], user_id))
+    conn.commit()
+    return TimetableModel.load(conn, user_id)
+
+
+def test_lectures_without_a_room_do_not_clash(crowded):
+    assert [kind for kind, *_ in crowded.double_bookings()] == []
+
+
+def test_lecture_with_no_suitable_room_is_left_without_one(conn, tenant, crowded):
+    changes, roomless = room_assignment.assign_rooms(crowded)
+
+    rooms = sorted((e['room_id'] for e in crowded.entries.values()), key=str)
+    assert rooms == [tenant['rooms'][1], None]
+    assert len(roomless) == 1 and crowded.entries[roomless[0]]['room_id'] is None
+    assert tenant['rooms'][0] not in changes.values()
+
+    room_assignment.save_room_changes(conn, tenant['user_id'], changes)
+    report = validator.validate(TimetableModel.load(conn, tenant['user_id']))
+    by_type = report['summary']['by_type']
+    assert by_type['no_room'] == 1
+    assert not {'room_double_booking', 'room_capacity', 'practical_room'} & set(by_type)
+
+
+@pytest.mark.parametrize('solver', ['scipy', 'python'])
+def test_min_cost_assignment_is_optimal(monkeypatch, solver):
+    if solver == 'scipy':
+        pytest.importorskip('scipy')
+    else:
+        monkeypatch.setattr(room_assignment, 'linear_sum_assignment', None)
+    cost = [[7, 3, 9, 4], [2, 8, 6, 5], [4, 4, 1, 9]]
+
+    assignment = room_assignment.min_cost_assignment(cost)
+    best = min(sum(cost[i][j] for i, j in enumerate(columns)) for columns in itertools.permutations(range(4), 3))
+    assert len(set(assignment)) == 3
+    assert sum(cost[i][j] for i, j in enumerate(assignment)) == best
@@ -0,0 +1,44 @@
+import sqlite3
+
+import changes
+import database
+import versions
+
+
+def count(conn, table, user_id):
+    return conn.execute(f'SELECT COUNT(*) FROM {table} WHERE user_id = ?', (user_id,)).fetchone()[0]
+
+
+def test_split_copies_every_tenant_table(conn, tenant, tmp_path):
+    user_id, class_id = tenant['user_id'], tenant['class_id']
+    conn.execute('''
+        INSERT INTO timetable_entries (class_id, subject_id, teacher_id, room_id, time_slot_id, day, user_id)
+        VALUES (?, ?, ?, ?, ?, 'Monday', ?)
+    ''', (class_id, tenant['subjects'][0], tenant['teachers'][0], tenant['rooms'][0],
+          tenant['slots']['Monday', 1], user_id))
+    versions.sync_active_version(conn, user_id, class_id)
+    versions.save_version(conn, user_id, class_id, 'Saved')
+    conn.execute("INSERT INTO terms (name, start_date, end_date, user_id) "
+                 "VALUES ('T1', '2026-01-05', '2026-04-03', ?)", (user_id,))
+    conn.execute("INSERT INTO published_snapshots (user_id, token) VALUES (?, 'tok')", (user_id,))
+    conn.execute("INSERT INTO unmigrated_entries (class_id, user_id, reason) VALUES (?, ?, 'no class')",
+                 (class_id, user_id))
+    conn.execute('INSERT INTO teacher_availability (teacher_id, day, time_slot_id) VALUES (?, ?, ?)',
+                 (tenant['teachers'][0], 'Monday', tenant['slots']['Monday', 1]))
+    conn.execute('INSERT INTO change_log_state (id, pruned_through) VALUES (1, 3)')
+    conn.commit()
+    last_seq = changes.last_seq(conn, user_id)
+
+    database.split_into_shards(str(tmp_path / 'shards'), source=database.DATABASE)
+
+    shard = sqlite3.connect(str(tmp_path / 'shards' / f'user_{user_id}.db'))
+    for table in ('entries', 'timetable_versions', 'active_timetable_versions', 'terms', 'published_snapshots',
+                  'unmigrated_entries', 'classes', 'time_slots'):
+        assert count(shard, table, user_id) == count(conn, table, user_id), table
+    assert shard.execute('SELECT COUNT(*) FROM teacher_availability').fetchone()[0] == 1
+    assert shard.execute('SELECT pruned_through FROM change_log_state').fetchone()[0] == 3
+    copied_log = 'SELECT seq, entity, entity_id, op FROM changes WHERE user_id = ? AND seq <= ? ORDER BY seq'
+    assert shard.execute(copied_log, (user_id, last_seq)).fetchall() == [
+        tuple(row) for row in conn.execute(copied_log, (user_id, last_seq))]
+    assert shard.execute("SELECT COUNT(*) FROM search_index WHERE search_index MATCH 'CS'").fetchone()[0] == 1
+    shard.close()
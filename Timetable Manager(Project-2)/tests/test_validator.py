@@ -0,0 +1,60 @@
+import generator
+import validator
+from scheduler import TimetableModel
+
+
+def test_required_subjects_without_lectures_are_reported(conn, tenant):
+    user_id, class_id = tenant['user_id'], tenant['class_id']
+    conn.execute('UPDATE subjects SET hours_per_week = 2 WHERE user_id = ?', (user_id,))
+    conn.execute('''
+        INSERT INTO timetable_entries (class_id, subject_id, teacher_id, room_id, time_slot_id, day, user_id)
+        VALUES (?, ?, ?, ?, ?, 'Monday', ?)
+    ''', (class_id, tenant['subjects'][0], tenant['teachers'][0], tenant['rooms'][0],
+          tenant['slots']['Monday', 1], user_id))
+    conn.execute('INSERT INTO class_subjects (class_id, subject_id, hours, user_id) VALUES (?, ?, 3, ?)',
+                 (class_id, tenant['subjects'][1], user_id))
+    conn.execute('INSERT INTO class_subjects (class_id, subject_id, hours, user_id) VALUES (999, ?, 3, ?)',
+                 (tenant['subjects'][1], user_id))
+
+    model = TimetableModel.load(conn, user_id, include_entries=False)
+    report = validator.validate(model, validator.load_columns(conn, user_id, model),
+                                validator.load_requirements(conn, user_id))
+
+    shortfalls = {(v['subject_id'], v['hours'], v['required'])
+                  for v in report['violations'] if v['type'] == 'subject_hours'}
+    assert shortfalls == {(tenant['subjects'][0], 1, 2), (tenant['subjects'][1], 0, 3)}
+
+
+def test_generation_records_what_the_class_needs(conn, tenant):
+    user_id, class_id = tenant['user_id'], tenant['class_id']
+    conn.execute('UPDATE subjects SET hours_per_week = 2 WHERE user_id = ?', (user_id,))
+
+    generator.generate_class_timetable(conn, user_id, class_id, subject_ids=tenant['subjects'], optimize=False)
+
+    assert validator.load_requirements(conn, user_id) == {(class_id, subject_id): 2
+                                                          for subject_id in tenant['subjects']}
+
+
+def test_default_generation_records_the_configured_hours(conn, tenant):
+    user_id, class_id = tenant['user_id'], tenant['class_id']
+    conn.execute('UPDATE subjects SET hours_per_week = 3 WHERE user_id = ?', (user_id,))
+
+    generator.generate_class_timetable(conn, user_id, class_id, optimize=False)
+
+    assert validator.load_requirements(conn, user_id) == {(class_id, subject_id): 3
+                                                          for subject_id in tenant['subjects']}
+
+
+def test_classes_without_requirements_are_not_checked_for_hours(conn, tenant):
+    user_id = tenant['user_id']
+    conn.execute('UPDATE subjects SET hours_per_week = 2 WHERE user_id = ?', (user_id,))
+    conn.execute('''
+        INSERT INTO timetable_entries (class_id, subject_id, teacher_id, room_id, time_slot_id, day, user_id)
+        VALUES (?, ?, ?, ?, ?, 'Monday', ?)
+    ''', (tenant['class_id'], tenant['subjects'][0], tenant['teachers'][0], tenant['rooms'][0],
+          tenant['slots']['Monday', 1], user_id))
+
+    model = TimetableModel.load(conn, user_id, include_entries=False)
+    report = validator.validate(model, validator.load_columns(conn, user_id, model),
+                                validator.load_requirements(conn, user_id))
+    assert 'subject_hours' not in report['summary']['by_type']
@@ -0,0 +1,123 @@
+import changes
+import generator
+import versions
+
+
+def add_entry(conn, tenant, slot, subject=0, teacher=0, room=0):
+    conn.execute('''
+        INSERT INTO timetable_entries (class_id, subject_id, teacher_id, room_id, time_slot_id, day, user_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (tenant['class_id'],
+          None if subject is None else tenant['subjects'][subject],
+          None if teacher is None else tenant['teachers'][teacher],
+          None if room is None else tenant['rooms'][room],
+          tenant['slots'][slot], slot[0], tenant['user_id']))
+    return conn.execute('SELECT id FROM timetable_entries WHERE class_id = ? AND time_slot_id = ?',
+                        (tenant['class_id'], tenant['slots'][slot])).fetchone()[0]
+
+
+def shown(conn, tenant):
+    slots = {slot_id: cell for cell, slot_id in tenant['slots'].items()}
+    return [(*slots[row['time_slot_id']], row['room_id']) for row in conn.execute(
+        'SELECT time_slot_id, room_id FROM timetable_entries WHERE class_id = ? ORDER BY id',
+        (tenant['class_id'],))]
+
+
+def test_save_version_with_unassigned_room(conn, tenant):
+    add_entry(conn, tenant, ('Monday', 1))
+    add_entry(conn, tenant, ('Monday', 2), room=None, teacher=None)
+    version_id = versions.save_version(conn, tenant['user_id'], tenant['class_id'], 'With gaps')
+
+    rows = versions.load_version(conn, tenant['user_id'], tenant['class_id'], version_id)
+    assert [row[:2] for row in rows] == [(0, 1), (0, 2)]
+    assert rows[1][3:] == (None, None)
+
+
+def test_rollback_moves_the_pointer(conn, tenant):
+    user_id, class_id = tenant['user_id'], tenant['class_id']
+    monday = add_entry(conn, tenant, ('Monday', 1))
+    saved = versions.save_version(conn, user_id, class_id, 'Monday only')
+    tuesday = add_entry(conn, tenant, ('Tuesday', 2), room=1)
+    conn.commit()
+    since = changes.last_seq(conn, user_id)
+
+    rows_before = conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+    statements = []
+    conn.set_trace_callback(statements.append)
+    assert versions.rollback_to_version(conn, user_id, class_id, saved)
+    conn.set_trace_callback(None)
+    conn.commit()
+
+    assert not [sql for sql in statements if 'DELETE FROM entries' in sql or 'INTO entries' in sql]
+    assert conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0] == rows_before
+    assert shown(conn, tenant) == [('Monday', 1, tenant['rooms'][0])]
+
+    listed = versions.list_versions(conn, user_id, class_id)
+    assert [(v['label'], v['entry_count'], v['active']) for v in listed] == [
+        ('Before rollback', 2, False), ('Monday only', 1, True)]
+
+    feed = changes.changes_since(conn, user_id, since)['changes']
+    ops = {d['id']: d['op'] for d in feed}
+    assert ops == {monday: 'upsert', tuesday: 'delete'}
+
+    # Rolling forward again brings back the timetable that was replaced
+    assert versions.rollback_to_version(conn, user_id, class_id, listed[0]['id'])
+    assert shown(conn, tenant) == [('Monday', 1, tenant['rooms'][0]), ('Tuesday', 2, tenant['rooms'][1])]
+    assert not versions.rollback_to_version(conn, user_id, class_id, 999)
+
+
+def test_edits_change_only_the_version_shown(conn, tenant):
+    user_id, class_id = tenant['user_id'], tenant['class_id']
+    monday = add_entry(conn, tenant, ('Monday', 1))
+    first = versions.sync_active_version(conn, user_id, class_id)
+    saved = versions.save_version(conn, user_id, class_id, 'Saved')
+
+    conn.execute('UPDATE timetable_entries SET room_id = ? WHERE id = ?', (tenant['rooms'][1], monday))
+    conn.execute('DELETE FROM timetable_entries WHERE id = ?', (monday,))
+    add_entry(conn, tenant, ('Tuesday', 1))
+
+    assert [row[:2] for row in versions.load_version(conn, user_id, class_id, first)] == [(1, 1)]
+    assert versions.load_version(conn, user_id, class_id, saved) == [
+        (0, 1, tenant['subjects'][0], tenant['teachers'][0], tenant['rooms'][0])]
+
+
+def test_versions_share_unchanged_entries(conn, tenant):
+    user_id, class_id = tenant['user_id'], tenant['class_id']
+    monday = add_entry(conn, tenant, ('Monday', 1))
+    add_entry(conn, tenant, ('Tuesday', 1))
+    versions.sync_active_version(conn, user_id, class_id)
+    saved = versions.save_version(conn, user_id, class_id, 'Saved')
+    assert conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0] == 2
+
+    # Only the edited entry is copied, and the one shown keeps its id
+    conn.execute('UPDATE timetable_entries SET time_slot_id = ? WHERE id = ?', (tenant['slots']['Monday', 2], monday))
+    assert conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0] == 3
+    assert shown(conn, tenant) == [('Monday', 2, tenant['rooms'][0]), ('Tuesday', 1, tenant['rooms'][0])]
+    assert [row[:2] for row in versions.load_version(conn, user_id, class_id, saved)] == [(0, 1), (1, 1)]
+
+
+def test_prune_keeps_the_version_shown(conn, tenant):
+    user_id, class_id = tenant['user_id'], tenant['class_id']
+    monday = add_entry(conn, tenant, ('Monday', 1))
+    shown_id = versions.sync_active_version(conn, user_id, class_id)
+    saved = [versions.save_version(conn, user_id, class_id, f'v{n}') for n in range(3)]
+    conn.execute('UPDATE timetable_entries SET room_id = ? WHERE id = ?', (tenant['rooms'][1], monday))
+
+    assert versions.prune_versions(conn, keep=1) == 2
+    assert [v['id'] for v in versions.list_versions(conn, user_id, class_id)] == [saved[2], shown_id]
+    assert conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0] == 2
+
+    # The entry the saved versions shared goes with the last of them
+    assert versions.prune_versions(conn, keep=0) == 1
+    assert [row[0] for row in conn.execute('SELECT id FROM entries')] == [monday]
+
+
+def test_generation_keeps_the_replaced_timetable_as_an_older_version(conn, tenant):
+    user_id, class_id = tenant['user_id'], tenant['class_id']
+    add_entry(conn, tenant, ('Monday', 1))
+
+    result = generator.generate_class_timetable(conn, user_id, class_id, optimize=False)
+    listed = versions.list_versions(conn, user_id, class_id)
+    assert [(v['label'], v['active']) for v in listed] == [('Generated', True), ('Before regeneration', False)]
+    assert listed[0]['id'] == result['version_id'] > listed[1]['id']
+    assert listed[1]['entry_count'] == 1
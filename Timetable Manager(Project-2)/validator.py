@@ -0,0 +1,175 @@
+from collections import Counter, defaultdict
+
+from scheduler import LAB_ROOM_TYPES
+
+ERROR = 'error'
+WARNING = 'warning'
+
+ENTRY_COLUMNS_QUERY = '''
+    SELECT id, class_id, subject_id, teacher_id, room_id, time_slot_id
+    FROM timetable_entries WHERE user_id = ?
+'''
+
+
+def entry_columns(model, rows):
+    """Turn (id, class, subject, teacher, room, time_slot) rows into parallel columns of cells"""
+    cell_of_slot = model.cell_of_slot
+    rows = [row for row in rows if row[5] in cell_of_slot]
+    if not rows:
+        return {'id': (), 'class': (), 'subject': (), 'teacher': (), 'room': (), 'cell': ()}
+    ids, class_ids, subject_ids, teacher_ids, room_ids, slot_ids = zip(*rows)
+    return {'id': ids, 'class': class_ids, 'subject': subject_ids, 'teacher': teacher_ids,
+            'room': room_ids, 'cell': tuple(map(cell_of_slot.__getitem__, slot_ids))}
+
+
+def load_columns(conn, user_id, model):
+    """Fetch a user's entries as plain tuples and turn them into columns"""
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    return entry_columns(model, cursor.execute(ENTRY_COLUMNS_QUERY, (user_id,)).fetchall())
+
+
+def load_requirements(conn, user_id):
+    """{(class_id, subject_id): weekly hours} for classes whose subjects were recorded at generation"""
+    return {(row[0], row[1]): row[2] for row in conn.execute(
+        'SELECT class_id, subject_id, hours FROM class_subjects WHERE user_id = ?', (user_id,))}
+
+
+def model_columns(model):
+    """Columns for the entries currently held in a TimetableModel"""
+    return entry_columns(model, [
+        (e['id'], e['class_id'], e['subject_id'], e['teacher_id'], e['room_id'], e['time_slot_id'])
+        for e in model.entries.values()])
+
+
+def _entry_ids_by_key(keys, ids, wanted):
+    grouped = defaultdict(list)
+    for key, entry_id in zip(keys, ids):
+        if key in wanted:
+            grouped[key].append(entry_id)
+    return grouped
+
+
+def validate(model, columns=None, requirements=None):
+    """Validate a whole timetable and return a structured violation report.
+
+    Works column-wise: every check is a Counter over zipped columns, and only
+    keys that actually violate a constraint are revisited to collect entry ids.
+    Weekly hours are only checked for classes with requirements (see
+    load_requirements), including required subjects with no lectures at all;
+    subjects such a class takes outside them are checked against the
+    subject's hours_per_week.
+    """
+    if columns is None:
+        columns = model_columns(model)
+    ids, cells = columns['id'], columns['cell']
+    violations = []
+
+    # Teacher, room and class double bookings
+    for kind in ('teacher', 'room', 'class'):
+        keys = list(zip(columns[kind], cells))
+        clashes = {key for key, count in Counter(keys).items() if count > 1 and key[0] is not None}
+        for (resource_id, cell), entry_ids in _entry_ids_by_key(keys, ids, clashes).items():
+            violations.append(dict(
+                model.describe_cell(cell),
+                type=f'{kind}_double_booking', severity=ERROR,
+                resource_id=resource_id, entry_ids=entry_ids,
+                message=f'{kind.capitalize()} {resource_id} has {len(entry_ids)} lectures in one slot',
+            ))
+
+    # Lectures without a room, e.g. left by room assignment when no free room suits them
+    roomless = [entry_id for entry_id, room_id in zip(ids, columns['room']) if room_id is None]
+    if roomless:
+        violations.append({
+            'type': 'no_room', 'severity': ERROR, 'entry_ids': roomless,
+            'message': f'{len(roomless)} lectures have no room',
+        })
+
+    # Room capacity against class size, checked once per (room, class) pair
+    room_class = list(zip(columns['room'], columns['class']))
+    too_small = set()
+    for room_id, class_id in set(room_class):
+        if room_id is None:
+            continue
+        capacity = (model.rooms.get(room_id) or {}).get('capacity') or 0
+        if capacity < ((model.classes.get(class_id) or {}).get('num_students') or 0):
+            too_small.add((room_id, class_id))
+    for (room_id, class_id), entry_ids in _entry_ids_by_key(room_class, ids, too_small).items():
+        room = model.rooms.get(room_id) or {}
+        cls = model.classes.get(class_id) or {}
+        violations.append({
+            'type': 'room_capacity', 'severity': ERROR, 'room_id': room_id, 'class_id': class_id,
+            'entry_ids': entry_ids,
+            'message': f"Room {room.get('room_number')} seats {room.get('capacity')} but "
+                       f"{cls.get('name')} has {cls.get('num_students')} students",
+        })
+
+    # Practical subjects outside Lab/Workshop rooms, once per (subject, room) pair
+    subject_room = list(zip(columns['subject'], columns['room']))
+    misplaced = {(subject_id, room_id) for subject_id, room_id in set(subject_room)
+                 if room_id is not None
+                 and (model.subjects.get(subject_id) or {}).get('theory_practical') == 'Practical'
+                 and (model.rooms.get(room_id) or {}).get('room_type') not in LAB_ROOM_TYPES}
+    for (subject_id, room_id), entry_ids in _entry_ids_by_key(subject_room, ids, misplaced).items():
+        room = model.rooms.get(room_id) or {}
+        violations.append({
+            'type': 'practical_room', 'severity': ERROR, 'subject_id': subject_id, 'room_id': room_id,
+            'entry_ids': entry_ids,
+            'message': f"Practical {(model.subjects.get(subject_id) or {}).get('code')} is in "
+                       f"{room.get('room_type')} {room.get('room_number')}",
+        })
+
+    # Teacher daily and weekly hours
+    n_slots = model.n_slots
+    day_loads = Counter(zip(columns['teacher'], [cell // n_slots for cell in cells]))
+    for (teacher_id, day_idx), load in day_loads.items():
+        max_day, _ = model.teacher_limits(teacher_id)
+        if load > max_day:
+            violations.append({
+                'type': 'teacher_daily_hours', 'severity': ERROR, 'teacher_id': teacher_id,
+                'day': model.days[day_idx], 'hours': load, 'limit': max_day,
+                'message': f'Teacher {teacher_id} teaches {load} hours on {model.days[day_idx]} '
+                           f'(max {max_day})',
+            })
+
+    for teacher_id, load in Counter(columns['teacher']).items():
+        _, max_week = model.teacher_limits(teacher_id)
+        if load > max_week:
+            violations.append({
+                'type': 'teacher_weekly_hours', 'severity': ERROR, 'teacher_id': teacher_id,
+                'hours': load, 'limit': max_week,
+                'message': f'Teacher {teacher_id} teaches {load} hours a week (max {max_week})',
+            })
+
+    # Weekly hours of each subject a class needs or is taking, for classes whose needs are known
+    # Classes and subjects deleted since generation are no longer required
+    required_hours = {key: hours for key, hours in (requirements or {}).items()
+                      if key[0] in model.classes and key[1] in model.subjects}
+    checked = {class_id for class_id, _ in required_hours}
+    scheduled = Counter(key for key in zip(columns['class'], columns['subject']) if key[0] in checked)
+    for class_id, subject_id in scheduled:
+        subject = model.subjects.get(subject_id) or {}
+        required_hours.setdefault((class_id, subject_id), subject.get('hours_per_week'))
+    for (class_id, subject_id), required in required_hours.items():
+        hours = scheduled.get((class_id, subject_id), 0)
+        if required and hours != required:
+            violations.append({
+                'type': 'subject_hours', 'severity': WARNING,
+                'class_id': class_id, 'subject_id': subject_id,
+                'hours': hours, 'required': required,
+                'message': f'Subject {subject_id} has {hours} of {required} weekly hours '
+                           f'in class {class_id}',
+            })
+
+    errors = sum(1 for v in violations if v['severity'] == ERROR)
+    return {
+        'valid': errors == 0,
+        'summary': {
+            'entries': len(ids),
+            'violations': len(violations),
+            'errors': errors,
+            'warnings': len(violations) - errors,
+            'by_type': dict(Counter(v['type'] for v in violations)),
+        },
+        'violations': violations,
+    }
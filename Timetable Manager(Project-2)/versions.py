@@ -0,0 +1,204 @@
+import entry_storage
+
+# Versions kept per class by `manage.py vacuum`, besides the one each class shows
+VERSION_HISTORY = 20
+
+
+def create_version_tables(conn):
+    """Version metadata and the active version pointer; which entries each version has is in `version_entries`"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS timetable_versions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            class_id INTEGER,
+            label TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            user_id INTEGER,
+            FOREIGN KEY (class_id) REFERENCES classes (id),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS active_timetable_versions (
+            class_id INTEGER PRIMARY KEY,
+            version_id INTEGER,
+            user_id INTEGER,
+            FOREIGN KEY (class_id) REFERENCES classes (id),
+            FOREIGN KEY (version_id) REFERENCES timetable_versions (id),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+
+def get_active_version_id(conn, user_id, class_id):
+    row = conn.execute('''
+        SELECT version_id FROM active_timetable_versions WHERE class_id = ? AND user_id = ?
+    ''', (class_id, user_id)).fetchone()
+    return row['version_id'] if row else None
+
+
+def set_active_version(conn, user_id, class_id, version_id):
+    conn.execute('''
+        INSERT OR REPLACE INTO active_timetable_versions (class_id, version_id, user_id)
+        VALUES (?, ?, ?)
+    ''', (class_id, version_id, user_id))
+
+
+def create_version(conn, user_id, class_id, label):
+    """Add an empty version; the caller lists its entries in version_entries"""
+    return conn.execute('''
+        INSERT INTO timetable_versions (class_id, label, user_id) VALUES (?, ?, ?)
+    ''', (class_id, label, user_id)).lastrowid
+
+
+def save_version(conn, user_id, class_id, label):
+    """Save the timetable a class shows as a new version; the class keeps showing its current one.
+
+    The new version lists the same entry rows, so saving copies no entries.
+    """
+    version_id = create_version(conn, user_id, class_id, label)
+    conn.execute('''
+        INSERT INTO version_entries (class_id, version_id, entry_id)
+        SELECT class_id, ?, entry_id FROM version_entries WHERE class_id = ? AND version_id = ?
+    ''', (version_id, class_id, get_active_version_id(conn, user_id, class_id) or 0))
+    return version_id
+
+
+def activate_version(conn, user_id, class_id, version_id):
+    """Make a class show another version by moving its pointer; no entry rows are rewritten"""
+    previous = get_active_version_id(conn, user_id, class_id)
+    set_active_version(conn, user_id, class_id, version_id)
+    # The rows clients see changed without being written, so the change log is told about every entry
+    # of both versions; entries only the old version has read back as deletes
+    conn.execute('''
+        INSERT INTO changes (user_id, entity, entity_id, op)
+        SELECT DISTINCT ?, 'timetable_entries', entry_id, 'upsert'
+        FROM version_entries WHERE class_id = ? AND version_id IN (?, ?)
+    ''', (user_id, class_id, previous or 0, version_id))
+
+
+def list_versions(conn, user_id, class_id):
+    """List versions of a class, newest first, flagging the active one"""
+    active_id = get_active_version_id(conn, user_id, class_id)
+    versions = conn.execute('''
+        SELECT v.id, v.label,
+               (SELECT COUNT(*) FROM version_entries ve
+                WHERE ve.class_id = v.class_id AND ve.version_id = v.id) AS entry_count,
+               v.created_at
+        FROM timetable_versions v
+        WHERE v.class_id = ? AND v.user_id = ?
+        ORDER BY v.id DESC
+    ''', (class_id, user_id)).fetchall()
+    return [dict(v, active=(v['id'] == active_id)) for v in versions]
+
+
+def load_version(conn, user_id, class_id, version_id):
+    """Entries of a version as (day_index, slot_number, subject_id, teacher_id, room_id), in cell order"""
+    if not conn.execute('SELECT 1 FROM timetable_versions WHERE id = ? AND class_id = ? AND user_id = ?',
+                        (version_id, class_id, user_id)).fetchone():
+        return None
+    return [tuple(row) for row in conn.execute('''
+        SELECT e.day_index, e.slot_number, e.subject_id, e.teacher_id, e.room_id
+        FROM version_entries ve JOIN entries e ON e.id = ve.entry_id
+        WHERE ve.class_id = ? AND ve.version_id = ? AND e.user_id = ?
+        ORDER BY e.day_index, e.slot_number
+    ''', (class_id, version_id, user_id))]
+
+
+def diff_versions(old_rows, new_rows):
+    """Diff two version row lists in cell order in a single merge pass"""
+    added, removed, changed = [], [], []
+    i = j = 0
+    while i < len(old_rows) and j < len(new_rows):
+        old, new = old_rows[i], new_rows[j]
+        if old[:2] == new[:2]:
+            if old != new:
+                changed.append((old, new))
+            i += 1
+            j += 1
+        elif old[:2] < new[:2]:
+            removed.append(old)
+            i += 1
+        else:
+            added.append(new)
+            j += 1
+    removed.extend(old_rows[i:])
+    added.extend(new_rows[j:])
+    return added, removed, changed
+
+
+def rollback_to_version(conn, user_id, class_id, version_id):
+    """Make an earlier version the one a class shows; False when it does not exist.
+
+    Only the active version pointer moves. The version shown before stays in
+    the list, and later edits change the version that is now shown.
+    """
+    if not conn.execute('SELECT 1 FROM timetable_versions WHERE id = ? AND class_id = ? AND user_id = ?',
+                        (version_id, class_id, user_id)).fetchone():
+        return False
+    sync_active_version(conn, user_id, class_id, 'Before rollback')
+    activate_version(conn, user_id, class_id, version_id)
+    return True
+
+
+def sync_active_version(conn, user_id, class_id, label='Synced'):
+    """Record a class's never-versioned entries (version 0) as its active version; returns the new id or None
+
+    Called before a class first switches to another version, and before that
+    version is created, so the listing (newest first) shows this one as older.
+    """
+    if get_active_version_id(conn, user_id, class_id) is not None:
+        return None
+    if not conn.execute('SELECT 1 FROM version_entries WHERE class_id = ? AND version_id = 0 LIMIT 1',
+                        (class_id,)).fetchone():
+        return None
+    version_id = create_version(conn, user_id, class_id, label)
+    set_active_version(conn, user_id, class_id, version_id)
+    conn.execute('UPDATE version_entries SET version_id = ? WHERE class_id = ? AND version_id = 0',
+                 (version_id, class_id))
+    return version_id
+
+
+def prune_versions(conn, keep=VERSION_HISTORY):
+    """Drop all but the newest `keep` versions of each class, never one a class shows; returns how many
+
+    Entries no remaining version lists are deleted with them.
+    """
+    stale = conn.execute('''
+        SELECT v.id, v.class_id FROM timetable_versions v
+        WHERE v.id NOT IN (SELECT version_id FROM active_timetable_versions WHERE version_id IS NOT NULL)
+          AND (SELECT COUNT(*) FROM timetable_versions newer
+               WHERE newer.class_id = v.class_id AND newer.id > v.id) >= ?
+    ''', (keep,)).fetchall()
+    conn.executemany('DELETE FROM version_entries WHERE class_id = ? AND version_id = ?',
+                     [(row['class_id'], row['id']) for row in stale])
+    conn.executemany('DELETE FROM timetable_versions WHERE id = ?', [(row['id'],) for row in stale])
+    conn.executemany('''
+        DELETE FROM entries WHERE class_id = ?
+          AND NOT EXISTS (SELECT 1 FROM version_entries ve WHERE ve.entry_id = entries.id)
+    ''', {(row['class_id'],) for row in stale})
+    return len(stale)
+
+
+def row_describer(conn, user_id):
+    """Build a function that resolves version rows into readable dicts"""
+    slots = {}
+    for slot in conn.execute('SELECT id, day, slot_number FROM time_slots WHERE user_id = ? ORDER BY id DESC',
+                             (user_id,)):
+        slots[slot['day'], slot['slot_number']] = slot['id']
+    subjects = dict(conn.execute('SELECT id, name FROM subjects WHERE user_id = ?', (user_id,)).fetchall())
+    teachers = dict(conn.execute('SELECT id, name FROM teachers WHERE user_id = ?', (user_id,)).fetchall())
+    rooms = dict(conn.execute('SELECT id, room_number FROM rooms WHERE user_id = ?', (user_id,)).fetchall())
+
+    def describe(row):
+        day_index, slot_number, subject_id, teacher_id, room_id = row
+        day = entry_storage.WEEKDAYS[day_index] if day_index < len(entry_storage.WEEKDAYS) else None
+        return {
+            'time_slot_id': slots.get((day, slot_number)),
+            'day': day,
+            'slot_number': slot_number,
+            'subject_id': subject_id, 'subject_name': subjects.get(subject_id),
+            'teacher_id': teacher_id, 'teacher_name': teachers.get(teacher_id),
+            'room_id': room_id, 'room_number': rooms.get(room_id),
+        }
+
+    return describe
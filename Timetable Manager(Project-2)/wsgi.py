@@ -0,0 +1,21 @@
+"""Production entry point.
+
+Run under any multi-threaded or multi-process WSGI server, e.g.
+
+    gunicorn --workers 4 --threads 8 --bind 0.0.0.0:8000 wsgi:application
+
+or `python wsgi.py` for a threaded server without extra packages. See the
+concurrency model notes in README.md.
+"""
+import os
+
+from app import create_app
+
+application = create_app({
+    'SECRET_KEY': os.environ.get('SECRET_KEY', 'timetable-secret-key-change-in-production'),
+    'PROFILE_GENERATION': os.environ.get('PROFILE_GENERATION') == '1',
+})
+
+if __name__ == '__main__':
+    application.run(host=os.environ.get('HOST', '127.0.0.1'), port=int(os.environ.get('PORT', 8000)),
+                    threaded=True, debug=False)